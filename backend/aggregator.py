@@ -1,263 +1,639 @@
 from datetime import datetime, timedelta
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+from pathlib import Path
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import String, and_, event, func, insert, or_, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 import logging
-from typing import Dict, List
+import multiprocessing
+import numpy as np
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import config
 from backend.db_models import (
-    RawData, Party, Region, Result, VoteProgress, 
+    RawData, Region, Result, VoteProgress, 
     AggregatedResult, Candidate, get_db
 )
-from backend.xml_parser import XMLParser
+from backend.xml_parser import STREAMING_SOURCE_TYPES, XMLParser, XMLSource, parse_raw_xml
+from backend.columnar_parser import COLUMNAR_SOURCE_TYPES, RegionColumns, parse_columnar
+from backend.raw_store import CODEC_FILE, CODEC_PLAIN, archive_path, open_raw_xml, read_raw_bytes
+from backend.metrics import PARSE_SECONDS, ROWS_INSERTED, AGGREGATION_SECONDS, LATE_RESULTS
+from backend.dimensions import CHUNK_SIZE, DimensionCache
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_parse_pool_lock = threading.Lock()
+
+# Hranice (watermark) minutové agregace v čase dat: minuty před ní už
+# kontrolní agregace uzavřela. Výsledky do nich se při zpracování stále
+# promítnou, ale počítají se jako opožděná data. Sdílí ji všechny agregátory
+# procesu.
+_watermark: Optional[datetime] = None
+_watermark_lock = threading.Lock()
+
+# Neúspěšné pokusy o zpracování záznamů surových dat podle id; po
+# RAW_DATA_MAX_ATTEMPTS se záznam vyřadí, aby se nezkoušel donekonečna
+_failed_attempts: Dict[int, int] = {}
+_failed_attempts_lock = threading.Lock()
+
+def get_parse_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Sdílený pool procesů pro parsování XML (None, pokud je vypnutý)
+
+    Procesy se spouštějí metodou spawn - kolektor je vícevláknový a fork
+    by do potomků zkopíroval i zámky držené jinými vlákny.
+    """
+    global _parse_pool
+    if config.PARSE_WORKERS <= 1:
+        return None
+    with _parse_pool_lock:
+        if _parse_pool is not None and _parse_pool._broken:
+            # Pool po pádu procesu už nepřijme žádnou úlohu - nahradí se novým
+            logger.warning(f"Pool parsování je rozbitý ({_parse_pool._broken}), vytvářím nový")
+            _parse_pool.shutdown(wait=False, cancel_futures=True)
+            _parse_pool = None
+        if _parse_pool is None:
+            _parse_pool = ProcessPoolExecutor(
+                max_workers=config.PARSE_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _parse_pool
+
+def reset_watermark(minute: Optional[datetime] = None):
+    """
+    Posun hranice agregace zpět (None = navázat na poslední agregovanou minutu)
+
+    Další kontrolní agregace přepočítá všechny minuty od této hranice,
+    např. po přehrání archivních dat s původními časovými značkami.
+    """
+    global _watermark
+    with _watermark_lock:
+        _watermark = minute.replace(second=0, microsecond=0) if minute is not None else None
+
+def discard_parse_pool(pool: ProcessPoolExecutor):
+    """
+    Zahození rozbitého poolu (BrokenProcessPool), další get_parse_pool vytvoří nový
+    """
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is pool:
+            _parse_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def shutdown_parse_pool():
+    """
+    Ukončení poolu parsování při ukončení sběru
+    """
+    global _parse_pool
+    with _parse_pool_lock:
+        pool, _parse_pool = _parse_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def parse_source(source_type: str, source_identifier: Optional[str],
+                 xml_content: XMLSource, mode: str = 'tree', parser: Optional[XMLParser] = None):
+    """
+    Parsování záznamu v režimu tree, stream nebo columnar (config.XML_PARSE_MODE)
+    """
+    if mode == 'columnar' and source_type in COLUMNAR_SOURCE_TYPES:
+        return parse_columnar(source_type, source_identifier, xml_content)
+    return parse_raw_xml(source_type, source_identifier, xml_content, parser,
+                         stream=mode == 'stream')
+
+_BATCH_SOURCE_TYPES = ('okrsky', 'obce', 'okresy')
+
+def parse_method_name(source_type: str, mode: str = 'tree') -> str:
+    """
+    Název metody parseru, kterou parse_source pro daný záznam použije (štítek metrik)
+    """
+    if mode == 'columnar' and source_type in COLUMNAR_SOURCE_TYPES:
+        prefix = 'columnar.parse'
+    elif mode == 'stream' and source_type in STREAMING_SOURCE_TYPES:
+        prefix = 'stream'
+    else:
+        prefix = 'parse'
+    suffix = 'batch' if source_type in _BATCH_SOURCE_TYPES else source_type
+    return f"{prefix}_{suffix}_results"
+
+def timed_parse(source_type: str, source_identifier: Optional[str],
+                xml_content: XMLSource, mode: str = 'tree', parser: Optional[XMLParser] = None):
+    """
+    parse_source s měřením doby, vrací (výsledek, sekundy)
+
+    V proudovém režimu jde jen o čtení hlavičky, položky se parsují až
+    během ukládání.
+    """
+    start = time.perf_counter()
+    parsed = parse_source(source_type, source_identifier, xml_content, mode, parser)
+    return parsed, time.perf_counter() - start
+
+def _parse_in_worker(source_type: str, source_identifier: Optional[str],
+                     payload: Union[str, bytes, Path], mode: str = 'tree'):
+    """
+    Parsování jednoho záznamu v pracovním procesu, vrací (výsledek, sekundy)
+
+    Payload je text nebo bajty XML, u archivu na disku jen cesta k souboru,
+    aby se obsah zbytečně nepřenášel mezi procesy. Doba parsování se vrací
+    spolu s výsledkem, metriky pracovního procesu by se jinak ztratily.
+    """
+    if isinstance(payload, Path):
+        with open(payload, 'rb') as f:
+            return timed_parse(source_type, source_identifier, f, mode)
+    return timed_parse(source_type, source_identifier, payload, mode)
+
+# Sloupce řádků zapisovaných hromadně mimo ORM (v pořadí hodnot v n-ticích)
+RESULT_COLUMNS = ('timestamp', 'region_id', 'party_id', 'votes', 'percentage', 'mandates')
+PROGRESS_COLUMNS = ('timestamp', 'region_id', 'total_districts', 'counted_districts', 'percentage_counted',
+                    'total_voters', 'total_votes', 'valid_votes', 'turnout')
+
+def _chunks(items: Iterable, size: int = CHUNK_SIZE) -> Iterator[List]:
+    """
+    Položky po skupinách (i z generátoru proudového parsování, bez načtení všech)
+    """
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
 class DataAggregator:
     """Agregátor dat pro minutové intervaly"""
     
-    def __init__(self, db_session: Session):
+    def __init__(self, db_session: Session, recorder=None):
         self.db = db_session
         self.parser = XMLParser()
+        self.parse_mode = config.XML_PARSE_MODE
+        self.recorder = recorder  # FlightRecorder kolektoru, pokud běží v něm
+        self.dimensions = DimensionCache(self.db)  # id stran a regionů podle kódu
+        
+        # Výsledky a průběh sčítání čekající na hromadný zápis (n-tice podle *_COLUMNS)
+        self.result_rows: List[Tuple] = []
+        self.progress_rows: List[Tuple] = []
+        # Průběh sčítání regionů z právě zpracovávaného souboru pro minutovou agregaci
+        self.file_progress: Dict[Tuple[int, datetime], Tuple[int, int]] = {}
+        
+        # Počet nových řádků zapsaných touto session (metrika vložených řádků);
+        # objekty ORM se počítají při flush, hromadné zápisy v _write_rows
+        self.inserted = 0
+        event.listen(self.db, 'before_flush', self._count_inserted)
+    
+    def _count_inserted(self, session, flush_context, instances):
+        self.inserted += len(session.new)
     
-    def process_raw_data(self):
+    def _add_result(self, timestamp: datetime, region_id: int, party_id: int, votes: int,
+                    percentage: float = 0.0, mandates: int = 0):
+        """Řádek výsledku k hromadnému zápisu"""
+        self.result_rows.append((timestamp, region_id, party_id, votes, percentage, mandates))
+        if len(self.result_rows) >= config.INSERT_CHUNK_ROWS:
+            self._write_rows()
+    
+    def _add_progress(self, timestamp: datetime, region_id: int, progress: Dict):
+        """Průběh sčítání k hromadnému zápisu (chybějící hodnoty jako výchozí 0)"""
+        self.progress_rows.append((timestamp, region_id) + tuple(progress.get(column, 0)
+                                                                 for column in PROGRESS_COLUMNS[2:]))
+        self.file_progress[(region_id, timestamp)] = (progress.get('counted_districts', 0),
+                                                      progress.get('total_districts', 0))
+    
+    def _write_rows(self):
+        """
+        Zápis čekajících řádků přes Core insert (executemany) v aktuální transakci
+        
+        Řádky se nestávají objekty ORM, session je nesleduje a nedrží v paměti.
+        Výsledky se zároveň promítnou do minutové agregace.
+        """
+        for model, columns, rows in ((Result, RESULT_COLUMNS, self.result_rows),
+                                     (VoteProgress, PROGRESS_COLUMNS, self.progress_rows)):
+            for start in range(0, len(rows), config.INSERT_CHUNK_ROWS):
+                chunk = rows[start:start + config.INSERT_CHUNK_ROWS]
+                self.db.execute(insert(model), [dict(zip(columns, row)) for row in chunk])
+                self.inserted += len(chunk)
+                if model is Result:
+                    self._upsert_aggregated(chunk)
+            rows.clear()
+    
+    def _upsert_aggregated(self, rows: List[Tuple]):
+        """
+        Promítnutí výsledků do aggregated_results hned při zpracování
+        
+        Řádek minuty se vloží, nebo přepíše, pokud je výsledek novější než
+        ten, ze kterého pochází (při shodném čase zůstává první uložený,
+        stejně jako v aggregate_by_minute). Průběh sčítání se vezme ze
+        stejného souboru, pokud ho pro region obsahuje.
+        """
+        watermark = _watermark
+        values = []
+        late = 0
+        for timestamp, region_id, party_id, votes, percentage, _ in rows:
+            minute = timestamp.replace(second=0, microsecond=0)
+            if watermark is not None and minute < watermark:
+                late += 1
+            counted, total = self.file_progress.get((region_id, timestamp), (0, 0))
+            values.append({
+                'minute': minute, 'region_id': region_id, 'party_id': party_id,
+                'votes': votes, 'percentage': percentage, 'counted_districts': counted,
+                'total_districts': total, 'source_timestamp': timestamp,
+            })
+        if late:
+            LATE_RESULTS.inc(late)
+            logger.debug(f"{late} výsledků přišlo po uzavření své minuty ({watermark})")
+        self.db.execute(self._upsert_aggregated_statement(replace_equal=False), values)
+    
+    @staticmethod
+    def _upsert_aggregated_statement(replace_equal: bool, select_rows=None):
+        """
+        INSERT do aggregated_results s ON CONFLICT - novější source_timestamp vyhrává
+        
+        S replace_equal se přepíše i řádek ze stejně starého výsledku, pokud
+        se liší hodnoty (kontrolní agregace přepočítává z tabulky results).
         """
-        Zpracování všech nezpracovaných surových dat
+        columns = ['minute', 'region_id', 'party_id', 'votes', 'percentage',
+                   'counted_districts', 'total_districts', 'source_timestamp']
+        statement = sqlite_insert(AggregatedResult)
+        if select_rows is not None:
+            statement = statement.from_select(columns, select_rows)
+        excluded = statement.excluded
+        current = AggregatedResult.__table__.c
+        newer = [current.source_timestamp.is_(None),
+                 excluded.source_timestamp > current.source_timestamp]
+        if replace_equal:
+            newer.append(and_(
+                excluded.source_timestamp == current.source_timestamp,
+                or_(*(excluded[column].is_distinct_from(current[column]) for column in columns[3:7]))
+            ))
+        return statement.on_conflict_do_update(
+            index_elements=['region_id', 'party_id', 'minute'],
+            set_={column: excluded[column] for column in columns[3:]},
+            where=or_(*newer)
+        )
+    
+    def _discard_rows(self):
+        """Zahození nezapsaných řádků (po chybě se nesmí dostat do dalšího souboru)"""
+        self.result_rows.clear()
+        self.progress_rows.clear()
+        self.file_progress.clear()
+    
+    def _observe_parse(self, raw_data: RawData, source_type: str, seconds: float):
+        """Doba parsování do metrik a záznamníku cyklů"""
+        method = parse_method_name(source_type, self.parse_mode)
+        PARSE_SECONDS.labels(method).observe(seconds)
+        if self.recorder is not None:
+            self.recorder.record('parsování', seconds, method=method,
+                                 source=raw_data.source_identifier or source_type, bytes=raw_data.size)
+    
+    def process_raw_data(self) -> int:
         """
+        Zpracování všech nezpracovaných surových dat, vrací počet záznamů
+        
+        Záznamy se čtou po skupinách PROCESS_CHUNK_ROWS podle id (keyset),
+        takže v paměti je najednou jen jedna skupina. Každá skupina je jedna
+        transakce včetně hromadného označení záznamů jako zpracovaných.
+        Selže-li některý záznam, skupina se vrátí a zpracuje znovu po
+        jednotlivých záznamech - chybný se přeskočí (zkusí se znovu příště),
+        ostatní se uloží.
+        Selže-li zápis celé skupiny, zůstane nezpracovaná pro příští běh.
+        """
+        total = 0
+        last_id = 0
         try:
-            # Získání nezpracovaných dat
-            unprocessed = self.db.query(RawData).filter(
-                RawData.processed == False
-            ).order_by(RawData.timestamp).all()
-            
-            for raw_data in unprocessed:
-                self._process_single_raw_data(raw_data)
-                raw_data.processed = True
-                self.db.commit()
+            while True:
+                chunk = self.db.query(RawData).filter(
+                    RawData.processed == False,
+                    RawData.id > last_id
+                ).order_by(RawData.id).limit(config.PROCESS_CHUNK_ROWS).all()
+                if not chunk:
+                    break
+                last_id = chunk[-1].id
+                # Strany a regiony mohl mezitím smazat nebo změnit jiný proces
+                self.dimensions.refresh()
+                
+                if self._process_chunk(chunk):
+                    self.db.query(RawData).filter(
+                        RawData.id.in_([raw_data.id for raw_data in chunk])
+                    ).update({RawData.processed: True}, synchronize_session=False)
+                    self.db.commit()
+                else:
+                    logger.warning(f"Skupina záznamů {chunk[0].id}-{last_id} vrácena, "
+                                   f"zpracovávám ji po jednotlivých záznamech")
+                    self._process_rows_separately(chunk)
+                
+                total += len(chunk)
+                # Zpracované záznamy (včetně XML) neudržovat v session
+                self.db.expunge_all()
                 
-            logger.info(f"Zpracováno {len(unprocessed)} surových záznamů")
+            logger.info(f"Zpracováno {total} surových záznamů")
+            return total
             
         except Exception as e:
             logger.error(f"Chyba při zpracování surových dat: {e}")
+            self._discard_rows()
             self.db.rollback()
+            return total
+    
+    def _process_chunk(self, chunk: List[RawData]) -> bool:
+        """
+        Zpracování skupiny záznamů v jedné transakci (bez commitu)
+        
+        Vrací False, pokud některý záznam selhal - transakce je pak už vrácená.
+        """
+        pool = get_parse_pool() if len(chunk) >= config.PARSE_POOL_MIN_ROWS else None
+        if pool is not None:
+            return self._process_in_pool(pool, chunk)
+        for raw_data in chunk:
+            if not self._process_single_raw_data(raw_data):
+                return False
+        return True
     
-    def _process_single_raw_data(self, raw_data: RawData):
+    def _process_rows_separately(self, rows: List[RawData]):
         """
-        Zpracování jednoho záznamu surových dat
+        Zpracování záznamů každého v samostatné transakci
+        
+        Chybný záznam zůstane nezpracovaný a zkusí se znovu v příštím běhu;
+        po RAW_DATA_MAX_ATTEMPTS neúspěšných pokusech se vyřadí - označí
+        jako zpracovaný bez výsledků, aby se nezkoušel donekonečna.
         """
+        for raw_data in rows:
+            raw_id = raw_data.id
+            if self._process_single_raw_data(raw_data):
+                raw_data.processed = True
+                self.db.commit()
+                with _failed_attempts_lock:
+                    _failed_attempts.pop(raw_id, None)
+                continue
+            
+            with _failed_attempts_lock:
+                attempts = _failed_attempts[raw_id] = _failed_attempts.get(raw_id, 0) + 1
+                if attempts >= config.RAW_DATA_MAX_ATTEMPTS:
+                    del _failed_attempts[raw_id]
+            if attempts < config.RAW_DATA_MAX_ATTEMPTS:
+                logger.warning(f"Záznam {raw_id} se nepodařilo zpracovat (pokus {attempts}/"
+                               f"{config.RAW_DATA_MAX_ATTEMPTS}), zůstává nezpracovaný")
+                continue
+            logger.error(f"Záznam {raw_id} se nepodařilo zpracovat ani na {attempts}. pokus, "
+                         f"vyřazuji ho bez výsledků")
+            self.db.query(RawData).filter(RawData.id == raw_id).update(
+                {RawData.processed: True}, synchronize_session=False)
+            self.db.commit()
+    
+    def _process_in_pool(self, pool: ProcessPoolExecutor, rows: List[RawData]) -> bool:
+        """
+        Paralelní parsování v procesech, zápis do databáze popořadě zde
+        
+        V běhu je najednou nejvýše PARSE_WORKERS * 2 záznamů, takže se
+        další soubory parsují, zatímco se výsledky předchozích zapisují.
+        Vrací False po prvním záznamu, který se nepodařilo uložit.
+        """
+        window = config.PARSE_WORKERS * 2
+        pending = deque()
+        rows = iter(rows)
+        
+        while True:
+            while len(pending) < window:
+                raw_data = next(rows, None)
+                if raw_data is None:
+                    break
+                pending.append((raw_data, self._submit_parse(pool, raw_data)))
+            
+            if not pending:
+                return True
+            
+            raw_data, future = pending.popleft()
+            parsed = None
+            if future is not None:
+                try:
+                    parsed, seconds = future.result()
+                    self._observe_parse(raw_data, raw_data.source_type, seconds)
+                except BrokenProcessPool as e:
+                    # Zbylé záznamy okna se zparsují tady, další skupina dostane nový pool
+                    logger.warning(f"Pool parsování se rozbil u záznamu {raw_data.id}: {e}")
+                    discard_parse_pool(pool)
+                    future = None
+                except Exception as e:
+                    # Např. rozbitý pool - záznam se zparsuje tady
+                    logger.warning(f"Paralelní parsování záznamu {raw_data.id} selhalo: {e}")
+                    future = None
+            
+            if future is None:
+                stored = self._process_single_raw_data(raw_data)
+            else:
+                stored = self._process_single_raw_data(raw_data, parsed)
+            if not stored:
+                # Rozparsované výsledky zbylých záznamů se zahodí
+                for _, future in pending:
+                    if future is not None:
+                        future.cancel()
+                return False
+    
+    def _submit_parse(self, pool: ProcessPoolExecutor, raw_data: RawData):
+        """
+        Odeslání záznamu k parsování do poolu, None pokud se to nepodaří
+        
+        V proudovém režimu se velké soubory do poolu neposílají - výsledek
+        by se musel celý sestavit v paměti - a zpracují se proudově zde.
+        """
+        if self.parse_mode == 'stream' and raw_data.source_type in STREAMING_SOURCE_TYPES:
+            return None
         try:
-            if raw_data.source_type == 'main':
-                self._process_main_results(raw_data)
-            elif raw_data.source_type == 'okres':
-                self._process_okres_results(raw_data)
-            elif raw_data.source_type == 'kandidati':
-                self._process_candidates_results(raw_data)
-            elif raw_data.source_type == 'zahranici':
-                self._process_zahranici_results(raw_data)
-            elif raw_data.source_type in ['okrsky', 'obce', 'okresy']:
-                self._process_batch_results(raw_data)
+            if raw_data.codec in (None, CODEC_PLAIN):
+                payload = raw_data.xml_content
+            elif raw_data.codec == CODEC_FILE:
+                payload = archive_path(raw_data.content_hash)
+            else:
+                payload = read_raw_bytes(raw_data)
+            return pool.submit(_parse_in_worker, raw_data.source_type,
+                               raw_data.source_identifier, payload, self.parse_mode)
+        except BrokenProcessPool as e:
+            logger.warning(f"Záznam {raw_data.id} nelze odeslat k parsování, pool je rozbitý: {e}")
+            discard_parse_pool(pool)
+            return None
+        except Exception as e:
+            logger.warning(f"Záznam {raw_data.id} nelze odeslat k parsování: {e}")
+            return None
+    
+    def _process_single_raw_data(self, raw_data: RawData, parsed=None) -> bool:
+        """
+        Zpracování jednoho záznamu surových dat, vrací False po chybě
+        
+        Bez předem zparsovaného výsledku (z poolu procesů) se XML parsuje zde;
+        v proudovém režimu se záznamy ukládají průběžně během čtení souboru.
+        Po chybě se vrátí celá transakce.
+        """
+        # Po chybě při flush nejde z neplatné transakce číst atributy záznamu
+        source_type = raw_data.source_type
+        try:
+            if parsed is None:
+                with open_raw_xml(raw_data) as xml_content:
+                    parsed, seconds = timed_parse(raw_data.source_type, raw_data.source_identifier,
+                                                  xml_content, self.parse_mode, self.parser)
+                    self._observe_parse(raw_data, source_type, seconds)
+                    self._store_parsed(raw_data, parsed)
+            else:
+                self._store_parsed(raw_data, parsed)
+            return True
                 
         except Exception as e:
-            logger.error(f"Chyba při zpracování dat typu {raw_data.source_type}: {e}")
+            logger.error(f"Chyba při zpracování dat typu {source_type}: {e}")
+            # Neukládat výsledky jen z části souboru
+            self._discard_rows()
+            self.db.rollback()
+            return False
+    
+    def _store_parsed(self, raw_data: RawData, parsed):
+        """
+        Uložení zparsovaných výsledků podle typu zdroje
+        """
+        start = time.perf_counter()
+        inserted = self.inserted + self.dimensions.created
+        self.file_progress.clear()
+        if raw_data.source_type == 'main':
+            method = self._process_main_results
+        elif raw_data.source_type == 'okres':
+            method = self._process_okres_results
+        elif raw_data.source_type == 'kandidati':
+            method = self._process_candidates_results
+        elif raw_data.source_type == 'zahranici':
+            method = self._process_zahranici_results
+        elif raw_data.source_type in ['okrsky', 'obce', 'okresy']:
+            method = self._process_batch_results
+        else:
+            return
+        method(raw_data, parsed)
+        # Každá metoda končí zápisem (_write_rows nebo flush), nové řádky jsou
+        # tedy už započítané (strany a regiony vkládá DimensionCache mimo ORM)
+        rows = self.inserted + self.dimensions.created - inserted
+        ROWS_INSERTED.labels(method.__name__).inc(rows)
+        if self.recorder is not None:
+            self.recorder.record('ukládání', time.perf_counter() - start, method=method.__name__,
+                                 source=raw_data.source_identifier or raw_data.source_type,
+                                 rows=rows)
     
-    def _process_main_results(self, raw_data: RawData):
+    def _process_main_results(self, raw_data: RawData, results: Dict):
         """
         Zpracování hlavních výsledků
         """
-        results = self.parser.parse_main_results(raw_data.xml_content)
         if not results:
             return
         
-        # Uložení nebo aktualizace informací o stranách
-        for party_data in results.get('parties', []):
-            party = self.db.query(Party).filter(
-                Party.code == party_data['code']
-            ).first()
-            
-            if not party:
-                party = Party(
-                    code=party_data['code'],
-                    name=party_data['name'],
-                    number=party_data['number']
-                )
-                self.db.add(party)
-                self.db.flush()
-        
-        # Získání nebo vytvoření regionu pro celou ČR
-        cr_region = self.db.query(Region).filter(
-            Region.code == 'CZ'
-        ).first()
-        
-        if not cr_region:
-            cr_region = Region(
-                code='CZ',
-                name='Česká republika',
-                type='stat'
-            )
-            self.db.add(cr_region)
-            self.db.flush()
+        # Uložení nových stran (existující se nemění)
+        party_ids = self.dimensions.ensure_parties(results.get('parties', []))
+        
+        # Regiony celé ČR a krajů
+        region_ids = self.dimensions.ensure_regions(
+            [{'code': 'CZ', 'name': 'Česká republika', 'type': 'stat'}] + results.get('regions', [])
+        )
+        cr_region_id = region_ids['CZ']
         
         # Uložení průběhu sčítání
         if results.get('progress'):
-            progress = VoteProgress(
-                timestamp=raw_data.timestamp,
-                region_id=cr_region.id,
-                **results['progress']
-            )
-            self.db.add(progress)
+            self._add_progress(raw_data.timestamp, cr_region_id, results['progress'])
         
         # Uložení výsledků stran
         for party_data in results.get('parties', []):
-            party = self.db.query(Party).filter(
-                Party.code == party_data['code']
-            ).first()
+            party_id = party_ids.get(party_data['code'])
             
-            if party:
-                result = Result(
-                    timestamp=raw_data.timestamp,
-                    region_id=cr_region.id,
-                    party_id=party.id,
-                    votes=party_data['votes'],
-                    percentage=party_data['percentage'],
-                    mandates=party_data.get('mandates', 0)
-                )
-                self.db.add(result)
+            if party_id:
+                self._add_result(raw_data.timestamp, cr_region_id, party_id,
+                                 party_data['votes'], party_data['percentage'],
+                                 mandates=party_data.get('mandates', 0))
         
         # Zpracování výsledků po krajích
         for region_data in results.get('regions', []):
-            region = self.db.query(Region).filter(
-                Region.code == region_data['code']
-            ).first()
-            
-            if not region:
-                region = Region(
-                    code=region_data['code'],
-                    name=region_data['name'],
-                    type=region_data['type']
-                )
-                self.db.add(region)
-                self.db.flush()
+            region_id = region_ids[region_data['code']]
             
             # Uložení výsledků stran v kraji
             for party_result in region_data.get('parties', []):
-                party = self.db.query(Party).filter(
-                    Party.code == party_result['code']
-                ).first()
+                party_id = party_ids.get(party_result['code'])
                 
-                if party:
-                    result = Result(
-                        timestamp=raw_data.timestamp,
-                        region_id=region.id,
-                        party_id=party.id,
-                        votes=party_result['votes'],
-                        percentage=party_result['percentage']
-                    )
-                    self.db.add(result)
+                if party_id:
+                    self._add_result(raw_data.timestamp, region_id, party_id,
+                                     party_result['votes'], party_result['percentage'])
         
-        self.db.flush()
+        self._write_rows()
     
-    def _process_okres_results(self, raw_data: RawData):
+    def _process_okres_results(self, raw_data: RawData, results: Dict):
         """
         Zpracování výsledků okresu
         """
-        results = self.parser.parse_okres_results(
-            raw_data.xml_content, 
-            raw_data.source_identifier
-        )
         if not results:
             return
         
         # Získání nebo vytvoření okresu
-        okres = self.db.query(Region).filter(
-            Region.code == results['okres_code']
-        ).first()
-        
-        if not okres:
-            okres = Region(
-                code=results['okres_code'],
-                name=results['okres_name'],
-                type='okres'
-            )
-            self.db.add(okres)
-            self.db.flush()
+        okres_id = self.dimensions.ensure_region(results['okres_code'], results['okres_name'], 'okres')
         
         # Uložení průběhu sčítání
         if results.get('progress'):
-            progress = VoteProgress(
-                timestamp=raw_data.timestamp,
-                region_id=okres.id,
-                **results['progress']
-            )
-            self.db.add(progress)
+            self._add_progress(raw_data.timestamp, okres_id, results['progress'])
         
         # Uložení výsledků stran
+        party_ids = self.dimensions.party_ids(party['code'] for party in results.get('parties', []))
         for party_data in results.get('parties', []):
-            party = self.db.query(Party).filter(
-                Party.code == party_data['code']
-            ).first()
+            party_id = party_ids.get(party_data['code'])
             
-            if party:
-                result = Result(
-                    timestamp=raw_data.timestamp,
-                    region_id=okres.id,
-                    party_id=party.id,
-                    votes=party_data['votes'],
-                    percentage=party_data['percentage']
-                )
-                self.db.add(result)
+            if party_id:
+                self._add_result(raw_data.timestamp, okres_id, party_id,
+                                 party_data['votes'], party_data['percentage'])
         
         # Zpracování obcí v okresu
-        for obec_data in results.get('obce', []):
-            obec = self.db.query(Region).filter(
-                Region.code == obec_data['code']
-            ).first()
-            
-            if not obec:
-                obec = Region(
-                    code=obec_data['code'],
-                    name=obec_data['name'],
-                    type='obec',
-                    parent_code=results['okres_code']
-                )
-                self.db.add(obec)
-                self.db.flush()
+        obce = results.get('obce', [])
+        if isinstance(obce, RegionColumns):
+            self._process_region_columns(raw_data, obce, 'obec', with_percentage=False,
+                                         parent_code=results['okres_code'])
+            obce = []
+        
+        # Obce i jejich strany se dohledají po skupinách (v proudovém režimu se obce teprve čtou)
+        for chunk in _chunks(obce):
+            obec_ids = self.dimensions.ensure_regions([
+                {'code': obec_data['code'], 'name': obec_data['name'], 'type': 'obec',
+                 'parent_code': results['okres_code']}
+                for obec_data in chunk
+            ])
+            party_ids = self.dimensions.party_ids(
+                party['code'] for obec_data in chunk for party in obec_data.get('parties', [])
+            )
             
-            # Uložení výsledků stran v obci
-            for party_result in obec_data.get('parties', []):
-                party = self.db.query(Party).filter(
-                    Party.code == party_result['code']
-                ).first()
+            for obec_data in chunk:
+                obec_id = obec_ids[obec_data['code']]
                 
-                if party:
-                    result = Result(
-                        timestamp=raw_data.timestamp,
-                        region_id=obec.id,
-                        party_id=party.id,
-                        votes=party_result['votes']
-                    )
-                    self.db.add(result)
+                # Uložení výsledků stran v obci
+                for party_result in obec_data.get('parties', []):
+                    party_id = party_ids.get(party_result['code'])
+                    
+                    if party_id:
+                        self._add_result(raw_data.timestamp, obec_id, party_id, party_result['votes'])
         
-        self.db.flush()
+        self._write_rows()
     
-    def _process_candidates_results(self, raw_data: RawData):
+    def _process_candidates_results(self, raw_data: RawData, candidates: List[Dict]):
         """
         Zpracování přednostních hlasů kandidátů
         """
-        candidates = self.parser.parse_candidates_results(raw_data.xml_content)
+        for chunk in _chunks(candidates or []):
+            self._store_candidates(raw_data, chunk)
+        
+        self.db.flush()
+    
+    def _store_candidates(self, raw_data: RawData, candidates: List[Dict]):
+        """
+        Uložení skupiny kandidátů, strany a regiony se dohledají najednou
+        """
+        party_ids = self.dimensions.party_ids(cand_data['party_code'] for cand_data in candidates)
+        region_ids = self.dimensions.region_ids(cand_data['region_code'] for cand_data in candidates)
         
         for cand_data in candidates:
-            party = self.db.query(Party).filter(
-                Party.code == cand_data['party_code']
-            ).first()
-            
-            region = self.db.query(Region).filter(
-                Region.code == cand_data['region_code']
-            ).first()
+            party_id = party_ids.get(cand_data['party_code'])
+            region_id = region_ids.get(cand_data['region_code'])
             
-            if party and region:
+            if party_id and region_id:
                 # Kontrola, zda kandidát již existuje
                 candidate = self.db.query(Candidate).filter(
-                    Candidate.party_id == party.id,
-                    Candidate.region_id == region.id,
+                    Candidate.party_id == party_id,
+                    Candidate.region_id == region_id,
                     Candidate.surname == cand_data['surname'],
                     Candidate.name == cand_data['name']
                 ).first()
@@ -271,8 +647,8 @@ class DataAggregator:
                 else:
                     # Vytvoření nového kandidáta
                     candidate = Candidate(
-                        party_id=party.id,
-                        region_id=region.id,
+                        party_id=party_id,
+                        region_id=region_id,
                         name=cand_data['name'],
                         surname=cand_data['surname'],
                         title_before=cand_data['title_before'],
@@ -284,206 +660,289 @@ class DataAggregator:
                         timestamp=raw_data.timestamp
                     )
                     self.db.add(candidate)
-        
-        self.db.flush()
     
-    def _process_zahranici_results(self, raw_data: RawData):
+    def _process_zahranici_results(self, raw_data: RawData, results: Dict):
         """
         Zpracování výsledků ze zahraničí
         """
-        results = self.parser.parse_zahranici_results(raw_data.xml_content)
         if not results:
             return
         
-        # Získání nebo vytvoření regionu pro zahraničí
-        zahranici = self.db.query(Region).filter(
-            Region.code == 'ZAHRANICI'
-        ).first()
-        
-        if not zahranici:
-            zahranici = Region(
-                code='ZAHRANICI',
-                name='Zahraničí',
-                type='zahranici'
-            )
-            self.db.add(zahranici)
-            self.db.flush()
+        # Regiony zahraničí a jednotlivých států
+        region_ids = self.dimensions.ensure_regions(
+            [{'code': 'ZAHRANICI', 'name': 'Zahraničí', 'type': 'zahranici'}] +
+            [{'code': country_data['code'], 'name': country_data['name'], 'type': 'stat',
+              'parent_code': 'ZAHRANICI'} for country_data in results.get('countries', [])]
+        )
+        zahranici_id = region_ids['ZAHRANICI']
+        party_ids = self.dimensions.party_ids(
+            [party['code'] for party in results.get('parties', [])] +
+            [party['code'] for country_data in results.get('countries', [])
+             for party in country_data.get('parties', [])]
+        )
         
         # Uložení celkových výsledků ze zahraničí
         for party_data in results.get('parties', []):
-            party = self.db.query(Party).filter(
-                Party.code == party_data['code']
-            ).first()
+            party_id = party_ids.get(party_data['code'])
             
-            if party:
-                result = Result(
-                    timestamp=raw_data.timestamp,
-                    region_id=zahranici.id,
-                    party_id=party.id,
-                    votes=party_data['votes'],
-                    percentage=party_data['percentage']
-                )
-                self.db.add(result)
+            if party_id:
+                self._add_result(raw_data.timestamp, zahranici_id, party_id,
+                                 party_data['votes'], party_data['percentage'])
         
         # Zpracování jednotlivých států
         for country_data in results.get('countries', []):
-            country = self.db.query(Region).filter(
-                Region.code == country_data['code']
-            ).first()
-            
-            if not country:
-                country = Region(
-                    code=country_data['code'],
-                    name=country_data['name'],
-                    type='stat',
-                    parent_code='ZAHRANICI'
-                )
-                self.db.add(country)
-                self.db.flush()
+            country_id = region_ids[country_data['code']]
             
             # Uložení výsledků stran ve státě
             for party_result in country_data.get('parties', []):
-                party = self.db.query(Party).filter(
-                    Party.code == party_result['code']
-                ).first()
+                party_id = party_ids.get(party_result['code'])
                 
-                if party:
-                    result = Result(
-                        timestamp=raw_data.timestamp,
-                        region_id=country.id,
-                        party_id=party.id,
-                        votes=party_result['votes']
-                    )
-                    self.db.add(result)
+                if party_id:
+                    self._add_result(raw_data.timestamp, country_id, party_id, party_result['votes'])
         
-        self.db.flush()
+        self._write_rows()
     
-    def _process_batch_results(self, raw_data: RawData):
+    def _process_batch_results(self, raw_data: RawData, results: Dict):
         """
         Zpracování dávkových výsledků
         """
-        results = self.parser.parse_batch_results(
-            raw_data.xml_content,
-            raw_data.source_type
-        )
         if not results:
             return
         
-        for item_data in results.get('items', []):
+        items = results.get('items', [])
+        if isinstance(items, RegionColumns):
+            if raw_data.source_type == 'obce':
+                self._process_region_columns(raw_data, items, 'obec', with_percentage=True)
+            items = []
+        
+        for chunk in _chunks(items):
             # Zpracování podle typu dávky
             if raw_data.source_type == 'obce':
-                region = self.db.query(Region).filter(
-                    Region.code == item_data['code']
-                ).first()
-                
-                if not region:
-                    region = Region(
-                        code=item_data['code'],
-                        name=item_data['name'],
-                        type='obec',
-                        parent_code=item_data.get('okres_code')
-                    )
-                    self.db.add(region)
-                    self.db.flush()
+                self._store_obce_items(raw_data, chunk)
+        
+        self._write_rows()
+    
+    def _store_obce_items(self, raw_data: RawData, items: List[Dict]):
+        """
+        Uložení skupiny obcí z dávky, regiony a strany se dohledají najednou
+        """
+        region_ids = self.dimensions.ensure_regions([
+            {'code': item_data['code'], 'name': item_data['name'], 'type': 'obec',
+             'parent_code': item_data.get('okres_code')}
+            for item_data in items
+        ])
+        party_ids = self.dimensions.party_ids(
+            party['code'] for item_data in items for party in item_data.get('parties', [])
+        )
+        
+        for item_data in items:
+            region_id = region_ids[item_data['code']]
+            
+            # Uložení výsledků stran
+            for party_result in item_data.get('parties', []):
+                party_id = party_ids.get(party_result['code'])
                 
-                # Uložení výsledků stran
-                for party_result in item_data.get('parties', []):
-                    party = self.db.query(Party).filter(
-                        Party.code == party_result['code']
-                    ).first()
-                    
-                    if party:
-                        result = Result(
-                            timestamp=raw_data.timestamp,
-                            region_id=region.id,
-                            party_id=party.id,
-                            votes=party_result['votes'],
-                            percentage=party_result.get('percentage', 0)
-                        )
-                        self.db.add(result)
+                if party_id:
+                    self._add_result(raw_data.timestamp, region_id, party_id,
+                                     party_result['votes'], party_result.get('percentage', 0))
+    
+    def _process_region_columns(self, raw_data: RawData, columns: RegionColumns,
+                                region_type: str, with_percentage: bool,
+                                parent_code: Optional[str] = None):
+        """
+        Uložení výsledků mnoha regionů ze sloupcové podoby (RegionColumns)
         
-        self.db.flush()
+        Strany i regiony se dohledají najednou pro celý soubor. Nadřazený
+        region je buď společný (parent_code), nebo podle atributu
+        okres_code každého regionu.
+        """
+        known_parties = self.dimensions.party_ids(columns.party_codes)
+        party_ids = [known_parties.get(code) for code in columns.party_codes]
+        
+        names = columns.region_attrs.get('name', [None] * len(columns.region_codes))
+        parents = columns.region_attrs.get('okres_code', [parent_code] * len(columns.region_codes))
+        known_regions = self.dimensions.ensure_regions([
+            {'code': code, 'name': name, 'type': region_type, 'parent_code': parent}
+            for code, name, parent in zip(columns.region_codes, names, parents)
+        ])
+        region_ids = [known_regions[code] for code in columns.region_codes]
+        
+        rows, cols = columns.cells()
+        votes = columns.votes[rows, cols].tolist()
+        percentages = np.nan_to_num(columns.percentages[rows, cols]).tolist()
+        
+        for row, col, region_votes, percentage in zip(rows.tolist(), cols.tolist(), votes, percentages):
+            if party_ids[col] is None:
+                continue
+            self._add_result(raw_data.timestamp, region_ids[row], party_ids[col],
+                             region_votes, percentage if with_percentage else 0.0)
     
-    def aggregate_by_minute(self):
+    def aggregate_by_minute(self) -> int:
         """
-        Agregace dat po minutách
+        Kontrolní minutová agregace, vrací počet vložených nebo změněných řádků
+        
+        Řádky aggregated_results vznikají už při zpracování (_upsert_aggregated).
+        Tady se znovu přepočítají minuty od hranice (watermark) do minuty
+        nejnovějšího výsledku (čas dat, nejvýše aktuální minuta): pro každou
+        minutu a dvojici region-strana se vezme nejnovější výsledek a k němu
+        nejnovější průběh sčítání regionu ve stejné minutě. Dělá to jeden
+        INSERT ... SELECT s ROW_NUMBER() a ON CONFLICT na každých
+        AGGREGATION_CHUNK_MINUTES minut, každý ve vlastní transakci. Hranice
+        se pak posune na tuto minutu minus AGGREGATION_LATENESS_MINUTES,
+        takže opožděná data z posledních minut se při dalším běhu dopočítají.
+        Hranice se řídí časem dat, ne hodinami, takže funguje i pro přehrávání
+        archivu s původními časovými značkami.
         """
+        global _watermark
+        start = time.perf_counter()
+        inserted = 0
         try:
-            # Získání posledního času agregace
-            last_aggregation = self.db.query(
-                func.max(AggregatedResult.minute)
-            ).scalar()
+            with _watermark_lock:
+                start_time = _watermark
             
-            if last_aggregation:
-                start_time = last_aggregation + timedelta(minutes=1)
-            else:
-                # První agregace - začít od nejstaršího záznamu
-                first_record = self.db.query(
-                    func.min(Result.timestamp)
+            if start_time is None:
+                # První běh v procesu - navázat na poslední agregovanou minutu
+                last_aggregation = self.db.query(
+                    func.max(AggregatedResult.minute)
                 ).scalar()
                 
-                if not first_record:
-                    return
-                
-                start_time = first_record.replace(second=0, microsecond=0)
+                if last_aggregation:
+                    start_time = last_aggregation - timedelta(minutes=config.AGGREGATION_LATENESS_MINUTES)
+                else:
+                    # První agregace - začít od nejstaršího záznamu
+                    first_record = self.db.query(
+                        func.min(Result.timestamp)
+                    ).scalar()
+                    
+                    if not first_record:
+                        return 0
+                    
+                    start_time = first_record.replace(second=0, microsecond=0)
             
-            # Konec je aktuální čas zaokrouhlený dolů na minutu
-            end_time = datetime.now().replace(second=0, microsecond=0)
+            # Konec je minuta nejnovějšího výsledku (včetně této minuty); výsledky
+            # s časem v budoucnosti (posunuté hodiny zdroje) hranici neposunou
+            last_result = self.db.query(func.max(Result.timestamp)).scalar()
+            if last_result is None:
+                return 0
+            end_time = min(last_result, datetime.now()).replace(second=0, microsecond=0)
             
-            current_minute = start_time
+            chunk_start = start_time
+            while chunk_start <= end_time:
+                chunk_end = min(chunk_start + timedelta(minutes=config.AGGREGATION_CHUNK_MINUTES),
+                                end_time + timedelta(minutes=1))
+                inserted += self.db.execute(self._aggregate_statement(chunk_start, chunk_end)).rowcount
+                self.db.commit()
+                chunk_start = chunk_end
             
-            while current_minute <= end_time:
-                next_minute = current_minute + timedelta(minutes=1)
-                
-                # Získání nejnovějších výsledků pro každou kombinaci region-strana v dané minutě
-                results = self.db.query(
-                    Result.region_id,
-                    Result.party_id,
-                    func.max(Result.timestamp).label('max_timestamp')
-                ).filter(
-                    Result.timestamp >= current_minute,
-                    Result.timestamp < next_minute
-                ).group_by(
-                    Result.region_id,
-                    Result.party_id
-                ).all()
-                
-                for region_id, party_id, max_timestamp in results:
-                    # Získání konkrétního výsledku
-                    result = self.db.query(Result).filter(
-                        Result.region_id == region_id,
-                        Result.party_id == party_id,
-                        Result.timestamp == max_timestamp
-                    ).first()
-                    
-                    if result:
-                        # Získání informací o průběhu sčítání
-                        progress = self.db.query(VoteProgress).filter(
-                            VoteProgress.region_id == region_id,
-                            VoteProgress.timestamp >= current_minute,
-                            VoteProgress.timestamp < next_minute
-                        ).order_by(VoteProgress.timestamp.desc()).first()
-                        
-                        # Vytvoření agregovaného záznamu
-                        aggregated = AggregatedResult(
-                            minute=current_minute,
-                            region_id=region_id,
-                            party_id=party_id,
-                            votes=result.votes,
-                            percentage=result.percentage,
-                            counted_districts=progress.counted_districts if progress else 0,
-                            total_districts=progress.total_districts if progress else 0
-                        )
-                        self.db.add(aggregated)
-                
-                current_minute = next_minute
+            with _watermark_lock:
+                watermark = end_time - timedelta(minutes=config.AGGREGATION_LATENESS_MINUTES)
+                if _watermark is None or watermark > _watermark:
+                    _watermark = watermark
             
-            self.db.commit()
-            logger.info(f"Agregace dokončena do {end_time}")
+            logger.info(f"Agregace dokončena do {end_time} ({inserted} řádků, hranice {_watermark})")
+            return inserted
             
         except Exception as e:
             logger.error(f"Chyba při agregaci dat: {e}")
             self.db.rollback()
+            return inserted
+        finally:
+            AGGREGATION_SECONDS.observe(time.perf_counter() - start)
+    
+    @classmethod
+    def _aggregate_statement(cls, start_time: datetime, end_time: datetime):
+        """
+        INSERT ... SELECT ... ON CONFLICT minutové agregace výsledků s časem v [start_time, end_time)
+        """
+        return cls._upsert_aggregated_statement(
+            replace_equal=True, select_rows=cls._aggregate_select(start_time, end_time))
+    
+    @staticmethod
+    def _aggregate_select(start_time: datetime, end_time: datetime):
+        """
+        SELECT nejnovějšího výsledku (a průběhu sčítání) pro každou minutu a dvojici region-strana
+        
+        Minuta se počítá v SQL ze sloupce timestamp ve stejném textovém
+        tvaru, v jakém SQLAlchemy ukládá DateTime do SQLite.
+        """
+        def minute_of(column):
+            return func.strftime('%Y-%m-%d %H:%M:00', column, type_=String) + '.000000'
+        
+        result_minute = minute_of(Result.timestamp)
+        results = select(
+            result_minute.label('minute'),
+            Result.region_id,
+            Result.party_id,
+            Result.votes,
+            Result.percentage,
+            Result.timestamp,
+            func.row_number().over(
+                partition_by=(result_minute, Result.region_id, Result.party_id),
+                order_by=(Result.timestamp.desc(), Result.id)  # při shodném čase první uložený
+            ).label('rank')
+        ).where(
+            Result.timestamp >= start_time,
+            Result.timestamp < end_time
+        ).subquery()
+        
+        progress_minute = minute_of(VoteProgress.timestamp)
+        progress = select(
+            progress_minute.label('minute'),
+            VoteProgress.region_id,
+            VoteProgress.counted_districts,
+            VoteProgress.total_districts,
+            func.row_number().over(
+                partition_by=(progress_minute, VoteProgress.region_id),
+                order_by=(VoteProgress.timestamp.desc(), VoteProgress.id.desc())
+            ).label('rank')
+        ).where(
+            VoteProgress.timestamp >= start_time,
+            VoteProgress.timestamp < end_time
+        ).subquery()
+        
+        latest = select(
+            results.c.minute,
+            results.c.region_id,
+            results.c.party_id,
+            results.c.votes,
+            results.c.percentage,
+            func.coalesce(progress.c.counted_districts, 0),
+            func.coalesce(progress.c.total_districts, 0),
+            results.c.timestamp
+        ).select_from(
+            results.outerjoin(progress, and_(
+                progress.c.minute == results.c.minute,
+                progress.c.region_id == results.c.region_id,
+                progress.c.rank == 1
+            ))
+        ).where(results.c.rank == 1)  # WHERE je nutné kvůli ON CONFLICT za SELECT v SQLite
+        
+        return latest
+    
+    def verify_aggregation(self, start_time: datetime, end_time: datetime) -> List[Tuple]:
+        """
+        Porovnání aggregated_results s přímou agregací výsledků s časem v [start_time, end_time)
+        
+        Vrací rozdílné minuty jako (minuta, region_id, party_id, uložený řádek,
+        spočítaný řádek); chybějící řádek je None. Slouží ke kontrole
+        průběžné agregace, např. po přehrání archivu.
+        """
+        columns = ('votes', 'percentage', 'counted_districts', 'total_districts', 'source_timestamp')
+        expected = {}
+        for row in self.db.execute(self._aggregate_select(start_time, end_time)):
+            minute, region_id, party_id, *values = row
+            expected[(datetime.fromisoformat(minute), region_id, party_id)] = tuple(values)
+        
+        stored = {}
+        first_minute = start_time.replace(second=0, microsecond=0)
+        for row in self.db.query(AggregatedResult).filter(AggregatedResult.minute >= first_minute,
+                                                           AggregatedResult.minute < end_time):
+            stored[(row.minute, row.region_id, row.party_id)] = tuple(getattr(row, column)
+                                                                    for column in columns)
+        
+        return [key + (stored.get(key), expected.get(key))
+                for key in sorted(expected.keys() | stored.keys())
+                if stored.get(key) != expected.get(key)]
     
     def calculate_predictions(self, region_code: str = 'CZ') -> Dict:
         """
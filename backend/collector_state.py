@@ -0,0 +1,46 @@
+import json
+import os
+import logging
+from typing import Dict
+from pathlib import Path
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+
+logger = logging.getLogger(__name__)
+
+class CollectorState:
+    """
+    Trvalé uložení stavu kolektoru do malého JSON souboru
+    """
+
+    def __init__(self, path: Path = config.COLLECTOR_STATE_PATH):
+        self.path = Path(path)
+
+    def load(self) -> Dict:
+        """
+        Načtení uloženého stavu, při chybějícím nebo poškozeném souboru prázdný stav
+        """
+        if not self.path.exists():
+            return {}
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Nepodařilo se načíst stav kolektoru z {self.path}: {e}")
+            return {}
+
+    def save(self, state: Dict):
+        """
+        Atomický zápis stavu (dočasný soubor + přejmenování)
+        """
+        tmp_path = self.path.with_suffix('.tmp')
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Nepodařilo se uložit stav kolektoru do {self.path}: {e}")
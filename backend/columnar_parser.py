@@ -0,0 +1,202 @@
+from array import array
+from datetime import datetime
+import logging
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from backend.xml_parser import XMLParser, XMLSource, parse_raw_xml
+
+logger = logging.getLogger(__name__)
+
+# Typy zdrojů, které umí sloupcový parser číst (soubory s tisíci obcí)
+COLUMNAR_SOURCE_TYPES = ('okres', 'obce')
+
+class RegionColumns(NamedTuple):
+    """
+    Výsledky stran v mnoha regionech jako matice [regiony x strany]
+
+    Řádky odpovídají region_codes, sloupce party_codes. Místo slovníku
+    pro každou dvojici region-strana jsou hlasy a procenta ve dvou
+    maticích a maska present říká, které strany jsou v regionu uvedené.
+    """
+    party_codes: List[str]
+    region_codes: List[str]
+    region_attrs: Dict[str, List[Optional[str]]]  # další atributy regionů (název, nadřazený kód...)
+    votes: np.ndarray  # int64
+    percentages: np.ndarray  # float64, NaN kde procenta v XML nejsou
+    present: np.ndarray  # bool
+
+    @property
+    def party_index(self) -> Dict[str, int]:
+        return {code: index for index, code in enumerate(self.party_codes)}
+
+    def cells(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Indexy (řádky, sloupce) uvedených dvojic region-strana"""
+        return np.nonzero(self.present)
+
+class ColumnarParser:
+    """
+    Jednoprůchodový parser velkých souborů do sloupcové podoby
+
+    Soubor se čte proudově (iterparse) po elementech regionu, hodnoty stran
+    se během průchodu jen sbírají jako řetězce a na čísla se převedou
+    najednou v NumPy (včetně desetinné čárky).
+    """
+
+    def __init__(self):
+        self.xml_parser = XMLParser()
+
+    def _collect(self, xml_content: XMLSource, region_tag: str, code_attr: str,
+                 attrs: Dict[str, str], header_tag: Optional[str] = None) -> Tuple[Dict, RegionColumns]:
+        """
+        Průchod dokumentem; vrací souhrn z elementu header_tag a matice regionů
+
+        Události se generují jen pro konec regionu (a souhrnu), strany regionu
+        se projdou až na hotovém elementu, který se pak hned uvolní.
+        """
+        party_index: Dict[str, int] = {}
+        region_codes: List[str] = []
+        region_attrs: Dict[str, List[Optional[str]]] = {key: [] for key in attrs}
+        rows = array('q')
+        cols = array('q')
+        vote_values: List[str] = []
+        percentage_values: List[str] = []
+        header = {'attrs': {}, 'progress': None, 'parties': []}
+
+        tags = (region_tag, header_tag) if header_tag else region_tag
+
+        for _, elem in self.xml_parser._iterparse(xml_content, events=('end',), tag=tags):
+            if elem.tag == header_tag:
+                # Obce uvnitř souhrnu jsou už uvolněné, zbývají jen jeho vlastní strany
+                header['attrs'] = dict(elem.attrib)
+                ucast = elem.find('.//UCAST')
+                if ucast is not None:
+                    header['progress'] = dict(ucast.attrib)
+                header['parties'] = [dict(strana.attrib) for strana in elem.iter('STRANA')]
+                continue
+
+            row = len(region_codes)
+            region_codes.append(elem.get(code_attr))
+            for key, attr in attrs.items():
+                region_attrs[key].append(elem.get(attr))
+
+            for strana in elem.iter('STRANA'):
+                code = strana.get('KSTRANA')
+                col = party_index.get(code)
+                if col is None:
+                    col = party_index[code] = len(party_index)
+                rows.append(row)
+                cols.append(col)
+                vote_values.append(strana.get('HLASY') or '0')
+                percentage_values.append(strana.get('PROC_HLASU') or 'nan')
+
+            XMLParser._free(elem)
+
+        shape = (len(region_codes), len(party_index))
+        row_index = np.frombuffer(rows, dtype=np.int64)
+        col_index = np.frombuffer(cols, dtype=np.int64)
+
+        votes = np.zeros(shape, dtype=np.int64)
+        percentages = np.full(shape, np.nan)
+        present = np.zeros(shape, dtype=bool)
+        if vote_values:
+            # Převod všech hodnot najednou v NumPy, desetinná čárka se nahradí
+            # jednou pro celý text; chybné číslo vyvolá ValueError
+            votes[row_index, col_index] = np.array(vote_values, dtype=np.int64)
+            percentages[row_index, col_index] = np.array(
+                ' '.join(percentage_values).replace(',', '.').split(), dtype=np.float64)
+            present[row_index, col_index] = True
+
+        return header, RegionColumns(list(party_index), region_codes, region_attrs,
+                                     votes, percentages, present)
+
+    def parse_okres_results(self, xml_content: XMLSource, okres_code: str) -> Dict:
+        """
+        Parsování výsledků za okres, obce v klíči 'obce' jako RegionColumns
+
+        Souhrn okresu má stejnou podobu jako u XMLParser.parse_okres_results.
+        """
+        try:
+            header, obce = self._collect(
+                xml_content, 'OBEC', 'CIS_OBEC',
+                {'name': 'NAZ_OBEC', 'counted': 'ZPRACOVANO'},
+                header_tag='OKRES'
+            )
+
+            results = {
+                'timestamp': datetime.now(),
+                'okres_code': okres_code,
+                'okres_name': header['attrs'].get('NAZ_OKRES', ''),
+                'progress': {},
+                'parties': [],
+                'obce': obce
+            }
+
+            ucast = header['progress']
+            if ucast is not None:
+                results['progress'] = {
+                    'total_districts': int(ucast.get('OKRSKY_CELKEM', 0)),
+                    'counted_districts': int(ucast.get('OKRSKY_ZPRAC', 0)),
+                    'percentage_counted': float(ucast.get('OKRSKY_ZPRAC_PROC', 0)),
+                    'turnout': float(ucast.get('UCAST_PROC', 0))
+                }
+
+            for strana in header['parties']:
+                results['parties'].append({
+                    'code': strana.get('KSTRANA'),
+                    'votes': int(strana.get('HLASY', 0)),
+                    'percentage': float(strana.get('PROC_HLASU', '0').replace(',', '.'))
+                })
+
+            return results
+
+        except ValueError:
+            raise  # chybné číslo - parse_columnar soubor přečte stromově
+        except Exception as e:
+            logger.error(f"Chyba při sloupcovém parsování výsledků okresu {okres_code}: {e}")
+            return {}
+
+    def parse_batch_results(self, xml_content: XMLSource, batch_type: str) -> Dict:
+        """
+        Parsování dávky obcí, položky v klíči 'items' jako RegionColumns
+        """
+        try:
+            _, items = self._collect(
+                xml_content, 'OBEC', 'CIS_OBEC',
+                {'name': 'NAZ_OBEC', 'okres_code': 'CIS_OKRES',
+                 'processed': 'ZPRACOVANO', 'turnout': 'UCAST_PROC'}
+            )
+            return {
+                'timestamp': datetime.now(),
+                'batch_type': batch_type,
+                'items': items
+            }
+
+        except ValueError:
+            raise  # chybné číslo - parse_columnar soubor přečte stromově
+        except Exception as e:
+            logger.error(f"Chyba při sloupcovém parsování dávky typu {batch_type}: {e}")
+            return {}
+
+_default_parser = ColumnarParser()
+
+def parse_columnar(source_type: str, source_identifier: Optional[str],
+                   xml_content: XMLSource, parser: Optional[ColumnarParser] = None) -> Dict:
+    """
+    Sloupcové parsování podle typu zdroje (jen COLUMNAR_SOURCE_TYPES)
+
+    Soubor s hodnotou, kterou nejde převést na číslo, se přečte znovu
+    stromově (parse_raw_xml), aby se kvůli jedné položce neztratil celý.
+    """
+    parser = parser or _default_parser
+    try:
+        if source_type == 'okres':
+            return parser.parse_okres_results(xml_content, source_identifier)
+        return parser.parse_batch_results(xml_content, source_type)
+    except ValueError as e:
+        logger.warning(f"Sloupcové parsování {source_type} {source_identifier or ''} selhalo ({e}), "
+                       f"čtu soubor stromově")
+        if hasattr(xml_content, 'seek'):
+            xml_content.seek(0)
+        return parse_raw_xml(source_type, source_identifier, xml_content, parser.xml_parser)
@@ -1,15 +1,30 @@
 import time
-import requests
+import signal
 import logging
+import threading
 from datetime import datetime
-from typing import Optional, Set
+from typing import Dict, List, Optional, Sequence, Union
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import config
+from sqlalchemy import func
+
 from backend.db_models import RawData, SessionLocal, init_db
-from backend.aggregator import DataAggregator
+from backend.collector_state import CollectorState
+from backend.migrations import upgrade_aggregated_results, upgrade_raw_data
+from backend.raw_store import RawDataPacker, RawDataBuffer
+from backend.scheduler import AdaptiveScheduler
+from backend.pipeline import ProcessingPipeline
+from backend import metrics
+from backend.aggregator import shutdown_parse_pool
+from backend.flight_recorder import FlightRecorder
+from backend.xml_parser import XMLParser
+from backend.fetcher import (
+    ConcurrentFetcher, FeedRequest, FetchResult, STATUS_CHANGED, STATUS_NOT_MODIFIED, STATUS_UNCHANGED,
+    STATUS_CIRCUIT_OPEN
+)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -21,161 +36,440 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Typy dávkových souborů a začátky jejich URL (za ně se přidá číslo dávky)
+BATCH_URL_PATTERNS = {
+    'okrsky': 'okrsky/vysledky_okrsky_',
+    'obce': 'obce_d/vysledky_obce_',
+    'okresy': 'okresy_d/vysledky_okresy_',
+}
+
 class DataCollector:
     """
     Třída pro kontinuální stahování volebních dat
     """
     
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Volby2025-DataCollector/1.0'
-        })
-        self.processed_batches: Set[int] = set()
-        self.last_batch_check = datetime.now()
+        self.fetcher = ConcurrentFetcher()
+        # Číslo poslední uložené dávky pro každý typ dávky zvlášť
+        self.batch_cursors: Dict[str, int] = {batch_type: 0 for batch_type in BATCH_URL_PATTERNS}
+        self.last_successful_cycle: Optional[datetime] = None
+        self.state_store = CollectorState()
+        self.packer = RawDataPacker()
+        self.raw_buffer = RawDataBuffer(self.packer)
+        self.recorder = FlightRecorder()
+        self.pipeline = ProcessingPipeline(self.recorder)
+        # Požadavek na výpis záznamníku (SIGUSR1) a na ukončení (SIGTERM),
+        # obslouží je hlavní smyčka
+        self.dump_requested = False
+        self.stop_requested = False
         
-    def download_xml(self, url: str, max_retries: int = 3) -> Optional[str]:
+        # Otisky krajů z hlavního souboru a otisk kraje při posledním stažení
+        # každého okresu - okres se stahuje, jen když se jeho kraj posunul
+        self.parser = XMLParser()
+        self.kraj_signatures: Dict[str, int] = {}
+        self.okres_signatures: Dict[str, int] = {}
+        
+        # Každý soubor i kontrola každého typu dávek má vlastní interval
+        self.scheduler = AdaptiveScheduler()
+        self.feeds: Dict[str, FeedRequest] = {}
+        for group, feeds in (('main', self.main_feeds()), ('okres', self.okres_feeds())):
+            for feed in feeds:
+                self.feeds[self.feed_key(feed)] = feed
+                self.scheduler.register(self.feed_key(feed), group)
+        for batch_type in BATCH_URL_PATTERNS:
+            self.scheduler.register(self.batch_key(batch_type), 'batch')
+        
+    def save_raw_data(self, source_type: str, xml_content: Union[str, bytes], 
+                     source_identifier: Optional[str] = None, versioned: bool = True,
+                     url: Optional[str] = None) -> bool:
         """
-        Stažení XML dat z URL
+        Zařazení surových XML dat k zápisu do databáze
+        
+        Data čekají ve vyrovnávací paměti a zapíšou se společně s ostatními
+        soubory cyklu při flush_raw_data(), dříve jen při zaplnění paměti.
+        Vrací False, pokud se takto vynucený zápis nepodařil.
         """
-        for attempt in range(max_retries):
-            try:
-                response = self.session.get(url, timeout=10)
-                response.raise_for_status()
-                return response.text
-            except requests.RequestException as e:
-                logger.warning(f"Pokus {attempt + 1}/{max_retries} selhal pro {url}: {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(2 ** attempt)  # Exponenciální backoff
+        if self.raw_buffer.add(source_type, xml_content, source_identifier, versioned, url):
+            return self.flush_raw_data()
+        return True
+    
+    def flush_raw_data(self) -> bool:
+        """
+        Zápis všech čekajících surových dat v jedné transakci
         
-        logger.error(f"Nepodařilo se stáhnout {url} po {max_retries} pokusech")
-        return None
+        Soubory, které se nepodařilo zapsat, se příště stáhnou celé znovu.
+        """
+        pending, pending_bytes = len(self.raw_buffer), self.raw_buffer.pending_bytes
+        if not pending:
+            return True
+        with self.recorder.span('zápis', rows=pending, bytes=pending_bytes) as span:
+            written, failed = self.raw_buffer.flush()
+            span['failed'] = len(failed)
+        for entry in failed:
+            if entry.url:
+                self.fetcher.forget(entry.url)
+        if written:
+            logger.debug(f"Zapsáno {written} surových záznamů")
+        return not failed
     
-    def save_raw_data(self, source_type: str, xml_content: str, 
-                     source_identifier: Optional[str] = None):
+    def main_feeds(self) -> List[FeedRequest]:
         """
-        Uložení surových XML dat do databáze
+        Seznam hlavních souborů stahovaných v každém cyklu
         """
-        db = SessionLocal()
-        try:
-            raw_data = RawData(
-                source_type=source_type,
-                source_identifier=source_identifier,
-                xml_content=xml_content,
-                timestamp=datetime.now(),
-                processed=False
-            )
-            db.add(raw_data)
-            db.commit()
-            logger.debug(f"Uložena data typu {source_type} ({source_identifier})")
-        except Exception as e:
-            logger.error(f"Chyba při ukládání dat: {e}")
-            db.rollback()
-        finally:
-            db.close()
+        return [
+            FeedRequest(source_type, config.URLS[source_type])
+            for source_type in ('main', 'krajmesta', 'zahranici', 'kandidati')
+        ]
     
-    def collect_main_results(self):
+    def okres_feeds(self) -> List[FeedRequest]:
         """
-        Stažení hlavních výsledků
+        Seznam souborů s výsledky všech okresů
         """
-        url = config.URLS['main']
-        xml_content = self.download_xml(url)
-        if xml_content:
-            self.save_raw_data('main', xml_content)
-            logger.info("Staženy hlavní výsledky")
+        return [
+            FeedRequest('okres', f"{config.BASE_URL}/okresy/vysledky_okres_{okres_code}.xml", okres_code)
+            for okres_code in config.OKRES_CODES
+        ]
     
-    def collect_krajmesta_results(self):
+    @staticmethod
+    def feed_key(feed: FeedRequest) -> str:
+        """
+        Klíč souboru v plánovači
         """
-        Stažení výsledků krajských měst
+        if feed.source_identifier is None:
+            return feed.source_type
+        return f"{feed.source_type}:{feed.source_identifier}"
+    
+    @staticmethod
+    def batch_key(batch_type: str) -> str:
+        """
+        Klíč kontroly dávek daného typu v plánovači
+        """
+        return f"batch:{batch_type}"
+    
+    def collect_feeds(self, feeds: List[FeedRequest]) -> int:
+        """
+        Paralelní stažení souborů a uložení úspěšně stažených dat
+        
+        Výsledek každého souboru se předá plánovači, který podle něj
+        zkrátí nebo prodlouží interval jeho dalšího stažení.
         """
-        url = config.URLS['krajmesta']
-        xml_content = self.download_xml(url)
-        if xml_content:
-            self.save_raw_data('krajmesta', xml_content)
-            logger.info("Staženy výsledky krajských měst")
+        start = time.time()
+        fetch_started = time.monotonic()
+        results = self.fetcher.fetch_all(feeds)
+        self.record_fetches(results, fetch_started)
+        
+        # Ukládání probíhá v hlavním vlákně, aby SQLite zapisoval jen jeden writer;
+        # změněné soubory čekají na společný zápis na konci cyklu (flush_raw_data).
+        # Nezměněné soubory se neukládají, a tedy ani znovu nezpracovávají.
+        saved = 0
+        main_content = None
+        unsigned = []  # okresy bez známého otisku kraje (první cyklus)
+        for result in results:
+            if result.status == STATUS_CHANGED:
+                if self.save_raw_data(result.feed.source_type, result.content,
+                                      result.feed.source_identifier, url=result.feed.url):
+                    saved += 1
+                if result.feed.source_type == 'main':
+                    main_content = result.content
+            
+            # Okres stažený ve stejném cyklu jako nový hlavní soubor dostane
+            # otisk kraje z doby před ním, takže se v dalším cyklu stáhne znovu
+            if result.feed.source_type == 'okres' and result.status in (
+                    STATUS_CHANGED, STATUS_NOT_MODIFIED, STATUS_UNCHANGED):
+                kraj = self.okres_kraj(result.feed.source_identifier)
+                if kraj in self.kraj_signatures:
+                    self.okres_signatures[result.feed.source_identifier] = self.kraj_signatures[kraj]
+                else:
+                    unsigned.append(result.feed.source_identifier)
+            
+            key = self.feed_key(result.feed)
+            if key in self.scheduler.feeds:
+                self.scheduler.record(key, result.status == STATUS_CHANGED)
+        
+        if main_content is not None:
+            self.trigger_okres_feeds(main_content, unsigned)
+        
+        skipped = sum(1 for r in results if r.status in (STATUS_NOT_MODIFIED, STATUS_UNCHANGED))
+        circuit_open = sum(1 for r in results if r.status == STATUS_CIRCUIT_OPEN)
+        logger.info(f"Staženo {saved}/{len(feeds)} změněných souborů "
+                    f"({skipped} beze změny, {circuit_open} s otevřeným jističem) "
+                    f"za {time.time() - start:.2f}s")
+        return saved
     
-    def collect_zahranici_results(self):
+    def record_fetches(self, results: List[FetchResult], started: float):
         """
-        Stažení výsledků ze zahraničí
+        Zápis stažení do záznamníku cyklu (doba, velikost, počet pokusů)
+        
+        Přesný začátek jednotlivých stažení se neukládá, použije se začátek fetch_all.
         """
-        url = config.URLS['zahranici']
-        xml_content = self.download_xml(url)
-        if xml_content:
-            self.save_raw_data('zahranici', xml_content)
-            logger.info("Staženy výsledky ze zahraničí")
+        for result in results:
+            self.recorder.record(
+                'stažení', result.elapsed, started,
+                feed=result.feed.source_identifier or result.feed.source_type,
+                status=result.status, attempts=result.attempts,
+                bytes=len(result.content) if result.content is not None else 0
+            )
     
-    def collect_candidates_results(self):
+    @staticmethod
+    def okres_kraj(okres_code: str) -> str:
         """
-        Stažení přednostních hlasů kandidátů
+        NUTS kód kraje okresu (CZ0201 -> CZ020)
         """
-        url = config.URLS['kandidati']
-        xml_content = self.download_xml(url)
-        if xml_content:
-            self.save_raw_data('kandidati', xml_content)
-            logger.info("Staženy přednostní hlasy kandidátů")
+        return okres_code[:5]
     
-    def collect_okres_results(self):
+    def trigger_okres_feeds(self, main_content: bytes, unsigned: Sequence[str] = ()) -> int:
         """
-        Stažení výsledků všech okresů
+        Naplánování okresů, jejichž kraj se v hlavním souboru posunul
+        
+        Okres se stáhne v příštím cyklu, pokud se otisk jeho kraje liší od
+        otisku při jeho posledním stažení. Ostatní okresy se stahují jen
+        v pomalém intervalu skupiny 'okres' (config.POLL_INTERVALS).
+        Okresy z `unsigned`, stažené ve stejném cyklu, když otisk jejich
+        kraje ještě nebyl známý, dostanou otisk z tohoto hlavního souboru,
+        aby se hned po startu nestahovaly podruhé. Vrací počet
+        naplánovaných okresů.
         """
-        for okres_code in config.OKRES_CODES:
-            url = f"{config.BASE_URL}/okresy/vysledky_okres_{okres_code}.xml"
-            xml_content = self.download_xml(url)
-            if xml_content:
-                self.save_raw_data('okres', xml_content, okres_code)
+        with self.recorder.span('posun krajů') as span:
+            signatures = self.parser.kraj_signatures(main_content)
+            moved = {kraj for kraj, signature in signatures.items()
+                     if self.kraj_signatures.get(kraj) != signature}
+            self.kraj_signatures = signatures
+            for okres_code in unsigned:
+                kraj = self.okres_kraj(okres_code)
+                if kraj in signatures:
+                    self.okres_signatures[okres_code] = signatures[kraj]
+            
+            triggered = 0
+            for okres_code in config.OKRES_CODES:
+                kraj = self.okres_kraj(okres_code)
+                if kraj in signatures and self.okres_signatures.get(okres_code) != signatures[kraj]:
+                    key = f"okres:{okres_code}"
+                    if key in self.scheduler.feeds:
+                        self.scheduler.trigger(key)
+                        triggered += 1
+            span.update(kraje=len(moved), okresy=triggered)
         
-        logger.info(f"Staženy výsledky {len(config.OKRES_CODES)} okresů")
+        if triggered:
+            logger.info(f"Posun sčítání v {len(moved)} krajích, okresů ke stažení: {triggered}")
+        return triggered
     
-    def collect_batch_results(self):
+    def batch_url(self, batch_type: str, batch_num: int) -> str:
         """
-        Stažení dávkových souborů (okrsky, obce, okresy)
+        URL dávkového souboru daného typu a čísla
         """
-        batch_types = [
-            ('okrsky', 'okrsky/vysledky_okrsky_'),
-            ('obce', 'obce_d/vysledky_obce_'),
-            ('okresy', 'okresy_d/vysledky_okresy_')
-        ]
+        return f"{config.BASE_URL}/{BATCH_URL_PATTERNS[batch_type]}{str(batch_num).zfill(5)}.xml"
+    
+    def find_batch_frontier(self, batch_type: str) -> int:
+        """
+        Nalezení čísla poslední zveřejněné dávky daného typu
         
-        for batch_type, url_pattern in batch_types:
-            # Zkusit stáhnout nové dávky
-            for batch_num in range(1, config.MAX_BATCH_NUMBER + 1):
-                if batch_num in self.processed_batches:
-                    continue
-                
-                batch_str = str(batch_num).zfill(5)
-                url = f"{config.BASE_URL}/{url_pattern}{batch_str}.xml"
-                
-                xml_content = self.download_xml(url)
-                if xml_content:
-                    self.save_raw_data(batch_type, xml_content, batch_str)
-                    self.processed_batches.add(batch_num)
-                    logger.info(f"Stažena dávka {batch_type} č. {batch_num}")
+        Od kurzoru se zkouší exponenciálně rostoucí skoky (+1, +2, +4, ...)
+        a hranice se pak dohledá binárním půlením. Bez nových dávek to stojí
+        jeden HEAD požadavek, při N nových dávkách O(log N) požadavků.
+        """
+        cursor = self.batch_cursors[batch_type]
+        found = cursor  # poslední číslo, o kterém víme, že existuje
+        missing = None  # první číslo, o kterém víme, že neexistuje
+        step = 1
+        
+        with self.recorder.span('hledání dávek', batch_type=batch_type) as span:
+            span['probes'] = 0
+            
+            def exists(batch_num: int) -> bool:
+                span['probes'] += 1
+                return self.fetcher.exists(self.batch_url(batch_type, batch_num))
+            
+            while found < config.MAX_BATCH_NUMBER:
+                probe = min(cursor + step, config.MAX_BATCH_NUMBER)
+                if exists(probe):
+                    found = probe
+                    step *= 2
                 else:
-                    # Pokud dávka neexistuje, přestat hledat další
+                    missing = probe
                     break
+            
+            while missing is not None and missing - found > 1:
+                middle = (found + missing) // 2
+                if exists(middle):
+                    found = middle
+                else:
+                    missing = middle
+            
+            span['frontier'] = found
+        
+        return found
     
-    def process_and_aggregate(self):
+    def _download_batches(self, batch_type: str, first: int, last: int) -> bool:
         """
-        Zpracování a agregace dat
+        Paralelní stažení dávek first..last a jejich uložení popořadě
+        
+        Souvislá řada stažených dávek se zapíše v jedné transakci (spolu s
+        ostatními čekajícími soubory) a kurzor se posune až po úspěšném
+        zápisu, aby se po chybě žádná dávka nepřeskočila ani neuložila dvakrát.
         """
+        feeds = [
+            FeedRequest(batch_type, self.batch_url(batch_type, num), str(num).zfill(5))
+            for num in range(first, last + 1)
+        ]
+        
+        stored = None
+        fetch_started = time.monotonic()
+        results = self.fetcher.fetch_all(feeds, conditional=False)
+        self.record_fetches(results, fetch_started)
+        for result in results:
+            batch_str = result.feed.source_identifier
+            if result.status != STATUS_CHANGED:
+                logger.warning(f"Dávku {batch_type} č. {batch_str} se nepodařilo stáhnout, "
+                               f"zkusí se znovu při další kontrole")
+                break
+            # Dávky skupiny se přidají všechny a zapíšou najednou, i když tím
+            # vyrovnávací paměť na chvíli překročí svou mez
+            self.raw_buffer.add(batch_type, result.content, batch_str, versioned=False, url=result.feed.url)
+            stored = batch_str
+        
+        if not self.flush_raw_data():
+            logger.warning(f"Dávky {batch_type} č. {first}-{last} se nepodařilo uložit, "
+                           f"zkusí se znovu při další kontrole")
+            return False
+        if stored is not None:
+            self.batch_cursors[batch_type] = int(stored)
+        return stored == str(last).zfill(5)
+    
+    def collect_batch_type(self, batch_type: str) -> int:
+        """
+        Stažení nových dávek jednoho typu, vrací počet uložených dávek
+        
+        Každý typ dávky má vlastní kurzor s číslem poslední uložené dávky.
+        """
+        cursor = self.batch_cursors[batch_type]
+        frontier = self.find_batch_frontier(batch_type)
+        if frontier <= cursor:
+            return 0
+        
+        logger.info(f"Nové dávky {batch_type}: {cursor + 1}-{frontier}")
+        
+        for chunk_start in range(cursor + 1, frontier + 1, config.BATCH_DOWNLOAD_CHUNK):
+            chunk_end = min(chunk_start + config.BATCH_DOWNLOAD_CHUNK - 1, frontier)
+            if not self._download_batches(batch_type, chunk_start, chunk_end):
+                break
+        
+        logger.info(f"Staženy dávky {batch_type} do č. {self.batch_cursors[batch_type]}")
+        return self.batch_cursors[batch_type] - cursor
+    
+    def collect_batch_results(self):
+        """
+        Stažení nových dávkových souborů (okrsky, obce, okresy)
+        """
+        for batch_type in BATCH_URL_PATTERNS:
+            self.collect_batch_type(batch_type)
+        self.flush_raw_data()
+    
+    def restore_state(self):
+        """
+        Obnovení kurzorů dávek, validátorů a hashů z předchozího běhu
+        
+        Kurzory dávek se navíc porovnají s tabulkou raw_data, takže ani bez
+        stavového souboru se už uložené dávky nestahují znovu.
+        """
+        state = self.state_store.load()
+        
+        for batch_type, cursor in state.get('batch_cursors', {}).items():
+            if batch_type in self.batch_cursors:
+                self.batch_cursors[batch_type] = max(self.batch_cursors[batch_type], int(cursor))
+        
         db = SessionLocal()
         try:
-            aggregator = DataAggregator(db)
-            
-            # Zpracování surových dat
-            aggregator.process_raw_data()
-            
-            # Agregace po minutách
-            aggregator.aggregate_by_minute()
-            
-            db.commit()
-            logger.info("Data zpracována a agregována")
+            stored = db.query(
+                RawData.source_type,
+                func.max(RawData.source_identifier)
+            ).filter(
+                RawData.source_type.in_(list(BATCH_URL_PATTERNS))
+            ).group_by(RawData.source_type).all()
             
+            # Čísla dávek jsou doplněná nulami, takže stačí textové maximum
+            for batch_type, max_identifier in stored:
+                if max_identifier and max_identifier.isdigit():
+                    self.batch_cursors[batch_type] = max(self.batch_cursors[batch_type], int(max_identifier))
         except Exception as e:
-            logger.error(f"Chyba při zpracování dat: {e}")
-            db.rollback()
+            logger.error(f"Chyba při čtení uložených dávek: {e}")
         finally:
             db.close()
+        
+        self.fetcher.restore_state(state.get('fetcher', {}))
+        
+        # Otisky krajů patří k validátorům hlavního souboru uloženým spolu
+        # s nimi. Bez nich (starší stavový soubor) by hlavní soubor vrátil
+        # 304 a žádný kraj by se nejevil jako posunutý - stáhne se tedy celý.
+        if 'kraj_signatures' in state:
+            self.kraj_signatures = {kraj: int(signature) for kraj, signature
+                                    in state['kraj_signatures'].items()}
+            self.okres_signatures = {okres: int(signature) for okres, signature
+                                     in state.get('okres_signatures', {}).items()}
+        else:
+            self.fetcher.forget(config.URLS['main'])
+        
+        if state.get('last_successful_cycle'):
+            self.last_successful_cycle = datetime.fromisoformat(state['last_successful_cycle'])
+            logger.info(f"Obnoven stav kolektoru, poslední úspěšný cyklus {self.last_successful_cycle}")
+        
+        logger.info(f"Kurzory dávek: {self.batch_cursors}")
+    
+    def save_state(self):
+        """
+        Uložení stavu kolektoru pro případný restart
+        """
+        self.state_store.save({
+            'batch_cursors': self.batch_cursors,
+            'fetcher': self.fetcher.export_state(),
+            'kraj_signatures': self.kraj_signatures,
+            'okres_signatures': self.okres_signatures,
+            'last_successful_cycle': (self.last_successful_cycle.isoformat()
+                                      if self.last_successful_cycle else None),
+        })
+    
+    def start_metrics(self):
+        """
+        Zpřístupnění metrik na samostatném portu (config.COLLECTOR_METRICS_PORT)
+        """
+        if not config.COLLECTOR_METRICS_PORT:
+            return
+        try:
+            metrics.start_http_server(config.COLLECTOR_METRICS_PORT)
+        except OSError as e:
+            logger.warning(f"Metriky nelze zpřístupnit na portu {config.COLLECTOR_METRICS_PORT}: {e}")
+    
+    def write_metrics_textfile(self):
+        """
+        Zápis metrik do souboru pro textfile collector (config.COLLECTOR_METRICS_TEXTFILE)
+        """
+        try:
+            metrics.write_textfile(config.COLLECTOR_METRICS_TEXTFILE)
+        except OSError as e:
+            logger.warning(f"Chyba při zápisu metrik do {config.COLLECTOR_METRICS_TEXTFILE}: {e}")
+    
+    def request_dump(self, signum=None, frame=None):
+        """Obsluha SIGUSR1 - výpis záznamníku proběhne na konci cyklu"""
+        self.dump_requested = True
+    
+    def request_stop(self, signum=None, frame=None):
+        """Obsluha SIGTERM - smyčka doběhne rozpracovaný cyklus a skončí"""
+        logger.info("Přijat SIGTERM, sběr dat se ukončí po dokončení cyklu")
+        self.stop_requested = True
+    
+    def shutdown(self):
+        """
+        Ukončení sběru (Ctrl+C i SIGTERM)
+        
+        Zapíše surová data čekající ve vyrovnávací paměti a stav, zastaví
+        stahování, vlákna zpracování i pool parsování a vypíše záznamník cyklů.
+        """
+        self.flush_raw_data()
+        self.save_state()
+        self.fetcher.shutdown()
+        self.pipeline.stop()
+        shutdown_parse_pool()
+        self.recorder.end_cycle()
+        self.recorder.dump(config.FLIGHT_RECORDER_DUMP)
     
     def run_forever(self):
         """
@@ -183,34 +477,72 @@ class DataCollector:
         """
         logger.info("Spuštěn sběr dat")
         
-        # Inicializace databáze
+        # Inicializace databáze a obnovení stavu z předchozího běhu
         init_db()
+        upgrade_raw_data()
+        upgrade_aggregated_results()
+        self.restore_state()
+        
+        # Zpracování a agregace běží ve vlastních vláknech
+        self.pipeline.start()
+        self.start_metrics()
+        
+        # Výpis záznamníku cyklů na vyžádání: kill -USR1 <pid>. Obsluha signálu
+        # jen nastaví příznak - hlavní vlákno může právě držet zámek záznamníku.
+        if hasattr(signal, 'SIGUSR1') and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGUSR1, self.request_dump)
+        # Ukončení službou (systemd, docker stop) stejnou cestou jako Ctrl+C
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.request_stop)
         
         iteration = 0
+        last_state_save = time.time()
+        last_metrics_write = 0.0
         
-        while True:
+        while not self.stop_requested:
             try:
                 start_time = time.time()
+                self.recorder.begin_cycle()
+                self.fetcher.new_cycle()
                 
-                # Stažení všech typů dat
-                self.collect_main_results()
-                self.collect_krajmesta_results()
-                self.collect_zahranici_results()
-                self.collect_candidates_results()
+                # Paralelní stažení souborů, na které podle plánovače přišla řada
+                due = set(self.scheduler.due())
+                feeds = [feed for key, feed in self.feeds.items() if key in due]
+                saved = self.collect_feeds(feeds) if feeds else 0
                 
-                # Stažení okresů (méně často)
-                if iteration % 10 == 0:
-                    self.collect_okres_results()
+                # Kontrola nových dávek, každý typ podle vlastního intervalu
+                batches_checked = False
+                for batch_type in BATCH_URL_PATTERNS:
+                    key = self.batch_key(batch_type)
+                    if key in due:
+                        stored = self.collect_batch_type(batch_type)
+                        self.scheduler.record(key, stored > 0)
+                        saved += stored
+                        batches_checked = True
                 
-                # Kontrola dávkových souborů (každých 60 sekund)
-                current_time = datetime.now()
-                if (current_time - self.last_batch_check).total_seconds() > config.BATCH_CHECK_INTERVAL:
-                    self.collect_batch_results()
-                    self.last_batch_check = current_time
+                # Všechny soubory cyklu v jedné transakci; stav se ukládá až po
+                # zápisu, aby validátory nepředběhly data v databázi
+                self.flush_raw_data()
+                if batches_checked:
+                    with self.recorder.span('stav'):
+                        self.save_state()
                 
-                # Zpracování a agregace každých 30 sekund
-                if iteration % 30 == 0:
-                    self.process_and_aggregate()
+                # Nová surová data předat ke zpracování, bez čekání na výsledek
+                self.pipeline.notify(saved, time.time() - start_time)
+                
+                self.last_successful_cycle = datetime.now()
+                if time.time() - last_state_save >= config.STATE_SAVE_INTERVAL:
+                    self.save_state()
+                    last_state_save = time.time()
+                if (config.COLLECTOR_METRICS_TEXTFILE and
+                        time.time() - last_metrics_write >= config.METRICS_TEXTFILE_INTERVAL):
+                    self.write_metrics_textfile()
+                    last_metrics_write = time.time()
+                
+                self.recorder.end_cycle()
+                if self.dump_requested:
+                    self.dump_requested = False
+                    self.recorder.dump(config.FLIGHT_RECORDER_DUMP)
                 
                 # Vypočítat čas do dalšího stažení
                 elapsed = time.time() - start_time
@@ -225,13 +557,21 @@ class DataCollector:
                 # Log stavu každých 100 iterací
                 if iteration % 100 == 0:
                     logger.info(f"Dokončeno {iteration} iterací sběru dat")
+                    logger.info(f"Statistika stahování: {self.fetcher.format_stats()}")
+                    logger.info(f"Intervaly stahování: {self.scheduler.format_stats()}")
+                    logger.info(f"Stupně zpracování: {self.pipeline.format_stats()}")
+                    logger.info(f"Zápis surových dat: {self.raw_buffer.format_stats()}")
+                    logger.info(f"Doba cyklů: {self.recorder.format_summary()}")
                     
             except KeyboardInterrupt:
                 logger.info("Sběr dat ukončen uživatelem")
                 break
             except Exception as e:
                 logger.error(f"Neočekávaná chyba v hlavní smyčce: {e}")
+                self.recorder.end_cycle()
                 time.sleep(5)  # Počkat před dalším pokusem
+        
+        self.shutdown()
 
 def main():
     """
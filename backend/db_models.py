@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, Boolean, ForeignKey, Index
+from sqlalchemy import create_engine, event, Column, Integer, String, Float, DateTime, Text, Boolean, ForeignKey, Index, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
@@ -13,13 +13,19 @@ class RawData(Base):
     id = Column(Integer, primary_key=True)
     source_type = Column(String(50), nullable=False)  # main, okres, krajmesta, zahranici, kandidati, okrsky, obce
     source_identifier = Column(String(50))  # kód okresu, číslo dávky atd.
-    xml_content = Column(Text, nullable=False)
+    xml_content = Column(Text)  # nekomprimované XML (jen záznamy s codec 'plain')
+    codec = Column(String(10), nullable=False, default='plain')  # plain, zlib, zstd, file, delta
+    payload = Column(LargeBinary)  # komprimované XML (u codec 'file' prázdné, u 'delta' rozdíl)
+    content_hash = Column(String(64))  # SHA-256 nekomprimovaného XML, u 'file' i název souboru
+    size = Column(Integer)  # velikost nekomprimovaného XML v bajtech
+    base_hash = Column(String(64))  # u codec 'delta' hash předchozí verze, proti které je rozdíl
     timestamp = Column(DateTime, default=datetime.now, nullable=False)
     processed = Column(Boolean, default=False)
     
     __table_args__ = (
         Index('idx_raw_data_timestamp', 'timestamp'),
         Index('idx_raw_data_source', 'source_type', 'source_identifier'),
+        Index('idx_raw_data_hash', 'content_hash'),
     )
 
 class Party(Base):
@@ -101,6 +107,7 @@ class AggregatedResult(Base):
     percentage = Column(Float, default=0.0)
     counted_districts = Column(Integer, default=0)
     total_districts = Column(Integer, default=0)
+    source_timestamp = Column(DateTime)  # čas výsledku, ze kterého řádek pochází (novější vyhrává)
     
     region = relationship('Region')
     party = relationship('Party')
@@ -139,6 +146,19 @@ class Candidate(Base):
 engine = create_engine(config.DATABASE_URL, pool_size=config.POOL_SIZE, max_overflow=config.MAX_OVERFLOW)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+if engine.dialect.name == 'sqlite':
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        """
+        WAL dovolí číst během zápisu a busy_timeout nechá souběžné zapisovače
+        (stahování, zpracování, agregace) počkat na zámek místo chyby
+        """
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f'PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT * 1000}')
+        cursor.close()
+
 def init_db():
     """Inicializace databáze"""
     Base.metadata.create_all(bind=engine)
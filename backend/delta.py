@@ -0,0 +1,87 @@
+import struct
+import difflib
+from typing import List
+
+# XML se porovnává po tokenech zakončených znakem '>' (jeden tag = jeden token),
+# po spojení přes b'>' vznikne přesně původní dokument
+TOKEN_SEPARATOR = b'>'
+
+OP_COPY = b'C'  # zkopírovat tokeny z předchozí verze: začátek, počet
+OP_INSERT = b'I'  # vložit nové tokeny: počet tokenů, délka dat, data
+
+_COPY = struct.Struct('>II')
+_INSERT = struct.Struct('>II')
+
+def _tokens(data: bytes) -> List[bytes]:
+    return data.split(TOKEN_SEPARATOR)
+
+def _encode_copy(out: List[bytes], start: int, count: int):
+    if count:
+        out.append(OP_COPY + _COPY.pack(start, count))
+
+def _encode_insert(out: List[bytes], tokens: List[bytes]):
+    if tokens:
+        data = TOKEN_SEPARATOR.join(tokens)
+        out.append(OP_INSERT + _INSERT.pack(len(tokens), len(data)) + data)
+
+def make_delta(old: bytes, new: bytes) -> bytes:
+    """
+    Rozdíl mezi dvěma verzemi XML dokumentu
+
+    Po sobě jdoucí snapshoty mají obvykle stejnou strukturu a liší se jen
+    hodnotami atributů; pak stačí rychlé porovnání token po tokenu. Při
+    změně struktury se použije obecné porovnání z difflib.
+    """
+    old_tokens = _tokens(old)
+    new_tokens = _tokens(new)
+    out: List[bytes] = []
+
+    if len(old_tokens) == len(new_tokens):
+        run_start = 0
+        index = 0
+        count = len(new_tokens)
+        while index < count:
+            if old_tokens[index] == new_tokens[index]:
+                index += 1
+                continue
+            _encode_copy(out, run_start, index - run_start)
+            changed_start = index
+            while index < count and old_tokens[index] != new_tokens[index]:
+                index += 1
+            _encode_insert(out, new_tokens[changed_start:index])
+            run_start = index
+        _encode_copy(out, run_start, count - run_start)
+        return b''.join(out)
+
+    matcher = difflib.SequenceMatcher(None, old_tokens, new_tokens)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            _encode_copy(out, i1, i2 - i1)
+        elif tag in ('replace', 'insert'):
+            _encode_insert(out, new_tokens[j1:j2])
+    return b''.join(out)
+
+def apply_delta(old: bytes, delta: bytes) -> bytes:
+    """
+    Sestavení nové verze dokumentu z předchozí verze a rozdílu
+    """
+    old_tokens = _tokens(old)
+    new_tokens: List[bytes] = []
+    position = 0
+
+    while position < len(delta):
+        op = delta[position:position + 1]
+        position += 1
+        if op == OP_COPY:
+            start, count = _COPY.unpack_from(delta, position)
+            position += _COPY.size
+            new_tokens.extend(old_tokens[start:start + count])
+        elif op == OP_INSERT:
+            count, length = _INSERT.unpack_from(delta, position)
+            position += _INSERT.size
+            new_tokens.extend(_tokens(delta[position:position + length]))
+            position += length
+        else:
+            raise ValueError(f"Neplatná operace v rozdílu: {op!r}")
+
+    return TOKEN_SEPARATOR.join(new_tokens)
@@ -0,0 +1,176 @@
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from backend.db_models import Party, Region
+
+logger = logging.getLogger(__name__)
+
+# Max. počet kódů v jednom IN (...) / INSERT, pod limitem proměnných SQLite
+CHUNK_SIZE = 500
+
+# Potvrzená id podle kódu, sdílená všemi session procesu (každé zpracování
+# v pipeline má vlastní session, strany a regiony se ale nemění)
+_committed_ids: Dict[type, Dict[str, int]] = {Party: {}, Region: {}}
+_committed_lock = threading.Lock()
+
+def invalidate_dimensions():
+    """
+    Zapomenutí všech kódů (po smazání stran nebo regionů v tomto procesu;
+    změny z jiného procesu zachytí DimensionCache.refresh)
+    """
+    with _committed_lock:
+        for ids in _committed_ids.values():
+            ids.clear()
+
+class DimensionCache:
+    """
+    Převod kódů stran a regionů na id bez dotazu pro každý řádek
+
+    Známé kódy se drží v paměti. Chybějící se pro celý soubor dohledají
+    jedním dotazem a nové se vloží hromadně (INSERT ... ON CONFLICT DO
+    NOTHING), takže existující záznam se nepřepíše, jako dřív při
+    vytváření přes ORM. Id zjištěná v neukončené transakci session se
+    po rollbacku zahodí, po commitu se přidají mezi potvrzená sdílená
+    celým procesem.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.ids = _committed_ids
+        self.pending: Dict[type, Dict[str, int]] = {Party: {}, Region: {}}
+        self.created = 0  # vložené strany a regiony (metrika vložených řádků)
+        self.lookups = 0  # dotazy do databáze
+        self.reloads = 0  # nová načtení celé tabulky po změně jiným procesem
+        event.listen(self.db, 'after_commit', self._after_commit)
+        event.listen(self.db, 'after_rollback', self._after_rollback)
+
+    def _after_commit(self, session):
+        with _committed_lock:
+            for model, pending in self.pending.items():
+                self.ids[model].update(pending)
+                pending.clear()
+
+    def _after_rollback(self, session):
+        for pending in self.pending.values():
+            pending.clear()
+
+    def refresh(self):
+        """
+        Kontrola, že potvrzená id odpovídají tabulkám stran a regionů
+
+        Počet, součet a maximum id v tabulce se porovnají s potvrzenými id.
+        Když nesouhlasí (strany nebo regiony smazal, vytvořil znovu nebo
+        přidal jiný proces), načte se celá tabulka znovu a potvrzená id jsou
+        pak přesně její obsah. Volá se na začátku každé skupiny záznamů,
+        mimo rozpracovanou transakci se zápisy.
+        """
+        for model in (Party, Region):
+            self.lookups += 1
+            signature = tuple(self.db.execute(select(
+                func.count(model.id), func.coalesce(func.sum(model.id), 0),
+                func.coalesce(func.max(model.id), 0)
+            )).one())
+            with _committed_lock:
+                ids = self.ids[model].values()
+                if (len(ids), sum(ids), max(ids, default=0)) == signature:
+                    continue
+
+            self.lookups += 1
+            rows = self.db.execute(select(model.code, model.id)).all()
+            with _committed_lock:
+                known = len(self.ids[model])
+                self.ids[model].clear()
+                self.ids[model].update(rows)
+            self.pending[model].clear()
+            self.reloads += 1
+            if known:
+                logger.info(f"Tabulka {model.__tablename__} se změnila mimo tento proces, "
+                            f"načteno znovu {len(rows)} kódů (dříve {known})")
+
+    def _known(self, model: type, code: str) -> Optional[int]:
+        return self.ids[model].get(code) or self.pending[model].get(code)
+
+    def _select(self, model: type, codes: Sequence[str]) -> Dict[str, int]:
+        """Id existujících kódů, po CHUNK_SIZE kódech na dotaz"""
+        found = {}
+        for start in range(0, len(codes), CHUNK_SIZE):
+            chunk = codes[start:start + CHUNK_SIZE]
+            self.lookups += 1
+            found.update(self.db.execute(
+                select(model.code, model.id).where(model.code.in_(chunk))
+            ).all())
+        return found
+
+    def _resolve(self, model: type, codes: Iterable[str], create: Optional[List[Dict]] = None) -> Dict[str, int]:
+        """
+        Id kódů; s `create` se chybějící záznamy nejdřív vloží
+
+        Nepotvrzená id se vedou zvlášť - vznikla v této transakci, nebo
+        v ní byla poprvé přečtena.
+        """
+        codes = [code for code in dict.fromkeys(codes) if code is not None]
+        missing = [code for code in codes if self._known(model, code) is None]
+        if missing:
+            if create:
+                missing_set = set(missing)
+                rows = {}
+                for row in create:
+                    if row['code'] in missing_set and row['code'] not in rows:
+                        rows[row['code']] = row
+                values = list(rows.values())
+                for start in range(0, len(values), CHUNK_SIZE):
+                    result = self.db.execute(
+                        sqlite_insert(model).values(values[start:start + CHUNK_SIZE])
+                        .on_conflict_do_nothing(index_elements=['code'])
+                    )
+                    self.created += max(result.rowcount, 0)
+            self.pending[model].update(self._select(model, missing))
+
+        resolved = {}
+        for code in codes:
+            row_id = self._known(model, code)
+            if row_id is not None:
+                resolved[code] = row_id
+        return resolved
+
+    def party_ids(self, codes: Iterable[str]) -> Dict[str, int]:
+        """Id existujících stran podle kódu (neznámé kódy ve výsledku chybí)"""
+        return self._resolve(Party, codes)
+
+    def ensure_parties(self, parties: List[Dict]) -> Dict[str, int]:
+        """
+        Id stran podle kódu, chybějící se vytvoří (code, name, number)
+        """
+        rows = [{'code': party['code'], 'name': party['name'], 'number': party.get('number')}
+                for party in parties]
+        return self._resolve(Party, [row['code'] for row in rows], rows)
+
+    def region_ids(self, codes: Iterable[str]) -> Dict[str, int]:
+        """Id existujících regionů podle kódu (neznámé kódy ve výsledku chybí)"""
+        return self._resolve(Region, codes)
+
+    def ensure_regions(self, regions: List[Dict]) -> Dict[str, int]:
+        """
+        Id regionů podle kódu, chybějící se vytvoří (code, name, type, parent_code)
+        """
+        rows = [{'code': region['code'], 'name': region['name'], 'type': region['type'],
+                 'parent_code': region.get('parent_code')} for region in regions]
+        return self._resolve(Region, [row['code'] for row in rows], rows)
+
+    def ensure_region(self, code: str, name: str, region_type: str,
+                      parent_code: Optional[str] = None) -> int:
+        """Id jednoho regionu, chybějící se vytvoří"""
+        return self.ensure_regions([{'code': code, 'name': name, 'type': region_type,
+                                     'parent_code': parent_code}])[code]
+
+    def format_stats(self) -> str:
+        return (f"stran {len(self.ids[Party])}, regionů {len(self.ids[Region])}, "
+                f"dotazů {self.lookups}, vloženo {self.created}, načteno znovu {self.reloads}")
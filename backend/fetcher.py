@@ -0,0 +1,490 @@
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+from backend.metrics import DOWNLOAD_SECONDS, DOWNLOAD_BYTES
+
+logger = logging.getLogger(__name__)
+
+# Stav souboru po stažení
+STATUS_CHANGED = 'changed'  # nový obsah, je potřeba ho uložit
+STATUS_NOT_MODIFIED = 'not_modified'  # server odpověděl 304
+STATUS_UNCHANGED = 'unchanged'  # staženo, ale obsah se nezměnil (stejný hash)
+STATUS_FAILED = 'failed'
+STATUS_CIRCUIT_OPEN = 'circuit_open'  # nestahováno, URL má otevřený jistič
+
+# Stav jističe URL
+CIRCUIT_CLOSED = 'closed'
+CIRCUIT_OPEN = 'open'
+CIRCUIT_HALF_OPEN = 'half_open'
+
+# Chyby klienta, které má smysl opakovat; ostatní 4xx (např. 404 u souboru,
+# který zatím neexistuje) se neopakují a jistič nepočítá jako selhání
+RETRYABLE_CLIENT_ERRORS = (408, 429)
+
+class FeedRequest(NamedTuple):
+    """Požadavek na stažení jednoho XML souboru"""
+    source_type: str
+    url: str
+    source_identifier: Optional[str] = None
+
+class FetchResult(NamedTuple):
+    """Výsledek stažení jednoho XML souboru"""
+    feed: FeedRequest
+    content: Optional[bytes]  # vyplněno jen pro STATUS_CHANGED
+    elapsed: float  # sekund včetně opakování
+    attempts: int
+    status: str = STATUS_FAILED
+
+class CircuitBreaker:
+    """
+    Jistič jedné URL
+
+    Po `threshold` selháních za sebou se otevře a URL se nestahuje. Po
+    uplynutí doby otevření propustí jeden zkušební pokus (half-open):
+    úspěch jistič zavře, selhání ho znovu otevře na dvojnásobnou dobu.
+    Volá se pod zámkem ConcurrentFetcher.
+    """
+
+    __slots__ = ('threshold', 'open_seconds', 'max_open_seconds', 'state',
+                 'failures', 'open_for', 'opened_until', 'trips')
+
+    def __init__(self, threshold: int = config.CIRCUIT_FAILURE_THRESHOLD,
+                 open_seconds: float = config.CIRCUIT_OPEN_SECONDS,
+                 max_open_seconds: float = config.CIRCUIT_MAX_OPEN_SECONDS):
+        self.threshold = threshold
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0  # selhání za sebou
+        self.open_for = open_seconds
+        self.opened_until = 0.0
+        self.trips = 0  # kolikrát se jistič otevřel
+
+    def allow(self, now: float) -> bool:
+        """Zda se smí URL stáhnout; po uplynutí doby otevření propustí jeden pokus"""
+        if self.state == CIRCUIT_CLOSED:
+            return True
+        if self.state == CIRCUIT_OPEN and now >= self.opened_until:
+            self.state = CIRCUIT_HALF_OPEN
+            return True
+        return False  # otevřený, nebo zkušební pokus ještě běží
+
+    def success(self):
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.open_for = self.open_seconds
+
+    def failure(self, now: float) -> bool:
+        """Zaznamenání selhání, vrací True, pokud se jistič právě otevřel"""
+        self.failures += 1
+        if self.state == CIRCUIT_HALF_OPEN:
+            self.open_for = min(self.open_for * 2, self.max_open_seconds)
+        elif self.failures < self.threshold:
+            return False
+        self.state = CIRCUIT_OPEN
+        self.opened_until = now + self.open_for
+        self.trips += 1
+        return True
+
+class RetryBudget:
+    """
+    Společný limit opakovaných pokusů na jeden cyklus kolektoru
+
+    První pokus o každý soubor je zdarma, každé opakování spotřebuje
+    jeden kus rozpočtu. Vyčerpaný rozpočet znamená, že selhávající
+    soubory se v tomto cyklu už neopakují a cyklus se nezdrží.
+    """
+
+    def __init__(self, per_cycle: int = config.RETRY_BUDGET_PER_CYCLE):
+        self.per_cycle = per_cycle
+        self._lock = threading.Lock()
+        self.remaining = per_cycle
+
+    def reset(self):
+        with self._lock:
+            self.remaining = self.per_cycle
+
+    def take(self) -> bool:
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+class ConcurrentFetcher:
+    """
+    Paralelní stahování XML souborů přes sdílený pool spojení
+    """
+
+    def __init__(self, max_workers: int = config.MAX_CONCURRENT_DOWNLOADS,
+                 request_timeout: float = config.REQUEST_TIMEOUT,
+                 request_deadline: float = config.REQUEST_DEADLINE):
+        self.max_workers = max_workers
+        self.request_timeout = request_timeout
+        self.request_deadline = request_deadline
+
+        # Pool spojení musí být alespoň tak velký jako počet vláken,
+        # jinak by si vlákna spojení navzájem zahazovala
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': 'Volby2025-DataCollector/1.0'
+        })
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix='fetch')
+
+        # Validátory pro podmíněný GET a hash posledního obsahu podle URL
+        # (čtou a zapisují je pracovní vlákna, proto pod zámkem)
+        self.validators: Dict[str, Dict[str, str]] = {}
+        self.content_hashes: Dict[str, str] = {}
+        self.content_sizes: Dict[str, int] = {}
+        self._validators_lock = threading.Lock()
+
+        # Jističe podle URL a rozpočet opakování (obnovuje se v new_cycle)
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self._breaker_lock = threading.Lock()
+        self.retry_budget = RetryBudget()
+
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            'changed': 0,
+            'not_modified': 0,
+            'unchanged': 0,
+            'failed': 0,
+            'circuit_open': 0,  # přeskočeno kvůli otevřenému jističi
+            'retries_denied': 0,  # opakování nepovolená kvůli vyčerpanému rozpočtu
+            'not_started': 0,  # nezačaté kvůli obsazeným vláknům (bez požadavku)
+            'bytes_downloaded': 0,
+            'bytes_not_transferred': 0,  # ušetřeno díky odpovědi 304
+            'bytes_not_stored': 0,  # staženo, ale neuloženo kvůli stejnému hashi
+        }
+
+    def _count(self, **increments):
+        """Thread-safe navýšení počítadel"""
+        with self._stats_lock:
+            for key, value in increments.items():
+                self.stats[key] += value
+
+    def format_stats(self) -> str:
+        """Souhrn počítadel pro log"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        with self._breaker_lock:
+            open_circuits = sum(1 for breaker in self.breakers.values() if breaker.state != CIRCUIT_CLOSED)
+        return (f"změněno {stats['changed']}, 304 {stats['not_modified']}, "
+                f"beze změny {stats['unchanged']}, chyby {stats['failed']}, "
+                f"otevřené jističe {open_circuits} (přeskočeno {stats['circuit_open']}), "
+                f"neopakováno {stats['retries_denied']}, nezačato {stats['not_started']}, "
+                f"staženo {stats['bytes_downloaded'] / 1e6:.1f} MB, "
+                f"nepřeneseno {stats['bytes_not_transferred'] / 1e6:.1f} MB, "
+                f"neuloženo {stats['bytes_not_stored'] / 1e6:.1f} MB")
+
+    def new_cycle(self):
+        """Začátek cyklu kolektoru - obnovení rozpočtu opakování"""
+        self.retry_budget.reset()
+
+    def _admit(self, url: str, max_retries: int) -> Optional[int]:
+        """
+        Povolený počet pokusů o URL podle jejího jističe
+
+        None znamená otevřený jistič (nestahovat), zkušební pokus
+        polootevřeného jističe se neopakuje.
+        """
+        with self._breaker_lock:
+            breaker = self.breakers.get(url)
+            if breaker is None:
+                return max_retries
+            if not breaker.allow(time.monotonic()):
+                return None
+            return 1 if breaker.state == CIRCUIT_HALF_OPEN else max_retries
+
+    def _record_outcome(self, url: str, ok: bool):
+        """Předání výsledku stažení jističi URL"""
+        with self._breaker_lock:
+            breaker = self.breakers.get(url)
+            if ok:
+                if breaker is not None and breaker.state != CIRCUIT_CLOSED:
+                    logger.info(f"Jistič {url} zavřen, soubor je opět dostupný")
+                if breaker is not None:
+                    breaker.success()
+                return
+            if breaker is None:
+                breaker = self.breakers[url] = CircuitBreaker()
+            if breaker.failure(time.monotonic()):
+                logger.warning(f"Jistič {url} otevřen po {breaker.failures} selháních za sebou, "
+                               f"další pokus za {breaker.open_for:.0f}s")
+
+    def _request(self, method: str, url: str, max_retries: int = config.DOWNLOAD_RETRIES,
+                 headers: Optional[Dict[str, str]] = None) -> Tuple[Optional[requests.Response], int]:
+        """
+        HTTP požadavek s opakováním a celkovým limitem, vrací (odpověď, počet pokusů)
+
+        Každé opakování čerpá z rozpočtu cyklu. Výsledek se předá jističi
+        URL; odpověď 404 a jiné neopakovatelné chyby klienta se neopakují,
+        za selhání se nepočítají a vrací se (odpověď není ok). HEAD, který
+        server nepodporuje, se nahradí GET s přečtením jen hlaviček.
+        """
+        deadline = time.monotonic() + self.request_deadline
+        attempt = 0
+
+        while attempt < max_retries:
+            attempt += 1
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            timeout = min(self.request_timeout, remaining)
+            try:
+                if method == 'HEAD':
+                    response = self.session.head(url, headers=headers, timeout=timeout, allow_redirects=True)
+                    if response.status_code in (405, 501):
+                        response = self.session.get(url, headers=headers, timeout=timeout, stream=True)
+                        response.close()
+                else:
+                    response = self.session.get(url, headers=headers, timeout=timeout)
+                response.raise_for_status()
+                self._record_outcome(url, ok=True)
+                return response, attempt
+            except requests.HTTPError as e:
+                status_code = e.response.status_code
+                if status_code < 500 and status_code not in RETRYABLE_CLIENT_ERRORS:
+                    # Server odpověděl, jistič se zavírá stejně jako po úspěchu
+                    self._record_outcome(url, ok=True)
+                    return e.response, attempt
+                logger.warning(f"Pokus {attempt}/{max_retries} selhal pro {url}: {e}")
+            except requests.RequestException as e:
+                logger.warning(f"Pokus {attempt}/{max_retries} selhal pro {url}: {e}")
+
+            if attempt < max_retries:
+                backoff = 2 ** (attempt - 1)  # Exponenciální backoff
+                if time.monotonic() + backoff >= deadline:
+                    break
+                if not self.retry_budget.take():
+                    self._count(retries_denied=1)
+                    logger.warning(f"Rozpočet opakování cyklu vyčerpán, {url} se v tomto cyklu neopakuje")
+                    break
+                time.sleep(backoff)
+
+        logger.error(f"Nepodařilo se stáhnout {url} po {attempt} pokusech")
+        self._record_outcome(url, ok=False)
+        return None, attempt
+
+    def _get(self, url: str, max_retries: int = config.DOWNLOAD_RETRIES,
+             headers: Optional[Dict[str, str]] = None) -> Tuple[Optional[requests.Response], int]:
+        """
+        HTTP GET přes _request, vrací (odpověď, počet pokusů)
+
+        Neopakovatelná chyba klienta (404...) vrací odpověď None.
+        """
+        response, attempts = self._request('GET', url, max_retries, headers)
+        if response is not None and not response.ok:
+            logger.warning(f"Soubor {url} nedostupný: {response.status_code}")
+            return None, attempts
+        return response, attempts
+
+    def exists(self, url: str) -> Optional[bool]:
+        """
+        Zjištění existence souboru bez stažení obsahu (HEAD)
+
+        Jde přes stejný jistič, rozpočet opakování a limit jako stahování.
+        Vrací None, pokud se na to nepodařilo odpovědět (chyba sítě nebo
+        serveru, otevřený jistič).
+        """
+        start = time.monotonic()
+        allowed = self._admit(url, config.DOWNLOAD_RETRIES)
+        if allowed is None:
+            self._count(circuit_open=1)
+            DOWNLOAD_SECONDS.labels('probe', STATUS_CIRCUIT_OPEN).observe(0.0)
+            return None
+
+        response, _ = self._request('HEAD', url, allowed)
+        if response is None:
+            found, status = None, STATUS_FAILED
+        elif response.status_code == 404:
+            found, status = False, 'missing'
+        elif response.ok:
+            found, status = True, 'exists'
+        else:
+            logger.warning(f"Neočekávaná odpověď {response.status_code} při ověření {url}")
+            found, status = None, STATUS_FAILED
+        DOWNLOAD_SECONDS.labels('probe', status).observe(time.monotonic() - start)
+        return found
+
+    def _fetch_one(self, feed: FeedRequest, conditional: bool = True) -> FetchResult:
+        """
+        Podmíněné stažení jednoho souboru v pracovním vlákně
+
+        Posílá If-None-Match/If-Modified-Since podle předchozí odpovědi
+        a porovnává hash obsahu, takže nezměněný soubor se neuloží.
+        Pro neměnné soubory (dávky) se s conditional=False nic nepamatuje.
+        """
+        start = time.monotonic()
+        url = feed.url
+
+        headers = {}
+        with self._validators_lock:
+            validators = dict(self.validators.get(url, {})) if conditional else {}
+        if 'etag' in validators:
+            headers['If-None-Match'] = validators['etag']
+        if 'last_modified' in validators:
+            headers['If-Modified-Since'] = validators['last_modified']
+
+        allowed = self._admit(url, config.DOWNLOAD_RETRIES)
+        if allowed is None:
+            self._count(circuit_open=1)
+            return FetchResult(feed, None, 0.0, 0, STATUS_CIRCUIT_OPEN)
+
+        response, attempts = self._get(url, allowed, headers=headers)
+        elapsed = time.monotonic() - start
+
+        if response is None:
+            self._count(failed=1)
+            return FetchResult(feed, None, elapsed, attempts, STATUS_FAILED)
+
+        if response.status_code == 304:
+            with self._validators_lock:
+                size = self.content_sizes.get(url, 0)
+            self._count(not_modified=1, bytes_not_transferred=size)
+            return FetchResult(feed, None, elapsed, attempts, STATUS_NOT_MODIFIED)
+
+        if not conditional:
+            self._count(changed=1, bytes_downloaded=len(response.content))
+            DOWNLOAD_BYTES.labels(feed.source_type).inc(len(response.content))
+            return FetchResult(feed, response.content, elapsed, attempts, STATUS_CHANGED)
+
+        new_validators = {}
+        if response.headers.get('ETag'):
+            new_validators['etag'] = response.headers['ETag']
+        if response.headers.get('Last-Modified'):
+            new_validators['last_modified'] = response.headers['Last-Modified']
+
+        body = response.content
+        content_hash = hashlib.sha256(body).hexdigest()
+        self._count(bytes_downloaded=len(body))
+        DOWNLOAD_BYTES.labels(feed.source_type).inc(len(body))
+
+        with self._validators_lock:
+            self.validators[url] = new_validators
+            unchanged = self.content_hashes.get(url) == content_hash
+            if not unchanged:
+                self.content_hashes[url] = content_hash
+                self.content_sizes[url] = len(body)
+        if unchanged:
+            self._count(unchanged=1, bytes_not_stored=len(body))
+            return FetchResult(feed, None, elapsed, attempts, STATUS_UNCHANGED)
+
+        self._count(changed=1)
+        return FetchResult(feed, body, elapsed, attempts, STATUS_CHANGED)
+
+    def export_state(self) -> Dict:
+        """
+        Validátory a hashe pro trvalé uložení (volat mimo běžící fetch_all)
+        """
+        with self._validators_lock:
+            return {
+                'validators': dict(self.validators),
+                'content_hashes': dict(self.content_hashes),
+                'content_sizes': dict(self.content_sizes),
+            }
+
+    def restore_state(self, state: Dict):
+        """
+        Obnovení validátorů a hashů uložených předchozím během
+        """
+        with self._validators_lock:
+            self.validators.update(state.get('validators', {}))
+            self.content_hashes.update(state.get('content_hashes', {}))
+            self.content_sizes.update(state.get('content_sizes', {}))
+
+    def forget(self, url: str):
+        """
+        Zapomenutí validátorů, hashe a velikosti URL (např. když se obsah nepodařilo uložit)
+        """
+        with self._validators_lock:
+            self.validators.pop(url, None)
+            self.content_hashes.pop(url, None)
+            self.content_sizes.pop(url, None)
+
+    def fetch_all(self, feeds: List[FeedRequest], conditional: bool = True) -> List[FetchResult]:
+        """
+        Paralelní stažení všech souborů jednoho cyklu
+
+        Výsledky jsou ve stejném pořadí jako požadavky. Obsah je vyplněn
+        jen u změněných souborů; soubory s otevřeným jističem mají stav
+        STATUS_CIRCUIT_OPEN (bez požadavku na server). Limit REQUEST_DEADLINE
+        (s rezervou REQUEST_TIMEOUT) běží každému souboru až od chvíle, kdy
+        ho převezme pracovní vlákno - soubory čekající ve frontě poolu tak
+        nevyprší dřív, než se o ně vůbec požádá. Soubor, který limit
+        překročí, má stav STATUS_FAILED; jeho jistič ovlivní až skutečný
+        výsledek požadavku, který doběhne na pozadí. Soubor, který se
+        nezačne stahovat vůbec (všechna vlákna drží opožděné požadavky),
+        má také STATUS_FAILED, za selhání se ale nepočítá.
+        """
+        if not feeds:
+            return []
+
+        # Rezerva pro poslední pokus, který může začít těsně před limitem
+        limit = self.request_deadline + self.request_timeout
+        started: List[Optional[float]] = [None] * len(feeds)
+
+        def fetch(index: int, feed: FeedRequest) -> FetchResult:
+            started[index] = time.monotonic()
+            return self._fetch_one(feed, conditional)
+
+        futures = {self.executor.submit(fetch, index, feed): index for index, feed in enumerate(feeds)}
+        pending = set(futures)
+        overdue = set()
+        not_started = set()
+        while pending:
+            now = time.monotonic()
+            expiries = [started[futures[future]] + limit for future in pending
+                        if started[futures[future]] is not None]
+            timeout = max(0.0, min(expiries) - now) if expiries else limit
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done and not expiries:
+                # Celý limit se nic nezačalo - vlákna drží opožděné požadavky
+                # z dřívějška; zbytek se zkusí v dalším cyklu
+                not_started |= {future for future in pending if future.cancel()}
+                pending -= not_started
+                continue
+            now = time.monotonic()
+            expired = {future for future in pending
+                       if started[futures[future]] is not None and now >= started[futures[future]] + limit}
+            overdue |= expired
+            pending -= expired
+
+        results = []
+        for future, index in futures.items():
+            feed = feeds[index]
+            if future in overdue:
+                logger.warning(f"Stahování {feed.url} nestihlo limit {limit:.0f}s")
+                self._count(failed=1)
+                results.append(FetchResult(feed, None, time.monotonic() - started[index], 0, STATUS_FAILED))
+            elif future in not_started:
+                # Bez požadavku na server - ani selhání, ani zásah do jističe
+                self._count(not_started=1)
+                results.append(FetchResult(feed, None, 0.0, 0, STATUS_FAILED))
+            else:
+                results.append(future.result())
+            DOWNLOAD_SECONDS.labels(feed.source_type, results[-1].status).observe(results[-1].elapsed)
+
+        return results
+
+    def shutdown(self):
+        """Ukončení pracovních vláken a uzavření spojení"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
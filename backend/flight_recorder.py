@@ -0,0 +1,178 @@
+import json
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+
+logger = logging.getLogger(__name__)
+
+class Span:
+    """Jeden měřený úsek cyklu (stažení, kontrola dávek, parsování, zápis...)"""
+
+    __slots__ = ('name', 'offset', 'duration', 'thread', 'attrs')
+
+    def __init__(self, name: str, offset: float, duration: float, thread: str, attrs: Dict):
+        self.name = name
+        self.offset = offset  # sekund od začátku cyklu
+        self.duration = duration
+        self.thread = thread
+        self.attrs = attrs
+
+    def to_dict(self) -> Dict:
+        return {'name': self.name, 'offset': round(self.offset, 4), 'duration': round(self.duration, 4),
+                'thread': self.thread, **self.attrs}
+
+class CycleRecord:
+    """Záznam jednoho cyklu kolektoru s jeho úseky"""
+
+    def __init__(self, number: int, max_spans: int):
+        self.number = number
+        self.started_at = datetime.now()
+        self.started = time.monotonic()
+        self.duration: Optional[float] = None
+        self.slow = False
+        self.spans: List[Span] = []
+        self.dropped = 0  # úseky nad limit max_spans
+        self.max_spans = max_spans
+
+    def to_dict(self) -> Dict:
+        return {
+            'cycle': self.number,
+            'started_at': self.started_at.isoformat(),
+            'duration': round(self.duration or 0.0, 4),
+            'slow': self.slow,
+            'dropped_spans': self.dropped,
+            'spans': [span.to_dict() for span in self.spans],
+        }
+
+class FlightRecorder:
+    """
+    Záznamník průběhu cyklů kolektoru
+
+    Každý cyklus si zapisuje úseky s dobou trvání, velikostmi a počty
+    pokusů. Posledních `capacity` cyklů se drží v kruhové paměti; cyklus
+    delší než `slow_threshold` se označí, zaloguje jako tabulka a připíše
+    do souboru `dump_path`. Úseky z vláken pipeline (parsování, zápis,
+    agregace) se přiřadí cyklu, během kterého skončily.
+    """
+
+    def __init__(self, capacity: int = config.FLIGHT_RECORDER_CYCLES,
+                 slow_threshold: float = config.SLOW_CYCLE_THRESHOLD,
+                 dump_path: Path = config.SLOW_CYCLE_LOG,
+                 max_spans: int = config.FLIGHT_RECORDER_MAX_SPANS):
+        self.cycles: deque = deque(maxlen=capacity)
+        self.slow_threshold = slow_threshold
+        self.dump_path = Path(dump_path)
+        self.max_spans = max_spans
+        self.current: Optional[CycleRecord] = None
+        self.slow_cycles = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def begin_cycle(self) -> CycleRecord:
+        with self._lock:
+            self._count += 1
+            self.current = CycleRecord(self._count, self.max_spans)
+            return self.current
+
+    def end_cycle(self) -> Optional[CycleRecord]:
+        """Uzavření cyklu; pomalý cyklus se zaloguje a připíše do souboru"""
+        with self._lock:
+            cycle, self.current = self.current, None
+            if cycle is None:
+                return None
+            cycle.duration = time.monotonic() - cycle.started
+            cycle.slow = cycle.duration >= self.slow_threshold
+            self.cycles.append(cycle)
+
+        if cycle.slow:
+            self.slow_cycles += 1
+            logger.warning(f"Pomalý cyklus č. {cycle.number}: {cycle.duration:.2f}s "
+                           f"(limit {self.slow_threshold:.1f}s)\n{self.format_table(cycle)}")
+            self._append(cycle)
+        return cycle
+
+    def record(self, name: str, duration: float, started: Optional[float] = None, **attrs):
+        """
+        Zápis hotového úseku do aktuálního cyklu
+
+        started je čas začátku (time.monotonic), bez něj úsek začal před
+        `duration` sekundami.
+        """
+        now = time.monotonic()
+        with self._lock:
+            cycle = self.current
+            if cycle is None:
+                return
+            if len(cycle.spans) >= cycle.max_spans:
+                cycle.dropped += 1
+                return
+            start = now - duration if started is None else started
+            cycle.spans.append(Span(name, start - cycle.started, duration,
+                                    threading.current_thread().name, attrs))
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """
+        Změření bloku with jako úseku; atributy lze doplnit do vráceného slovníku
+        """
+        start = time.monotonic()
+        try:
+            yield attrs
+        finally:
+            self.record(name, time.monotonic() - start, **attrs)
+
+    def format_table(self, cycle: CycleRecord, limit: int = 30) -> str:
+        """Úseky cyklu jako tabulka, nejdelší první"""
+        lines = [f"{'úsek':<14} {'začátek':>8} {'doba':>8}  {'vlákno':<18} podrobnosti"]
+        spans = sorted(cycle.spans, key=lambda span: span.duration, reverse=True)
+        for span in spans[:limit]:
+            details = ', '.join(f"{key}={value}" for key, value in span.attrs.items())
+            lines.append(f"{span.name:<14} {span.offset:>7.3f}s {span.duration:>7.3f}s  "
+                         f"{span.thread:<18} {details}")
+        if len(spans) > limit:
+            lines.append(f"... a dalších {len(spans) - limit} úseků")
+        if cycle.dropped:
+            lines.append(f"(nezaznamenáno {cycle.dropped} úseků nad limit)")
+        return '\n'.join(lines)
+
+    def _append(self, cycle: CycleRecord):
+        try:
+            self.dump_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.dump_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(cycle.to_dict(), ensure_ascii=False) + '\n')
+        except OSError as e:
+            logger.warning(f"Záznam pomalého cyklu nelze zapsat do {self.dump_path}: {e}")
+
+    def dump(self, path: Path) -> int:
+        """
+        Zápis všech cyklů v kruhové paměti do souboru (JSON Lines), vrací jejich počet
+        """
+        with self._lock:
+            cycles = list(self.cycles)
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            for cycle in cycles:
+                f.write(json.dumps(cycle.to_dict(), ensure_ascii=False) + '\n')
+        logger.info(f"Záznamník: {len(cycles)} cyklů zapsáno do {path}")
+        return len(cycles)
+
+    def format_summary(self) -> str:
+        """Souhrn cyklů v paměti pro log"""
+        with self._lock:
+            durations = sorted(cycle.duration for cycle in self.cycles)
+        if not durations:
+            return "žádné cykly"
+        p95 = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+        return (f"cyklů {len(durations)}, medián {durations[len(durations) // 2]:.2f}s, "
+                f"p95 {p95:.2f}s, max {durations[-1]:.2f}s, pomalých celkem {self.slow_cycles}")
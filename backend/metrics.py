@@ -0,0 +1,259 @@
+import os
+import time
+import logging
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logger = logging.getLogger(__name__)
+
+# Typ obsahu textového formátu Prometheus (exposition format 0.0.4)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Výchozí hranice histogramů - sekundy a bajty
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Tuple = ()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+class _Metric(ABC):
+    """Společný základ metrik s hodnotami podle kombinace štítků"""
+
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, *values, **kwargs):
+        """Hodnota metriky pro danou kombinaci štítků"""
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        key = tuple(str(value) for value in values)
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"Metrika {self.name} má štítky {self.labelnames}")
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._new_child()
+            return child
+
+    @abstractmethod
+    def _new_child(self):
+        """Nová hodnota pro další kombinaci štítků"""
+
+    @abstractmethod
+    def _samples(self) -> List[str]:
+        """Řádky hodnot v textovém formátu"""
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self._samples())
+        return '\n'.join(lines)
+
+class _CounterValue:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+class Counter(_Metric):
+    """
+    Monotónně rostoucí počítadlo
+
+    Název musí končit na _total - vzorky i HELP/TYPE pak nesou stejný
+    název, jak to vyžaduje textový formát 0.0.4.
+    """
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        if not name.endswith('_total'):
+            raise ValueError(f"Název počítadla {name} musí končit na _total")
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _CounterValue()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            children = list(self._children.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}'
+                for key, child in children]
+
+class _HistogramValue:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        with self._lock:
+            self.sum += value
+            self.count += 1
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[index] += 1
+                    break
+
+    @contextmanager
+    def time(self):
+        """Změření doby běhu bloku with"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+class Histogram(_Metric):
+    """Rozdělení hodnot do kumulativních intervalů (buckets) se součtem a počtem"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = TIME_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            children = list(self._children.items())
+        lines = []
+        for key, child in children:
+            with child._lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts + [count - sum(counts)]):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, (('le', _format_value(bound)),))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+class Registry:
+    """Sada metrik jednoho procesu"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metrika {metric.name} už je registrovaná")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = TIME_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Všechny metriky v textovém formátu Prometheus"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+REGISTRY = Registry()
+
+# Stahování (kolektor)
+DOWNLOAD_SECONDS = REGISTRY.histogram(
+    'volby_download_seconds', 'Doba stažení souboru včetně opakování', ('feed', 'status'))
+DOWNLOAD_BYTES = REGISTRY.counter(
+    'volby_download_bytes_total', 'Stažené bajty', ('feed',))
+
+# Zpracování a agregace (kolektor)
+PARSE_SECONDS = REGISTRY.histogram(
+    'volby_parse_seconds', 'Doba parsování XML podle metody parseru', ('method',))
+ROWS_INSERTED = REGISTRY.counter(
+    'volby_rows_inserted_total', 'Řádky vložené při zpracování podle metody', ('method',))
+AGGREGATION_SECONDS = REGISTRY.histogram(
+    'volby_aggregation_seconds', 'Doba minutové agregace (aggregate_by_minute)')
+LATE_RESULTS = REGISTRY.counter(
+    'volby_late_results_total', 'Výsledky s minutou starší než hranice agregace (opožděná data)')
+
+# Webová aplikace
+API_REQUEST_SECONDS = REGISTRY.histogram(
+    'volby_api_request_seconds', 'Doba obsluhy požadavku API', ('endpoint', 'status'))
+WEBSOCKET_EMITS = REGISTRY.counter(
+    'volby_websocket_emits_total', 'Odeslané WebSocket zprávy', ('event',))
+WEBSOCKET_PAYLOAD_BYTES = REGISTRY.histogram(
+    'volby_websocket_payload_bytes', 'Velikost odeslaných WebSocket zpráv (JSON)', ('event',),
+    buckets=SIZE_BUCKETS)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # dotazy scraperu nelogovat
+
+def start_http_server(port: int, host: str = '0.0.0.0', registry: Registry = REGISTRY) -> ThreadingHTTPServer:
+    """
+    Zpřístupnění metrik na /metrics na samostatném portu (vlákno na pozadí)
+    """
+    handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    logger.info(f"Metriky dostupné na http://{host}:{port}/metrics")
+    return server
+
+def write_textfile(path: Path, registry: Registry = REGISTRY):
+    """
+    Zápis metrik do souboru pro textfile collector (atomicky přes přejmenování)
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(registry.render(), encoding='utf-8')
+    os.replace(tmp_path, path)
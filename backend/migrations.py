@@ -0,0 +1,137 @@
+import hashlib
+import logging
+from sqlalchemy import MetaData, inspect
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.db_models import AggregatedResult, RawData, engine as default_engine
+from backend.raw_store import compress_payload
+
+logger = logging.getLogger(__name__)
+
+def add_missing_columns(table, engine=default_engine):
+    """
+    Doplnění sloupců, které model má, ale existující tabulka ještě ne
+
+    Jde jen o nové nepovinné sloupce, SQLite je zvládne přidat přes ALTER TABLE.
+    """
+    existing = {column['name'] for column in inspect(engine).get_columns(table.name)}
+    missing = [column for column in table.columns if column.name not in existing]
+    if not missing:
+        return
+
+    with engine.begin() as conn:
+        for column in missing:
+            column_type = column.type.compile(dialect=engine.dialect)
+            conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}')
+            logger.info(f"Do tabulky {table.name} přidán sloupec {column.name}")
+
+def add_missing_indexes(table, engine=default_engine):
+    """
+    Vytvoření indexů, které model má, ale existující tabulka ještě ne
+    """
+    for index in table.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+def upgrade_aggregated_results(engine=default_engine):
+    """
+    Doplnění sloupce source_timestamp do aggregated_results ze starší verze
+
+    Řádky bez něj se při další agregaci přepíší jako starší.
+    """
+    if 'aggregated_results' in inspect(engine).get_table_names():
+        add_missing_columns(AggregatedResult.__table__, engine)
+
+# Rozpracovaná nová podoba raw_data během migrace (po dokončení se přejmenuje)
+MIGRATION_TABLE = 'raw_data_migrating'
+
+def upgrade_raw_data(engine=default_engine, chunk_size: int = 500):
+    """
+    Jednorázová migrace tabulky raw_data na komprimované ukládání XML
+
+    SQLite neumí změnit NOT NULL u existujícího sloupce, proto se tabulka
+    přestaví: záznamy se po dávkách zkomprimují do pomocné tabulky
+    MIGRATION_TABLE se stejnými id (každá dávka ve vlastní transakci)
+    a teprve nakonec se stará tabulka v jedné transakci nahradí novou.
+    Přerušená migrace (pád, vypnutí) tak při dalším startu pokračuje
+    za posledním přeneseným id. Spouští ji jen kolektor (jediný
+    zapisovatel raw_data), webová aplikace ji nevolá.
+    """
+    inspector = inspect(engine)
+    if 'raw_data' not in inspector.get_table_names():
+        return
+
+    columns = {column['name'] for column in inspector.get_columns('raw_data')}
+    if 'codec' in columns:
+        add_missing_columns(RawData.__table__, engine)
+        add_missing_indexes(RawData.__table__, engine)
+        return
+
+    logger.info("Migrace raw_data na komprimované ukládání XML...")
+
+    # Stejné sloupce jako model, indexy (se stejnými názvy) až po přejmenování
+    table = RawData.__table__.to_metadata(MetaData(), name=MIGRATION_TABLE)
+    table.indexes.clear()
+    table.create(engine, checkfirst=True)
+
+    with engine.connect() as conn:
+        last_id = conn.exec_driver_sql(f'SELECT MAX(id) FROM {MIGRATION_TABLE}').scalar() or 0
+    if last_id:
+        logger.info(f"Pokračování přerušené migrace raw_data za id {last_id}")
+
+    migrated = 0
+    original_bytes = 0
+    compressed_bytes = 0
+
+    while True:
+        with engine.begin() as conn:
+            rows = conn.exec_driver_sql(
+                'SELECT id, source_type, source_identifier, xml_content, timestamp, processed '
+                'FROM raw_data WHERE id > ? ORDER BY id LIMIT ?',
+                (last_id, chunk_size)
+            ).fetchall()
+
+            if not rows:
+                break
+
+            values = []
+            for row_id, source_type, source_identifier, xml_content, timestamp, processed in rows:
+                data = (xml_content or '').encode('utf-8')
+                codec, payload = compress_payload(data)
+                original_bytes += len(data)
+                compressed_bytes += len(payload)
+                values.append((row_id, source_type, source_identifier, codec, payload,
+                               hashlib.sha256(data).hexdigest(), len(data), timestamp, processed))
+
+            # Časové značky se přenáší jako text, aby zůstal zachován formát SQLAlchemy
+            conn.exec_driver_sql(
+                f'INSERT INTO {MIGRATION_TABLE} (id, source_type, source_identifier, codec, payload, '
+                'content_hash, size, timestamp, processed) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                values
+            )
+
+        migrated += len(rows)
+        last_id = rows[-1][0]
+        logger.info(f"Zkomprimováno {migrated} záznamů raw_data")
+
+    # Výměna tabulek jako jedna transakce. pysqlite DDL do transakce
+    # sám nezahrne, proto explicitní BEGIN na spojení v režimu autocommit.
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        conn.exec_driver_sql('BEGIN')
+        try:
+            conn.exec_driver_sql('DROP TABLE raw_data')
+            conn.exec_driver_sql(f'ALTER TABLE {MIGRATION_TABLE} RENAME TO raw_data')
+            conn.exec_driver_sql('COMMIT')
+        except Exception:
+            conn.exec_driver_sql('ROLLBACK')
+            raise
+    add_missing_indexes(RawData.__table__, engine)
+
+    # Uvolnění místa po nekomprimovaných datech
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        conn.exec_driver_sql('VACUUM')
+
+    ratio = original_bytes / compressed_bytes if compressed_bytes else 0
+    logger.info(f"Migrace raw_data dokončena: {migrated} záznamů, "
+                f"{original_bytes / 1e6:.1f} MB -> {compressed_bytes / 1e6:.1f} MB ({ratio:.1f}x)")
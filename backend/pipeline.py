@@ -0,0 +1,215 @@
+import time
+import queue
+import logging
+import threading
+from typing import Callable, Optional
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from backend.db_models import SessionLocal
+from backend.aggregator import DataAggregator
+
+logger = logging.getLogger(__name__)
+
+class StageStats:
+    """
+    Thread-safe počítadla jednoho stupně zpracování
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.runs = 0  # počet běhů stupně
+        self.items = 0  # zpracované položky (soubory, záznamy)
+        self.busy = 0.0  # sekund strávených prací
+        self.last_duration = 0.0
+        self.coalesced = 0  # podněty sloučené s už čekajícím podnětem
+        self.errors = 0
+
+    def record_run(self, items: int, duration: float):
+        with self._lock:
+            self.runs += 1
+            self.items += items
+            self.busy += duration
+            self.last_duration = duration
+
+    def count(self, **increments):
+        with self._lock:
+            for key, value in increments.items():
+                setattr(self, key, getattr(self, key) + value)
+
+    def format(self, queue_depth: Optional[int] = None) -> str:
+        with self._lock:
+            throughput = self.items / self.busy if self.busy else 0.0
+            text = (f"{self.name}: běhů {self.runs}, položek {self.items} "
+                    f"({throughput:.1f}/s práce), poslední běh {self.last_duration:.2f}s")
+            if queue_depth is not None:
+                text += f", fronta {queue_depth}, sloučeno {self.coalesced}"
+            if self.errors:
+                text += f", chyby {self.errors}"
+            return text
+
+class PipelineStage(threading.Thread):
+    """
+    Stupeň zpracování běžící ve vlastním vlákně
+
+    Fronta nepřenáší data, ale jen podněty "v databázi je nová práce" -
+    vyrovnávací pamětí mezi stupni je tabulka samotná. Fronta je omezená;
+    když je plná, nový podnět se zahodí, protože už čekající podnět
+    zajistí další běh, který uvidí i nově zapsané řádky. Jeden běh
+    zpracuje všechny podněty, které se mezitím nahromadily.
+    """
+
+    def __init__(self, name: str, work: Callable[[], int],
+                 queue_size: int = config.PIPELINE_QUEUE_SIZE,
+                 min_interval: float = 0.0,
+                 idle_interval: Optional[float] = None,
+                 downstream: Optional['PipelineStage'] = None,
+                 recorder=None):
+        super().__init__(name=f"pipeline-{name}", daemon=True)
+        self.work = work
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.min_interval = min_interval  # nejkratší odstup dvou běhů
+        self.idle_interval = idle_interval  # běh i bez podnětu po této době
+        self.downstream = downstream
+        self.stats = StageStats(name)
+        self.recorder = recorder
+        self._stop_event = threading.Event()
+        self._last_run = 0.0
+
+    def submit(self, items: int = 1) -> bool:
+        """
+        Předání podnětu stupni bez blokování volajícího
+        """
+        try:
+            self.queue.put_nowait(items)
+            return True
+        except queue.Full:
+            self.stats.count(coalesced=1)
+            return False
+
+    def _drain(self):
+        """Vyprázdnění fronty - všechny čekající podněty obslouží jeden běh"""
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.queue.get(timeout=self.idle_interval or 1.0)
+            except queue.Empty:
+                if self.idle_interval is None:
+                    continue
+            if self._stop_event.is_set():
+                break
+
+            wait = self._last_run + self.min_interval - time.monotonic()
+            if wait > 0 and self._stop_event.wait(wait):
+                break
+            self._drain()
+
+            start = time.monotonic()
+            self._last_run = start
+            try:
+                items = self.work() or 0
+            except Exception as e:
+                logger.error(f"Chyba ve stupni {self.stats.name}: {e}")
+                self.stats.count(errors=1)
+                continue
+
+            duration = time.monotonic() - start
+            self.stats.record_run(items, duration)
+            if self.recorder is not None:
+                self.recorder.record(self.stats.name, duration, items=items)
+            if items and self.downstream is not None:
+                self.downstream.submit(items)
+
+    def stop(self):
+        self._stop_event.set()
+        try:
+            self.queue.put_nowait(0)  # probuzení čekajícího vlákna
+        except queue.Full:
+            pass
+
+class ProcessingPipeline:
+    """
+    Zpracování stažených dat odděleně od stahování
+
+    Stupně jsou propojené omezenými frontami: kolektor (stahování a
+    uložení surových dat) -> zpracování surových dat do tabulek výsledků
+    -> minutová agregace. Stahování tak běží ve stálém rytmu bez ohledu
+    na to, jak dlouho trvá zpracování nebo agregace.
+    """
+
+    def __init__(self, recorder=None):
+        self.recorder = recorder  # FlightRecorder kolektoru (volitelně)
+        self.collect_stats = StageStats('stahování')
+        self.aggregate_stage = PipelineStage(
+            'agregace', self._aggregate,
+            min_interval=config.PIPELINE_AGGREGATION_INTERVAL,
+            idle_interval=config.AGGREGATION_INTERVAL,
+            recorder=recorder
+        )
+        self.ingest_stage = PipelineStage(
+            'zpracování', self._ingest,
+            downstream=self.aggregate_stage,
+            recorder=recorder
+        )
+
+    def _ingest(self) -> int:
+        """
+        Zpracování všech nezpracovaných surových dat
+        """
+        db = SessionLocal()
+        try:
+            return DataAggregator(db, self.recorder).process_raw_data()
+        finally:
+            db.close()
+
+    def _aggregate(self) -> int:
+        """
+        Minutová agregace zpracovaných výsledků
+        """
+        db = SessionLocal()
+        try:
+            DataAggregator(db).aggregate_by_minute()
+            return 1
+        finally:
+            db.close()
+
+    def start(self):
+        """Spuštění vláken; první podnět doběhne případný nezpracovaný zbytek"""
+        self.ingest_stage.start()
+        self.aggregate_stage.start()
+        self.ingest_stage.submit()
+
+    def notify(self, saved: int, duration: float = 0.0):
+        """
+        Záznam dokončeného cyklu stahování a předání nových dat ke zpracování
+        """
+        self.collect_stats.record_run(saved, duration)
+        if saved:
+            self.ingest_stage.submit(saved)
+
+    def stop(self, timeout: float = 30.0):
+        """
+        Ukončení vláken; rozpracovaný běh se nechá doběhnout
+        """
+        for stage in (self.ingest_stage, self.aggregate_stage):
+            stage.stop()
+        for stage in (self.ingest_stage, self.aggregate_stage):
+            if stage.is_alive():
+                stage.join(timeout)
+
+    def format_stats(self) -> str:
+        """Souhrn počítadel všech stupňů pro log"""
+        return '; '.join([
+            self.collect_stats.format(),
+            self.ingest_stage.stats.format(self.ingest_stage.queue.qsize()),
+            self.aggregate_stage.stats.format(self.aggregate_stage.queue.qsize()),
+        ])
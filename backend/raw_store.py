@@ -0,0 +1,340 @@
+import zlib
+import mmap
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from sqlalchemy import insert
+from sqlalchemy.orm import object_session
+from backend.db_models import RawData, SessionLocal
+from backend.delta import make_delta, apply_delta
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Způsoby uložení surových dat (sloupec RawData.codec)
+CODEC_PLAIN = 'plain'  # nekomprimovaný text ve sloupci xml_content (starší záznamy)
+CODEC_ZLIB = 'zlib'
+CODEC_ZSTD = 'zstd'
+CODEC_FILE = 'file'  # soubor v archivu RAW_ARCHIVE_DIR pojmenovaný hashem obsahu
+CODEC_DELTA = 'delta'  # zlib komprimovaný rozdíl proti verzi s hashem base_hash
+
+# Kam se ukládají nové záznamy (config.RAW_DATA_STORAGE)
+STORAGE_DB = 'db'
+STORAGE_FILES = 'files'
+STORAGE_DELTA = 'delta'  # v SQLite jako klíčové snímky a rozdíly mezi verzemi
+
+# Naposledy sestavené verze z rozdílů (content_hash -> data), při zpracování
+# po sobě jdoucích snímků se tak každý rozdíl aplikuje jen jednou
+_version_cache: 'OrderedDict[str, bytes]' = OrderedDict()
+_version_cache_lock = threading.Lock()
+
+def compress_payload(data: bytes, codec: str = config.RAW_DATA_CODEC) -> Tuple[str, bytes]:
+    """
+    Komprese dat, vrací (použitý codec, komprimovaná data)
+    """
+    if codec == CODEC_ZSTD:
+        if zstandard is not None:
+            compressor = zstandard.ZstdCompressor(level=config.RAW_DATA_COMPRESSION_LEVEL)
+            return CODEC_ZSTD, compressor.compress(data)
+        logger.warning("Balíček zstandard není nainstalován, použije se zlib")
+
+    return CODEC_ZLIB, zlib.compress(data, config.RAW_DATA_COMPRESSION_LEVEL)
+
+def decompress_payload(codec: str, payload: bytes) -> bytes:
+    """
+    Dekomprese dat uložených s daným codecem
+    """
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(payload)
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Pro čtení dat ve formátu zstd je potřeba balíček zstandard")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    raise ValueError(f"Neznámý codec surových dat: {codec}")
+
+def archive_path(content_hash: str, archive_dir: Path = None) -> Path:
+    """
+    Cesta k souboru v archivu, rozdělená do podadresářů podle prvních znaků hashe
+    """
+    archive_dir = Path(archive_dir or config.RAW_ARCHIVE_DIR)
+    return archive_dir / content_hash[:2] / content_hash[2:4] / f"{content_hash}.xml"
+
+def write_archive_file(data: bytes, content_hash: str) -> Path:
+    """
+    Zápis dat do archivu; soubor se stejným obsahem už existuje, nic se nezapisuje
+    """
+    path = archive_path(content_hash)
+    if path.exists():
+        return path
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Zápis přes dočasný soubor, aby čtenář nikdy neviděl nedopsaný soubor
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return path
+
+def pack_raw_xml(xml_content: Union[str, bytes]) -> Dict:
+    """
+    Hodnoty sloupců RawData pro uložení XML podle config.RAW_DATA_STORAGE
+    """
+    data = xml_content.encode('utf-8') if isinstance(xml_content, str) else xml_content
+    content_hash = hashlib.sha256(data).hexdigest()
+
+    if config.RAW_DATA_STORAGE == STORAGE_FILES:
+        write_archive_file(data, content_hash)
+        codec, payload = CODEC_FILE, None
+    else:
+        codec, payload = compress_payload(data)
+
+    return {
+        'xml_content': None,
+        'codec': codec,
+        'payload': payload,
+        'content_hash': content_hash,
+        'size': len(data),
+    }
+
+class RawDataPacker:
+    """
+    Převod staženého XML na hodnoty sloupců RawData podle config.RAW_DATA_STORAGE
+
+    V režimu delta si pamatuje poslední verzi každého souboru (podle typu
+    a identifikátoru) a ukládá jen rozdíl proti ní. Každých
+    RAW_DELTA_KEYFRAME_INTERVAL verzí, po restartu a u velkých změn se
+    uloží celý klíčový snímek, aby řetězec rozdílů zůstal krátký.
+    """
+
+    def __init__(self, storage: str = config.RAW_DATA_STORAGE):
+        self.storage = storage
+        # (typ, identifikátor) -> (hash, data, počet rozdílů od klíčového snímku)
+        self._last_versions: Dict[Tuple[str, Optional[str]], Tuple[str, bytes, int]] = {}
+
+    def pack(self, xml_content: Union[str, bytes], source_type: str,
+             source_identifier: Optional[str] = None, versioned: bool = True) -> Dict:
+        """
+        Hodnoty sloupců pro nový záznam
+
+        Soubory, které se už nemění (dávky), se ukládají s versioned=False.
+        """
+        if self.storage != STORAGE_DELTA or not versioned:
+            return pack_raw_xml(xml_content)
+
+        data = xml_content.encode('utf-8') if isinstance(xml_content, str) else xml_content
+        content_hash = hashlib.sha256(data).hexdigest()
+        key = (source_type, source_identifier)
+        previous = self._last_versions.get(key)
+
+        if previous is not None and previous[2] < config.RAW_DELTA_KEYFRAME_INTERVAL:
+            base_hash, base_data, chain_length = previous
+            delta = zlib.compress(make_delta(base_data, data), config.RAW_DATA_COMPRESSION_LEVEL)
+
+            # Rozdíl větší než zhruba komprimovaný celý soubor nemá smysl
+            if len(delta) < len(data) // 8:
+                self._last_versions[key] = (content_hash, data, chain_length + 1)
+                return {
+                    'xml_content': None,
+                    'codec': CODEC_DELTA,
+                    'payload': delta,
+                    'content_hash': content_hash,
+                    'size': len(data),
+                    'base_hash': base_hash,
+                }
+
+        self._last_versions[key] = (content_hash, data, 0)
+        return pack_raw_xml(data)
+
+    def forget(self, source_type: str, source_identifier: Optional[str] = None):
+        """
+        Zapomenutí poslední verze (záznam se nepodařilo uložit), další bude klíčový snímek
+        """
+        self._last_versions.pop((source_type, source_identifier), None)
+
+# Sloupce vkládané hromadně - všechny řádky jedné dávky musí mít stejné klíče
+_RAW_INSERT_COLUMNS = ('source_type', 'source_identifier', 'xml_content', 'codec', 'payload',
+                       'content_hash', 'size', 'base_hash', 'timestamp', 'processed')
+
+class PendingRawData(NamedTuple):
+    """Záznam čekající ve vyrovnávací paměti na zápis"""
+    values: Dict
+    url: Optional[str]  # odkud byl stažen, aby šel po chybě zápisu stáhnout znovu
+
+class RawDataBuffer:
+    """
+    Vyrovnávací paměť zápisu surových dat
+
+    Záznamy jednoho cyklu se sbírají v paměti a do databáze se zapíšou
+    jedním hromadným INSERT v jediné transakci, místo transakce (a fsync)
+    pro každý soubor. Velikost je omezená počtem záznamů i objemem dat;
+    po jejím dosažení add() vrací True a volající má zavolat flush().
+    """
+
+    def __init__(self, packer: RawDataPacker,
+                 max_rows: int = config.RAW_WRITE_BUFFER_ROWS,
+                 max_bytes: int = config.RAW_WRITE_BUFFER_BYTES):
+        self.packer = packer
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.pending: List[PendingRawData] = []
+        self.pending_bytes = 0
+        self.flushes = 0
+        self.written = 0
+        self.failed = 0
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    @property
+    def full(self) -> bool:
+        return len(self.pending) >= self.max_rows or self.pending_bytes >= self.max_bytes
+
+    def add(self, source_type: str, xml_content: Union[str, bytes],
+            source_identifier: Optional[str] = None, versioned: bool = True,
+            url: Optional[str] = None) -> bool:
+        """
+        Přidání záznamu, vrací True, pokud je paměť plná a je čas na flush()
+        """
+        values = dict.fromkeys(_RAW_INSERT_COLUMNS)
+        values.update(self.packer.pack(xml_content, source_type, source_identifier, versioned))
+        values.update(source_type=source_type, source_identifier=source_identifier,
+                      timestamp=datetime.now(), processed=False)
+
+        self.pending.append(PendingRawData(values, url))
+        self.pending_bytes += len(values['payload'] or b'') + len(values['xml_content'] or '')
+        return self.full
+
+    def flush(self) -> Tuple[int, List[PendingRawData]]:
+        """
+        Zápis všech čekajících záznamů v jedné transakci
+
+        Vrací (počet zapsaných, nezapsané záznamy). Při chybě se nezapíše
+        nic a packer zapomene poslední verze, takže další záznam těchto
+        souborů bude celý klíčový snímek.
+        """
+        if not self.pending:
+            return 0, []
+
+        pending, self.pending, self.pending_bytes = self.pending, [], 0
+        db = SessionLocal()
+        try:
+            db.execute(insert(RawData), [entry.values for entry in pending])
+            db.commit()
+        except Exception as e:
+            logger.error(f"Chyba při zápisu {len(pending)} surových záznamů: {e}")
+            db.rollback()
+            for entry in pending:
+                self.packer.forget(entry.values['source_type'], entry.values['source_identifier'])
+            self.failed += len(pending)
+            return 0, pending
+        finally:
+            db.close()
+
+        self.flushes += 1
+        self.written += len(pending)
+        logger.debug(f"Zapsáno {len(pending)} surových záznamů v jedné transakci")
+        return len(pending), []
+
+    def format_stats(self) -> str:
+        """Souhrn počítadel pro log"""
+        per_flush = self.written / self.flushes if self.flushes else 0.0
+        return (f"zápisů {self.flushes}, záznamů {self.written} ({per_flush:.1f} na transakci), "
+                f"nezapsáno {self.failed}")
+
+def _cache_version(content_hash: str, data: bytes):
+    with _version_cache_lock:
+        _version_cache[content_hash] = data
+        _version_cache.move_to_end(content_hash)
+        while len(_version_cache) > config.RAW_DELTA_CACHE_SIZE:
+            _version_cache.popitem(last=False)
+
+def _cached_version(content_hash: str) -> Optional[bytes]:
+    with _version_cache_lock:
+        return _version_cache.get(content_hash)
+
+def _rebuild_delta(raw_data) -> bytes:
+    """
+    Sestavení verze z klíčového snímku a řetězce rozdílů
+    """
+    db = object_session(raw_data)
+    if db is None:
+        raise RuntimeError("Záznam uložený jako rozdíl lze načíst jen v rámci session")
+
+    # Cesta zpět k nejbližší známé verzi (z cache nebo klíčového snímku)
+    chain = []
+    row = raw_data
+    data = None
+    while row.codec == CODEC_DELTA:
+        chain.append(row)
+        data = _cached_version(row.base_hash)
+        if data is not None:
+            break
+        base = db.query(RawData).filter(
+            RawData.content_hash == row.base_hash
+        ).order_by(RawData.codec == CODEC_DELTA, RawData.id.desc()).first()
+        if base is None:
+            raise ValueError(f"Chybí základní verze {row.base_hash} pro záznam {raw_data.id}")
+        row = base
+
+    if data is None:
+        data = read_raw_bytes(row)
+
+    for delta_row in reversed(chain):
+        data = apply_delta(data, zlib.decompress(delta_row.payload))
+        if hashlib.sha256(data).hexdigest() != delta_row.content_hash:
+            raise ValueError(f"Sestavená verze záznamu {delta_row.id} nesouhlasí s hashem")
+        _cache_version(delta_row.content_hash, data)
+
+    return data
+
+def read_raw_bytes(raw_data) -> bytes:
+    """
+    Načtení celého XML ze záznamu RawData jako bajty bez ohledu na způsob uložení
+    """
+    if raw_data.codec in (None, CODEC_PLAIN):
+        return raw_data.xml_content.encode('utf-8')
+    if raw_data.codec == CODEC_FILE:
+        return archive_path(raw_data.content_hash).read_bytes()
+    if raw_data.codec == CODEC_DELTA:
+        return _rebuild_delta(raw_data)
+    return decompress_payload(raw_data.codec, raw_data.payload)
+
+@contextmanager
+def open_raw_xml(raw_data):
+    """
+    Otevření XML ze záznamu RawData pro parser
+
+    Soubory z archivu se mapují do paměti (mmap) a XMLParser je čte přímo,
+    bez mezikopie celého dokumentu v Pythonu. Ostatní záznamy vrací bajty,
+    starší nekomprimované záznamy text.
+    """
+    if raw_data.codec in (None, CODEC_PLAIN):
+        yield raw_data.xml_content
+        return
+
+    if raw_data.codec != CODEC_FILE:
+        yield read_raw_bytes(raw_data)
+        return
+
+    with open(archive_path(raw_data.content_hash), 'rb') as f:
+        if raw_data.size == 0:
+            # Prázdný soubor nejde namapovat
+            yield b''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
@@ -0,0 +1,318 @@
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, func, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+import config
+from backend.db_models import SessionLocal, RawData, init_db
+from backend.raw_store import RawDataPacker, read_raw_bytes
+from backend.xml_parser import BATCH_ITEM_TAGS
+from backend.aggregator import DataAggregator, reset_watermark
+from backend.pipeline import ProcessingPipeline
+
+logger = logging.getLogger(__name__)
+
+class SourceRow:
+    """Jeden archivovaný záznam ze zdrojové databáze"""
+
+    __slots__ = ('id', 'source_type', 'source_identifier', 'timestamp', 'data')
+
+    def __init__(self, row_id: int, source_type: str, source_identifier: Optional[str],
+                 timestamp: datetime, data: bytes):
+        self.id = row_id
+        self.source_type = source_type
+        self.source_identifier = source_identifier
+        self.timestamp = timestamp
+        self.data = data
+
+class RawDataSource:
+    """
+    Čtení surových dat z archivní databáze po dávkách podle id
+
+    Zdrojová databáze se jen čte. Záznamy uložené jako rozdíl se sestaví
+    v rámci její session, záznamy v souborovém archivu se čtou z
+    config.RAW_ARCHIVE_DIR. Databáze ze starší verze (jen xml_content
+    bez sloupce codec) se čtou přímo.
+    """
+
+    def __init__(self, path: Path, chunk_size: int = config.REPLAY_READ_CHUNK):
+        self.path = Path(path)
+        self.chunk_size = chunk_size
+        self.engine = create_engine(f"sqlite:///{self.path}")
+        self.Session = sessionmaker(bind=self.engine)
+        columns = {column['name'] for column in inspect(self.engine).get_columns('raw_data')}
+        self.legacy = 'codec' not in columns
+
+    def count(self) -> int:
+        with self.engine.connect() as conn:
+            return conn.execute(text('SELECT COUNT(*) FROM raw_data')).scalar()
+
+    def rows(self, limit: Optional[int] = None) -> Iterator[SourceRow]:
+        """
+        Záznamy v pořadí uložení (podle id)
+        """
+        last_id = 0
+        remaining = limit
+        db = self.Session()
+        try:
+            while remaining is None or remaining > 0:
+                size = self.chunk_size if remaining is None else min(self.chunk_size, remaining)
+                chunk = self._read_chunk(db, last_id, size)
+                if not chunk:
+                    return
+                for row in chunk:
+                    yield row
+                last_id = chunk[-1].id
+                if remaining is not None:
+                    remaining -= len(chunk)
+                db.expunge_all()
+        finally:
+            db.close()
+
+    def _read_chunk(self, db, last_id: int, size: int) -> List[SourceRow]:
+        if self.legacy:
+            result = db.execute(text(
+                'SELECT id, source_type, source_identifier, xml_content, timestamp '
+                'FROM raw_data WHERE id > :last_id ORDER BY id LIMIT :size'
+            ), {'last_id': last_id, 'size': size})
+            return [
+                SourceRow(row_id, source_type, identifier,
+                          timestamp if isinstance(timestamp, datetime) else datetime.fromisoformat(timestamp),
+                          (xml_content or '').encode('utf-8'))
+                for row_id, source_type, identifier, xml_content, timestamp in result
+            ]
+
+        rows = db.query(RawData).filter(RawData.id > last_id).order_by(RawData.id).limit(size).all()
+        return [SourceRow(row.id, row.source_type, row.source_identifier, row.timestamp, read_raw_bytes(row))
+                for row in rows]
+
+class LagTracker:
+    """
+    Zpoždění od zápisu záznamu do jeho zpracování ve stupni 'zpracování'
+
+    Zapsané záznamy čekají ve frontě v pořadí id; při každé kontrole se
+    z fronty odeberou všechny s id menším než nejmenší nezpracované id.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pending: deque = deque()  # (id, čas zápisu)
+        self.samples: List[float] = []
+
+    def written(self, row_id: int, at: float):
+        with self._lock:
+            self.pending.append((row_id, at))
+
+    def poll(self, db) -> int:
+        """Odebrání zpracovaných záznamů, vrací počet stále nezpracovaných"""
+        first_unprocessed = db.query(func.min(RawData.id)).filter(RawData.processed == False).scalar()
+        db.rollback()  # ukončení čtecí transakce, další kontrola uvidí nový stav
+        now = time.monotonic()
+        with self._lock:
+            while self.pending and (first_unprocessed is None or self.pending[0][0] < first_unprocessed):
+                _, written_at = self.pending.popleft()
+                self.samples.append(now - written_at)
+            return len(self.pending)
+
+    def summary(self) -> Dict[str, float]:
+        with self._lock:
+            samples = sorted(self.samples)
+        if not samples:
+            return {'avg': 0.0, 'p95': 0.0, 'max': 0.0}
+        return {
+            'avg': sum(samples) / len(samples),
+            'p95': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+            'max': samples[-1],
+        }
+
+class Replayer:
+    """
+    Přehrání archivovaných surových dat do čerstvé databáze
+
+    Záznamy se zapisují stejně jako z kolektoru (RawDataPacker) a
+    zpracovává je běžný ProcessingPipeline. Rozestupy zápisů odpovídají
+    původním časovým značkám dělených rychlostí speed; se speed=None se
+    zapisuje co nejrychleji. Záznamy si ponechají původní časovou
+    značku, takže výsledky i minutová agregace odpovídají přehrávané
+    noci při jakékoli rychlosti. S shift_to_now se všechny značky posunou
+    o stejný počet minut tak, aby první záznam připadl do minuty spuštění
+    (webová aplikace pak ukazuje "aktuální" data). Čas zápisu se měří
+    jen pro zpoždění zpracování. S verify se na konci aggregated_results
+    přehraného úseku porovná s přímou agregací výsledků.
+    """
+
+    def __init__(self, source: RawDataSource, speed: Optional[float] = 1.0,
+                 limit: Optional[int] = None, shift_to_now: bool = False,
+                 verify: bool = False):
+        self.source = source
+        self.speed = speed
+        self.limit = limit
+        self.shift_to_now = shift_to_now
+        self.verify = verify
+        self.mismatches: Optional[int] = None  # rozdílných řádků agregace (jen s verify)
+        self.offset = timedelta(0)  # posun původních časových značek
+        self.packer = RawDataPacker()
+        self.pipeline = ProcessingPipeline()
+        self.lag = LagTracker()
+
+        self.written = 0
+        self.written_bytes = 0
+        self.schedule_lag = 0.0  # o kolik je zápis aktuálně pozadu za plánem
+        self.max_schedule_lag = 0.0
+        self.started = 0.0
+        self.write_duration = 0.0  # doba od prvního do posledního zápisu
+
+    def _save(self, row: SourceRow, db) -> int:
+        """
+        Zápis jednoho záznamu do cílové databáze, vrací jeho id
+        """
+        raw_data = RawData(
+            source_type=row.source_type,
+            source_identifier=row.source_identifier,
+            timestamp=row.timestamp + self.offset,
+            processed=False,
+            **self.packer.pack(row.data, row.source_type, row.source_identifier,
+                               versioned=row.source_type not in BATCH_ITEM_TAGS)
+        )
+        db.add(raw_data)
+        db.commit()
+        return raw_data.id
+
+    def _wait_for(self, row: SourceRow, first: datetime):
+        """Čekání na okamžik, kdy má záznam podle plánu přijít"""
+        if self.speed is None:
+            return
+        due = self.started + (row.timestamp - first).total_seconds() / self.speed
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self.schedule_lag = max(0.0, -delay)
+        self.max_schedule_lag = max(self.max_schedule_lag, self.schedule_lag)
+
+    def run(self) -> Dict:
+        """
+        Přehrání všech záznamů a počkání na jejich zpracování, vrací souhrn
+        """
+        init_db()
+        total = self.source.count() if self.limit is None else min(self.limit, self.source.count())
+        speed_text = 'max' if self.speed is None else f"{self.speed:g}x"
+        logger.info(f"Přehrávám {total} záznamů z {self.source.path} rychlostí {speed_text}")
+
+        self.pipeline.start()
+        self.started = time.monotonic()
+        last_report = self.started
+        first = None
+
+        db = SessionLocal()
+        try:
+            for row in self.source.rows(self.limit):
+                if first is None:
+                    first = row.timestamp
+                    if self.shift_to_now:
+                        # Po celých minutách, ať posun nemění dělení do minut
+                        self.offset = (datetime.now().replace(second=0, microsecond=0)
+                                       - first.replace(second=0, microsecond=0))
+                        logger.info(f"Časové značky posunuty o {self.offset}")
+                self._wait_for(row, first)
+
+                start = time.monotonic()
+                row_id = self._save(row, db)
+                self.lag.written(row_id, time.monotonic())
+                self.written += 1
+                self.written_bytes += len(row.data)
+                self.pipeline.notify(1, time.monotonic() - start)
+
+                if time.monotonic() - last_report >= config.REPLAY_REPORT_INTERVAL:
+                    last_report = time.monotonic()
+                    self.lag.poll(db)
+                    logger.info(self.format_progress(total))
+
+            self.write_duration = time.monotonic() - self.started
+            self._drain(db)
+        finally:
+            self.pipeline.stop()
+            db.close()
+
+        # Závěrečná agregace celého přehraného úseku, ať výsledek nezávisí na
+        # tom, kdy naposledy běžel stupeň agregace a kam posunul hranici
+        if first is not None:
+            reset_watermark(first + self.offset)
+        db = SessionLocal()
+        try:
+            aggregator = DataAggregator(db)
+            aggregator.aggregate_by_minute()
+            if self.verify and first is not None:
+                self._verify(aggregator, first + self.offset)
+        finally:
+            db.close()
+
+        summary = self.summary()
+        logger.info(self.format_summary(summary))
+        return summary
+
+    def _drain(self, db):
+        """Čekání, až pipeline zpracuje všechny zapsané záznamy"""
+        deadline = time.monotonic() + config.REPLAY_DRAIN_TIMEOUT
+        while self.lag.poll(db) and time.monotonic() < deadline:
+            time.sleep(0.5)
+        remaining = self.lag.poll(db)
+        if remaining:
+            logger.warning(f"Po {config.REPLAY_DRAIN_TIMEOUT}s zůstalo nezpracováno {remaining} záznamů")
+
+    def _verify(self, aggregator: DataAggregator, start: datetime):
+        """Kontrola aggregated_results přehraného úseku proti přímé agregaci"""
+        end = aggregator.db.query(func.max(RawData.timestamp)).scalar() + timedelta(minutes=1)
+        mismatches = aggregator.verify_aggregation(start, end)
+        self.mismatches = len(mismatches)
+        if not mismatches:
+            logger.info(f"Agregace od {start} souhlasí s přímou agregací výsledků")
+            return
+        logger.warning(f"Agregace se liší od přímé agregace výsledků v {len(mismatches)} řádcích")
+        for minute, region_id, party_id, stored, expected in mismatches[:10]:
+            logger.warning(f"  {minute} region {region_id} strana {party_id}: "
+                           f"uloženo {stored}, spočítáno {expected}")
+
+    def format_progress(self, total: int) -> str:
+        elapsed = time.monotonic() - self.started
+        lag = self.lag.summary()
+        return (f"Přehráno {self.written}/{total} záznamů ({self.written / elapsed:.1f}/s), "
+                f"zápis pozadu {self.schedule_lag:.1f}s, zpoždění zpracování "
+                f"průměr {lag['avg']:.1f}s / p95 {lag['p95']:.1f}s; {self.pipeline.format_stats()}")
+
+    def summary(self) -> Dict:
+        elapsed = time.monotonic() - self.started
+        writing = self.write_duration or elapsed
+        ingest = self.pipeline.ingest_stage.stats
+        return {
+            'records': self.written,
+            'megabytes': self.written_bytes / 1024 / 1024,
+            'elapsed': elapsed,  # včetně čekání na zpracování posledních záznamů
+            'records_per_s': self.written / writing if writing else 0.0,
+            'megabytes_per_s': self.written_bytes / 1024 / 1024 / writing if writing else 0.0,
+            'ingest_busy': ingest.busy,
+            'ingest_records_per_s': ingest.items / ingest.busy if ingest.busy else 0.0,
+            'max_schedule_lag': self.max_schedule_lag,
+            'lag': self.lag.summary(),
+            'aggregation_mismatches': self.mismatches,
+        }
+
+    @staticmethod
+    def format_summary(summary: Dict) -> str:
+        lag = summary['lag']
+        return (f"Přehráno {summary['records']} záznamů ({summary['megabytes']:.1f} MB) "
+                f"za {summary['elapsed']:.1f}s: {summary['records_per_s']:.1f} záznamů/s, "
+                f"{summary['megabytes_per_s']:.2f} MB/s; zpracování {summary['ingest_records_per_s']:.1f} "
+                f"záznamů/s práce; zpoždění zpracování průměr {lag['avg']:.2f}s, "
+                f"p95 {lag['p95']:.2f}s, max {lag['max']:.2f}s; "
+                f"zápis nejvýše {summary['max_schedule_lag']:.1f}s za plánem"
+                + ("" if summary['aggregation_mismatches'] is None else
+                   f"; rozdílů agregace {summary['aggregation_mismatches']}"))
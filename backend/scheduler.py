@@ -0,0 +1,106 @@
+import time
+import logging
+from typing import Dict, List, Optional
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+
+logger = logging.getLogger(__name__)
+
+class FeedSchedule:
+    """Plán stahování jednoho souboru"""
+
+    def __init__(self, key: str, group: str, floor: float, ceiling: float, now: float):
+        self.key = key
+        self.group = group
+        self.floor = floor
+        self.ceiling = ceiling
+        self.interval = floor
+        self.next_due = now  # poprvé se stahuje hned
+        self.polls = 0
+        self.changes = 0
+        self.change_rate = 1.0  # klouzavý průměr podílu stažení se změnou
+
+class AdaptiveScheduler:
+    """
+    Adaptivní plánovač stahování jednotlivých souborů
+
+    Interval každého souboru se pohybuje mezi spodní a horní mezí jeho
+    skupiny (config.POLL_INTERVALS). Po změně obsahu spadne na spodní mez,
+    každé stažení beze změny ho prodlouží koeficientem POLL_BACKOFF_FACTOR.
+    Před otevřením místností a po dosčítání se tak stahuje řídce, během
+    sčítání co nejčastěji.
+    """
+
+    def __init__(self, intervals: Dict[str, tuple] = None,
+                 backoff_factor: float = config.POLL_BACKOFF_FACTOR):
+        self.intervals = intervals or config.POLL_INTERVALS
+        self.backoff_factor = backoff_factor
+        self.feeds: Dict[str, FeedSchedule] = {}
+
+    def register(self, key: str, group: str, now: Optional[float] = None):
+        """
+        Přidání souboru do plánu s mezemi intervalu podle skupiny
+        """
+        if key in self.feeds:
+            return
+        floor, ceiling = self.intervals[group]
+        self.feeds[key] = FeedSchedule(key, group, floor, ceiling,
+                                       time.monotonic() if now is None else now)
+
+    def due(self, now: Optional[float] = None) -> List[str]:
+        """
+        Soubory, které je čas stáhnout
+        """
+        now = time.monotonic() if now is None else now
+        return [key for key, feed in self.feeds.items() if feed.next_due <= now]
+
+    def record(self, key: str, changed: bool, now: Optional[float] = None):
+        """
+        Zaznamenání výsledku stažení a naplánování dalšího
+        """
+        feed = self.feeds[key]
+        now = time.monotonic() if now is None else now
+
+        feed.polls += 1
+        feed.change_rate = 0.8 * feed.change_rate + 0.2 * (1.0 if changed else 0.0)
+
+        if changed:
+            feed.changes += 1
+            feed.interval = feed.floor
+        else:
+            feed.interval = min(feed.ceiling, feed.interval * self.backoff_factor)
+
+        feed.next_due = now + feed.interval
+
+    def trigger(self, key: str, now: Optional[float] = None):
+        """
+        Vynucení stažení souboru v nejbližším cyklu
+        """
+        feed = self.feeds[key]
+        feed.next_due = time.monotonic() if now is None else now
+
+    def next_due_in(self, now: Optional[float] = None) -> float:
+        """
+        Počet sekund do nejbližšího plánovaného stažení
+        """
+        if not self.feeds:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        return max(0.0, min(feed.next_due for feed in self.feeds.values()) - now)
+
+    def format_stats(self) -> str:
+        """Souhrn průměrných intervalů a četnosti změn po skupinách pro log"""
+        groups: Dict[str, List[FeedSchedule]] = {}
+        for feed in self.feeds.values():
+            groups.setdefault(feed.group, []).append(feed)
+
+        parts = []
+        for group, feeds in groups.items():
+            avg_interval = sum(f.interval for f in feeds) / len(feeds)
+            avg_rate = sum(f.change_rate for f in feeds) / len(feeds)
+            polls = sum(f.polls for f in feeds)
+            parts.append(f"{group}: interval {avg_interval:.1f}s, změny {avg_rate:.0%}, stažení {polls}")
+        return '; '.join(parts)
@@ -1,11 +1,26 @@
 from lxml import etree
 from datetime import datetime
+import io
+import zlib
 import logging
-from typing import Dict, List, Optional, Tuple
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# XML jako text, bajty nebo souborový objekt (např. mmap souboru z archivu)
+XMLSource = Union[str, bytes, BinaryIO]
+
+# Typy zdrojů, které umí parser číst proudově (iterparse)
+STREAMING_SOURCE_TYPES = ('okres', 'kandidati', 'okrsky', 'obce', 'okresy')
+
+# Element jedné položky dávky podle typu dávky
+BATCH_ITEM_TAGS = {
+    'okrsky': 'OKRSEK',
+    'obce': 'OBEC',
+    'okresy': 'OKRES',
+}
+
 class XMLParser:
     """Parser pro zpracování XML dat z volby.cz"""
     
@@ -14,12 +29,128 @@ class XMLParser:
             'ns': 'http://www.volby.cz/ps/2025'
         }
     
-    def parse_main_results(self, xml_content: str) -> Dict:
+    def _parse_root(self, xml_content: XMLSource) -> etree._Element:
+        """
+        Sestavení stromu z textu, bajtů nebo souborového objektu (např. mmap)
+        """
+        if isinstance(xml_content, str):
+            return etree.fromstring(xml_content.encode('utf-8'))
+        if isinstance(xml_content, bytes):
+            return etree.fromstring(xml_content)
+        # libxml2 si soubor čte po částech, celý dokument se v Pythonu nekopíruje
+        return etree.parse(xml_content).getroot()
+    
+    def _iterparse(self, xml_content: XMLSource, **kwargs):
+        """
+        Proudové čtení z textu, bajtů nebo souborového objektu (např. mmap)
+        """
+        if isinstance(xml_content, str):
+            xml_content = io.BytesIO(xml_content.encode('utf-8'))
+        elif isinstance(xml_content, bytes):
+            xml_content = io.BytesIO(xml_content)
+        return etree.iterparse(xml_content, **kwargs)
+    
+    @staticmethod
+    def _free(elem: etree._Element):
+        """
+        Uvolnění zpracovaného elementu i jeho už zpracovaných předchůdců,
+        aby strom při proudovém čtení nerostl
+        """
+        elem.clear()
+        parent = elem.getparent()
+        if parent is not None:
+            while elem.getprevious() is not None:
+                del parent[0]
+    
+    def _party_records(self, elem: etree._Element, percentage: bool = True) -> List[Dict]:
+        """
+        Výsledky stran jednoho regionu
+
+        Strana s hodnotou, kterou nejde převést na číslo, se vynechá
+        s varováním, ostatní strany i regiony souboru zůstanou.
+        """
+        parties = []
+        for strana in elem.findall('.//STRANA', self.namespaces):
+            try:
+                party_result = {
+                    'code': strana.get('KSTRANA'),
+                    'votes': int(strana.get('HLASY', 0))
+                }
+                if percentage:
+                    party_result['percentage'] = float(strana.get('PROC_HLASU', '0').replace(',', '.'))
+            except ValueError as e:
+                region = elem.get('CIS_OBEC') or elem.get('CIS_OKRSEK') or elem.get('CIS_OKRES')
+                logger.warning(f"Vynechávám stranu {strana.get('KSTRANA')} v {elem.tag} {region}: {e}")
+                continue
+            parties.append(party_result)
+        return parties
+    
+    def _obec_record(self, obec: etree._Element) -> Dict:
+        """Výsledky jedné obce ze souboru okresu"""
+        obec_data = {
+            'code': obec.get('CIS_OBEC'),
+            'name': obec.get('NAZ_OBEC'),
+            'counted': obec.get('ZPRACOVANO') == '1',
+            'parties': self._party_records(obec, percentage=False)
+        }
+        return obec_data
+    
+    def _candidate_record(self, kandidat: etree._Element) -> Dict:
+        """Jeden kandidát s přednostními hlasy"""
+        return {
+            'party_code': kandidat.get('KSTRANA'),
+            'region_code': kandidat.get('CKRAJ'),
+            'name': kandidat.get('JMENO'),
+            'surname': kandidat.get('PRIJMENI'),
+            'title_before': kandidat.get('TITULPRED', ''),
+            'title_after': kandidat.get('TITULZA', ''),
+            'position': int(kandidat.get('PORCISLO', 0)),
+            'preferential_votes': int(kandidat.get('PREF_HLASY', 0)),
+            'preferential_percentage': float(kandidat.get('PROC_PREF_HLASU', '0').replace(',', '.')),
+            'elected': kandidat.get('ZVOLEN') == '1'
+        }
+    
+    def _batch_item_record(self, item: etree._Element, batch_type: str) -> Dict:
+        """Jedna položka dávky (okrsek, obec nebo okres)"""
+        # Různé typy dávek mají různou strukturu
+        if batch_type == 'okrsky':
+            item_data = {
+                'code': item.get('CIS_OKRSEK'),
+                'obec_code': item.get('CIS_OBEC'),
+                'processed': item.get('ZPRACOVANO') == '1',
+                'parties': self._party_records(item, percentage=False)
+            }
+            return item_data
+        
+        if batch_type == 'obce':
+            item_data = {
+                'code': item.get('CIS_OBEC'),
+                'name': item.get('NAZ_OBEC'),
+                'okres_code': item.get('CIS_OKRES'),
+                'processed': item.get('ZPRACOVANO') == '1',
+                'turnout': float(item.get('UCAST_PROC', '0').replace(',', '.')),
+                'parties': []
+            }
+        else:
+            item_data = {
+                'code': item.get('CIS_OKRES'),
+                'name': item.get('NAZ_OKRES'),
+                'kraj_code': item.get('CIS_KRAJ'),
+                'counted_districts': int(item.get('OKRSKY_ZPRAC', 0)),
+                'total_districts': int(item.get('OKRSKY_CELKEM', 0)),
+                'turnout': float(item.get('UCAST_PROC', '0').replace(',', '.')),
+                'parties': []
+            }
+        
+        item_data['parties'] = self._party_records(item)
+        return item_data
+    
+    def parse_main_results(self, xml_content: XMLSource) -> Dict:
         """
         Parsování hlavních výsledků voleb
         """
         try:
-            root = etree.fromstring(xml_content.encode('utf-8'))
+            root = self._parse_root(xml_content)
             
             results = {
                 'timestamp': datetime.now(),
@@ -78,12 +209,31 @@ class XMLParser:
             logger.error(f"Chyba při parsování hlavních výsledků: {e}")
             return {}
     
-    def parse_okres_results(self, xml_content: str, okres_code: str) -> Dict:
+    def kraj_signatures(self, xml_content: XMLSource) -> Dict[str, int]:
+        """
+        Otisk výsledků každého kraje v hlavním souboru (CRC32 elementu KRAJ)
+
+        Otisk se změní s jakoukoli změnou průběhu sčítání nebo hlasů kraje.
+        Klíčem je NUTS kód kraje (NUTS_KRAJ, jinak CIS_KRAJ), tj. prvních
+        pět znaků kódu jeho okresů.
+        """
+        signatures = {}
+        try:
+            for _, kraj in self._iterparse(xml_content, tag='KRAJ'):
+                code = kraj.get('NUTS_KRAJ') or kraj.get('CIS_KRAJ')
+                if code:
+                    signatures[code] = zlib.crc32(etree.tostring(kraj))
+                self._free(kraj)
+        except etree.XMLSyntaxError as e:
+            logger.error(f"Chyba při čtení krajů z hlavních výsledků: {e}")
+        return signatures
+    
+    def parse_okres_results(self, xml_content: XMLSource, okres_code: str) -> Dict:
         """
         Parsování výsledků za okres
         """
         try:
-            root = etree.fromstring(xml_content.encode('utf-8'))
+            root = self._parse_root(xml_content)
             
             results = {
                 'timestamp': datetime.now(),
@@ -120,21 +270,7 @@ class XMLParser:
             
             # Výsledky po obcích
             for obec in root.findall('.//OBEC', self.namespaces):
-                obec_data = {
-                    'code': obec.get('CIS_OBEC'),
-                    'name': obec.get('NAZ_OBEC'),
-                    'counted': obec.get('ZPRACOVANO') == '1',
-                    'parties': []
-                }
-                
-                for strana in obec.findall('.//STRANA', self.namespaces):
-                    party_result = {
-                        'code': strana.get('KSTRANA'),
-                        'votes': int(strana.get('HLASY', 0))
-                    }
-                    obec_data['parties'].append(party_result)
-                
-                results['obce'].append(obec_data)
+                results['obce'].append(self._obec_record(obec))
             
             return results
             
@@ -142,29 +278,17 @@ class XMLParser:
             logger.error(f"Chyba při parsování výsledků okresu {okres_code}: {e}")
             return {}
     
-    def parse_candidates_results(self, xml_content: str) -> List[Dict]:
+    def parse_candidates_results(self, xml_content: XMLSource) -> List[Dict]:
         """
         Parsování přednostních hlasů kandidátů
         """
         try:
-            root = etree.fromstring(xml_content.encode('utf-8'))
+            root = self._parse_root(xml_content)
             
             candidates = []
             
             for kandidat in root.findall('.//KANDIDAT', self.namespaces):
-                candidate_data = {
-                    'party_code': kandidat.get('KSTRANA'),
-                    'region_code': kandidat.get('CKRAJ'),
-                    'name': kandidat.get('JMENO'),
-                    'surname': kandidat.get('PRIJMENI'),
-                    'title_before': kandidat.get('TITULPRED', ''),
-                    'title_after': kandidat.get('TITULZA', ''),
-                    'position': int(kandidat.get('PORCISLO', 0)),
-                    'preferential_votes': int(kandidat.get('PREF_HLASY', 0)),
-                    'preferential_percentage': float(kandidat.get('PROC_PREF_HLASU', '0').replace(',', '.')),
-                    'elected': kandidat.get('ZVOLEN') == '1'
-                }
-                candidates.append(candidate_data)
+                candidates.append(self._candidate_record(kandidat))
             
             return candidates
             
@@ -172,12 +296,12 @@ class XMLParser:
             logger.error(f"Chyba při parsování kandidátů: {e}")
             return []
     
-    def parse_batch_results(self, xml_content: str, batch_type: str) -> Dict:
+    def parse_batch_results(self, xml_content: XMLSource, batch_type: str) -> Dict:
         """
         Parsování dávkových souborů (okrsky, obce, okresy)
         """
         try:
-            root = etree.fromstring(xml_content.encode('utf-8'))
+            root = self._parse_root(xml_content)
             
             results = {
                 'timestamp': datetime.now(),
@@ -185,67 +309,10 @@ class XMLParser:
                 'items': []
             }
             
-            # Různé typy dávek mají různou strukturu
-            if batch_type == 'okrsky':
-                for okrsek in root.findall('.//OKRSEK', self.namespaces):
-                    item_data = {
-                        'code': okrsek.get('CIS_OKRSEK'),
-                        'obec_code': okrsek.get('CIS_OBEC'),
-                        'processed': okrsek.get('ZPRACOVANO') == '1',
-                        'parties': []
-                    }
-                    
-                    for strana in okrsek.findall('.//STRANA', self.namespaces):
-                        party_result = {
-                            'code': strana.get('KSTRANA'),
-                            'votes': int(strana.get('HLASY', 0))
-                        }
-                        item_data['parties'].append(party_result)
-                    
-                    results['items'].append(item_data)
-                    
-            elif batch_type == 'obce':
-                for obec in root.findall('.//OBEC', self.namespaces):
-                    item_data = {
-                        'code': obec.get('CIS_OBEC'),
-                        'name': obec.get('NAZ_OBEC'),
-                        'okres_code': obec.get('CIS_OKRES'),
-                        'processed': obec.get('ZPRACOVANO') == '1',
-                        'turnout': float(obec.get('UCAST_PROC', '0').replace(',', '.')),
-                        'parties': []
-                    }
-                    
-                    for strana in obec.findall('.//STRANA', self.namespaces):
-                        party_result = {
-                            'code': strana.get('KSTRANA'),
-                            'votes': int(strana.get('HLASY', 0)),
-                            'percentage': float(strana.get('PROC_HLASU', '0').replace(',', '.'))
-                        }
-                        item_data['parties'].append(party_result)
-                    
-                    results['items'].append(item_data)
-                    
-            elif batch_type == 'okresy':
-                for okres in root.findall('.//OKRES', self.namespaces):
-                    item_data = {
-                        'code': okres.get('CIS_OKRES'),
-                        'name': okres.get('NAZ_OKRES'),
-                        'kraj_code': okres.get('CIS_KRAJ'),
-                        'counted_districts': int(okres.get('OKRSKY_ZPRAC', 0)),
-                        'total_districts': int(okres.get('OKRSKY_CELKEM', 0)),
-                        'turnout': float(okres.get('UCAST_PROC', '0').replace(',', '.')),
-                        'parties': []
-                    }
-                    
-                    for strana in okres.findall('.//STRANA', self.namespaces):
-                        party_result = {
-                            'code': strana.get('KSTRANA'),
-                            'votes': int(strana.get('HLASY', 0)),
-                            'percentage': float(strana.get('PROC_HLASU', '0').replace(',', '.'))
-                        }
-                        item_data['parties'].append(party_result)
-                    
-                    results['items'].append(item_data)
+            item_tag = BATCH_ITEM_TAGS.get(batch_type)
+            if item_tag:
+                for item in root.findall(f'.//{item_tag}', self.namespaces):
+                    results['items'].append(self._batch_item_record(item, batch_type))
             
             return results
             
@@ -253,12 +320,113 @@ class XMLParser:
             logger.error(f"Chyba při parsování dávky typu {batch_type}: {e}")
             return {}
     
-    def parse_zahranici_results(self, xml_content: str) -> Dict:
+    def stream_okres_results(self, xml_content: XMLSource, okres_code: str) -> Dict:
+        """
+        Proudové parsování výsledků za okres
+        
+        Souhrn okresu (název, průběh sčítání, strany) se přečte hned, obce
+        vrací generátor v klíči 'obce' po jedné, a zpracované elementy se
+        průběžně uvolňují. Předpokládá, že souhrn okresu je v souboru před
+        první obcí, jako u souborů volby.cz. Generátor je nutné projít,
+        dokud je zdroj (např. mmap) otevřený.
+        """
+        results = {
+            'timestamp': datetime.now(),
+            'okres_code': okres_code,
+            'okres_name': '',
+            'progress': {},
+            'parties': [],
+            'obce': iter(())
+        }
+        
+        try:
+            events = self._iterparse(xml_content, events=('start', 'end'))
+            in_okres = False
+            
+            for event, elem in events:
+                if event == 'start':
+                    if elem.tag == 'OKRES':
+                        in_okres = True
+                        results['okres_name'] = elem.get('NAZ_OKRES', '')
+                    elif elem.tag == 'OBEC':
+                        results['obce'] = self._stream_obce(events, okres_code)
+                        break
+                    continue
+                
+                if elem.tag == 'OKRES':
+                    in_okres = False
+                elif in_okres and elem.tag == 'UCAST' and not results['progress']:
+                    results['progress'] = {
+                        'total_districts': int(elem.get('OKRSKY_CELKEM', 0)),
+                        'counted_districts': int(elem.get('OKRSKY_ZPRAC', 0)),
+                        'percentage_counted': float(elem.get('OKRSKY_ZPRAC_PROC', 0)),
+                        'turnout': float(elem.get('UCAST_PROC', 0))
+                    }
+                elif in_okres and elem.tag == 'STRANA':
+                    results['parties'].append({
+                        'code': elem.get('KSTRANA'),
+                        'votes': int(elem.get('HLASY', 0)),
+                        'percentage': float(elem.get('PROC_HLASU', '0').replace(',', '.'))
+                    })
+                    self._free(elem)
+            
+            return results
+            
+        except Exception as e:
+            logger.error(f"Chyba při parsování výsledků okresu {okres_code}: {e}")
+            return {}
+    
+    def _stream_obce(self, events, okres_code: str) -> Iterator[Dict]:
+        """Obce okresu ze zbytku proudu událostí"""
+        try:
+            for event, elem in events:
+                if event == 'end' and elem.tag == 'OBEC':
+                    yield self._obec_record(elem)
+                    self._free(elem)
+        except Exception as e:
+            logger.error(f"Chyba při proudovém parsování obcí okresu {okres_code}: {e}")
+            raise
+    
+    def stream_candidates_results(self, xml_content: XMLSource) -> Iterator[Dict]:
+        """
+        Proudové parsování přednostních hlasů kandidátů, po jednom kandidátovi
+        """
+        try:
+            for _, kandidat in self._iterparse(xml_content, events=('end',), tag='KANDIDAT'):
+                yield self._candidate_record(kandidat)
+                self._free(kandidat)
+        except Exception as e:
+            logger.error(f"Chyba při proudovém parsování kandidátů: {e}")
+            raise
+    
+    def stream_batch_results(self, xml_content: XMLSource, batch_type: str) -> Dict:
+        """
+        Proudové parsování dávkových souborů, položky vrací generátor v klíči 'items'
+        """
+        return {
+            'timestamp': datetime.now(),
+            'batch_type': batch_type,
+            'items': self._stream_batch_items(xml_content, batch_type)
+        }
+    
+    def _stream_batch_items(self, xml_content: XMLSource, batch_type: str) -> Iterator[Dict]:
+        item_tag = BATCH_ITEM_TAGS.get(batch_type)
+        if not item_tag:
+            return
+        try:
+            for _, item in self._iterparse(xml_content, events=('end',), tag=item_tag):
+                yield self._batch_item_record(item, batch_type)
+                self._free(item)
+        except Exception as e:
+            logger.error(f"Chyba při proudovém parsování dávky typu {batch_type}: {e}")
+            raise
+    
+    def parse_zahranici_results(self, xml_content: XMLSource) -> Dict:
         """
         Parsování výsledků ze zahraničí
         """
         try:
-            root = etree.fromstring(xml_content.encode('utf-8'))
+            root = self._parse_root(xml_content)
             
             results = {
                 'timestamp': datetime.now(),
@@ -303,4 +471,37 @@ class XMLParser:
             
         except Exception as e:
             logger.error(f"Chyba při parsování výsledků ze zahraničí: {e}")
-            return {}
\ No newline at end of file
+            return {}
+
+_default_parser = XMLParser()
+
+def parse_raw_xml(source_type: str, source_identifier: Optional[str],
+                  xml_content: XMLSource, parser: Optional[XMLParser] = None,
+                  stream: bool = False):
+    """
+    Parsování XML podle typu zdroje do prostých struktur (dict/list)
+
+    Výsledek neobsahuje žádné objekty lxml, takže ho lze předat mezi
+    procesy. Se stream=True vrací velké soubory (STREAMING_SOURCE_TYPES)
+    místo seznamů generátory, které je nutné projít, dokud je zdroj
+    otevřený. Pro neznámý typ zdroje vrací None.
+    """
+    parser = parser or _default_parser
+    if stream and source_type in STREAMING_SOURCE_TYPES:
+        if source_type == 'okres':
+            return parser.stream_okres_results(xml_content, source_identifier)
+        if source_type == 'kandidati':
+            return parser.stream_candidates_results(xml_content)
+        return parser.stream_batch_results(xml_content, source_type)
+    
+    if source_type == 'main':
+        return parser.parse_main_results(xml_content)
+    elif source_type == 'okres':
+        return parser.parse_okres_results(xml_content, source_identifier)
+    elif source_type == 'kandidati':
+        return parser.parse_candidates_results(xml_content)
+    elif source_type == 'zahranici':
+        return parser.parse_zahranici_results(xml_content)
+    elif source_type in ['okrsky', 'obce', 'okresy']:
+        return parser.parse_batch_results(xml_content, source_type)
+    return None
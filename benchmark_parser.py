@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Benchmark XML parseru nad realistickými soubory v celostátním rozsahu
+
+Měří propustnost (MB/s, položek/s) a špičkovou paměť každé parse_* metody
+ve všech režimech (tree, stream, columnar). Soubory generuje
+election_simulation podle seedu, nebo se načtou z adresáře s fixturami.
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+import sys
+import os
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from backend.xml_parser import XMLParser
+from backend.columnar_parser import ColumnarParser, RegionColumns
+from election_simulation import ElectionSimulation
+
+def build_corpus(seed: int, counted: float) -> Dict[str, Tuple[str, bytes]]:
+    """
+    Dokumenty k měření: název -> (typ zdroje, obsah)
+
+    Okres je ten s nejvíce obcemi, dávky pokrývají 1 % okrsků.
+    """
+    simulation = ElectionSimulation(seed)
+    simulation.count_until(counted)
+    okrsky = simulation.counting_order[:max(1, simulation.counted_count // 100)]
+
+    largest = max(range(len(simulation.okres_codes)),
+                  key=lambda index: int((simulation.obec_okres == index).sum()))
+    okres_code = simulation.okres_codes[largest]
+
+    return {
+        'main': ('main', simulation.main_xml()),
+        f'okres {okres_code}': ('okres', simulation.okres_xml(okres_code)),
+        'kandidati': ('kandidati', simulation.candidates_xml()),
+        'zahranici': ('zahranici', simulation.zahranici_xml()),
+        'dávka okrsky': ('okrsky', simulation.okrsky_batch_xml(okrsky)),
+        'dávka obce': ('obce', simulation.obce_batch_xml(okrsky)),
+        'dávka okresy': ('okresy', simulation.okresy_batch_xml(okrsky)),
+    }
+
+def load_corpus(fixtures: Path) -> Dict[str, Tuple[str, bytes]]:
+    """
+    Dokumenty z adresáře zapsaného election_simulation.write_fixtures
+    """
+    corpus = {
+        'main': ('main', (fixtures / 'vysledky.xml').read_bytes()),
+        'kandidati': ('kandidati', (fixtures / 'vysledky_kandid.xml').read_bytes()),
+        'zahranici': ('zahranici', (fixtures / 'vysledky_zahranici.xml').read_bytes()),
+    }
+    okresy = sorted((fixtures / 'okresy').glob('vysledky_okres_*.xml'), key=lambda p: p.stat().st_size)
+    if okresy:
+        okres_code = okresy[-1].stem.rsplit('_', 1)[-1]
+        corpus[f'okres {okres_code}'] = ('okres', okresy[-1].read_bytes())
+    for batch_type, directory in (('okrsky', 'okrsky'), ('obce', 'obce_d'), ('okresy', 'okresy_d')):
+        batches = sorted((fixtures / directory).glob('*.xml'))
+        if batches:
+            corpus[f'dávka {batch_type}'] = (batch_type, batches[-1].read_bytes())
+    return corpus
+
+def _count_items(result) -> int:
+    """
+    Počet položek výsledku; generátory se přitom projdou celé
+    """
+    if isinstance(result, RegionColumns):
+        return len(result.region_codes)
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, dict):
+        for key in ('obce', 'items', 'countries', 'regions'):
+            if key in result:
+                return _count_items(result[key])
+        return len(result.get('parties', []))
+    return sum(1 for _ in result)
+
+def parse_methods(source_type: str) -> List[Tuple[str, Callable]]:
+    """
+    Metody parseru použitelné pro daný typ zdroje jako (režim, funkce)
+    """
+    xml_parser = XMLParser()
+    columnar_parser = ColumnarParser()
+
+    if source_type == 'main':
+        return [('tree', xml_parser.parse_main_results)]
+    if source_type == 'zahranici':
+        return [('tree', xml_parser.parse_zahranici_results)]
+    if source_type == 'kandidati':
+        return [('tree', xml_parser.parse_candidates_results),
+                ('stream', xml_parser.stream_candidates_results)]
+    if source_type == 'okres':
+        return [('tree', lambda xml: xml_parser.parse_okres_results(xml, '')),
+                ('stream', lambda xml: xml_parser.stream_okres_results(xml, '')),
+                ('columnar', lambda xml: columnar_parser.parse_okres_results(xml, ''))]
+
+    methods = [('tree', lambda xml: xml_parser.parse_batch_results(xml, source_type)),
+               ('stream', lambda xml: xml_parser.stream_batch_results(xml, source_type))]
+    if source_type == 'obce':
+        methods.append(('columnar', lambda xml: columnar_parser.parse_batch_results(xml, source_type)))
+    return methods
+
+def measure(method: Callable, content: bytes, repeat: int) -> Dict:
+    """
+    Nejlepší čas z repeat běhů a špičková paměť z jednoho běhu navíc
+
+    Paměť se měří zvlášť, protože tracemalloc měření času zkresluje.
+    """
+    best = None
+    items = 0
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        items = _count_items(method(content))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    gc.collect()
+    tracemalloc.start()
+    _count_items(method(content))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'seconds': best, 'items': items, 'peak': peak}
+
+def run_benchmark(corpus: Dict[str, Tuple[str, bytes]], repeat: int) -> List[Dict]:
+    rows = []
+    for name, (source_type, content) in corpus.items():
+        for mode, method in parse_methods(source_type):
+            result = measure(method, content, repeat)
+            size_mb = len(content) / 1024 / 1024
+            rows.append({
+                'document': name,
+                'mode': mode,
+                'size_mb': size_mb,
+                'items': result['items'],
+                'seconds': result['seconds'],
+                'mb_per_s': size_mb / result['seconds'] if result['seconds'] else 0.0,
+                'items_per_s': result['items'] / result['seconds'] if result['seconds'] else 0.0,
+                'peak_mb': result['peak'] / 1024 / 1024,
+            })
+    return rows
+
+def print_table(rows: List[Dict]):
+    header = (f"{'dokument':<20} {'režim':<9} {'MB':>7} {'položek':>8} {'čas [s]':>8} "
+              f"{'MB/s':>8} {'položek/s':>11} {'paměť MB':>9}")
+    print(header)
+    print('-' * len(header))
+    for row in rows:
+        print(f"{row['document']:<20} {row['mode']:<9} {row['size_mb']:>7.2f} {row['items']:>8} "
+              f"{row['seconds']:>8.3f} {row['mb_per_s']:>8.1f} {row['items_per_s']:>11.0f} "
+              f"{row['peak_mb']:>9.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark XML parseru")
+    parser.add_argument('--seed', type=int, default=2025)
+    parser.add_argument('--counted', type=float, default=1.0, help="podíl sečtených okrsků (0-1)")
+    parser.add_argument('--fixtures', type=Path, help="adresář s fixturami místo generování")
+    parser.add_argument('--repeat', type=int, default=5, help="počet opakování měření času")
+    args = parser.parse_args()
+
+    if args.fixtures:
+        corpus = load_corpus(args.fixtures)
+        print(f"Fixtury: {args.fixtures}")
+    else:
+        corpus = build_corpus(args.seed, args.counted)
+        print(f"Seed {args.seed}, sečteno {args.counted:.0%}")
+
+    print_table(run_benchmark(corpus, args.repeat))
+
+if __name__ == "__main__":
+    main()
@@ -3,14 +3,15 @@ from pathlib import Path
 
 # Cesty
 BASE_DIR = Path(__file__).parent
-DATABASE_PATH = BASE_DIR / 'database' / 'volby.db'
+DATABASE_PATH = Path(os.getenv('VOLBY_DATABASE_PATH', BASE_DIR / 'database' / 'volby.db'))
 LOG_DIR = BASE_DIR / 'logs'
 
 # Vytvoření složky pro logy
 LOG_DIR.mkdir(exist_ok=True)
 
 # URL pro stahování dat
-BASE_URL = "https://www.volby.cz/appdata/ps2025/odata"
+# (VOLBY_BASE_URL přesměruje kolektor např. na lokální mock_volby_server.py)
+BASE_URL = os.getenv('VOLBY_BASE_URL', "https://www.volby.cz/appdata/ps2025/odata").rstrip('/')
 URLS = {
     'main': f"{BASE_URL}/vysledky.xml",
     'krajmesta': f"{BASE_URL}/vysledky_krajmesta.xml",
@@ -32,14 +33,70 @@ OKRES_CODES = [
 ]
 
 # Nastavení stahování
-DOWNLOAD_INTERVAL = 1  # sekund mezi stahováním
+DOWNLOAD_INTERVAL = 1  # sekund mezi cykly kolektoru
 MAX_BATCH_NUMBER = 9999  # maximální číslo dávky
-BATCH_CHECK_INTERVAL = 60  # sekund mezi kontrolami nových dávek
+BATCH_DOWNLOAD_CHUNK = 64  # max. dávek stažených najednou při dohánění
+
+# Adaptivní plánování stahování - (nejkratší, nejdelší) interval v sekundách
+# pro každou skupinu souborů; po změně obsahu se stahuje s nejkratším
+# intervalem, každé stažení beze změny ho prodlouží POLL_BACKOFF_FACTOR-krát
+POLL_INTERVALS = {
+    'main': (DOWNLOAD_INTERVAL, 30),  # vysledky.xml, krajmesta, zahranici, kandidati
+    'okres': (180, 600),  # jen pojistka, jinak se stahují po posunu sčítání v kraji
+    'batch': (15, 300),  # kontrola nových dávek každého typu
+}
+POLL_BACKOFF_FACTOR = 1.5
+
+# Paralelní stahování
+MAX_CONCURRENT_DOWNLOADS = int(os.getenv('MAX_CONCURRENT_DOWNLOADS', 16))  # max. souběžných požadavků
+REQUEST_TIMEOUT = 10  # sekund - timeout jednoho HTTP pokusu (spojení i čtení)
+REQUEST_DEADLINE = 15  # sekund - celkový limit jednoho souboru včetně opakování
+DOWNLOAD_RETRIES = 3  # počet pokusů o stažení jednoho souboru
+RETRY_BUDGET_PER_CYCLE = 20  # max. opakovaných pokusů za cyklus kolektoru (všechny soubory dohromady)
+
+# Jistič URL - po CIRCUIT_FAILURE_THRESHOLD selháních za sebou se URL přestane
+# stahovat; po CIRCUIT_OPEN_SECONDS se zkusí jeden pokus, při dalším selhání
+# se doba zdvojnásobí (nejvýše CIRCUIT_MAX_OPEN_SECONDS)
+CIRCUIT_FAILURE_THRESHOLD = 3
+CIRCUIT_OPEN_SECONDS = 30
+CIRCUIT_MAX_OPEN_SECONDS = 600
+
+# Stav kolektoru (kurzory dávek, ETagy, hashe) přežívající restart
+COLLECTOR_STATE_PATH = BASE_DIR / 'database' / 'collector_state.json'
+STATE_SAVE_INTERVAL = 10  # sekund mezi průběžnými zápisy stavu
 
 # Nastavení databáze
 DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
 POOL_SIZE = 20
 MAX_OVERFLOW = 40
+SQLITE_BUSY_TIMEOUT = 30  # sekund čekání na zámek při souběžném zápisu více vláken
+
+# Ukládání surových XML dat
+RAW_DATA_CODEC = os.getenv('RAW_DATA_CODEC', 'zlib')  # zlib nebo zstd (vyžaduje balíček zstandard)
+RAW_DATA_COMPRESSION_LEVEL = 6
+RAW_DATA_STORAGE = os.getenv('RAW_DATA_STORAGE', 'db')  # db (komprimovaně v SQLite), files (archiv na disku) nebo delta
+RAW_ARCHIVE_DIR = BASE_DIR / 'database' / 'raw'  # soubory pojmenované hashem obsahu
+RAW_DELTA_KEYFRAME_INTERVAL = 60  # max. počet rozdílů za sebou před dalším celým snímkem
+RAW_DELTA_CACHE_SIZE = 16  # počet sestavených verzí držených v paměti při čtení
+RAW_WRITE_BUFFER_ROWS = 256  # max. záznamů čekajících v kolektoru na společný zápis
+RAW_WRITE_BUFFER_BYTES = 64 * 1024 * 1024  # max. objem (po kompresi) čekajících záznamů
+
+# Metriky kolektoru ve formátu Prometheus (webová aplikace je má na /metrics)
+COLLECTOR_METRICS_PORT = int(os.getenv('COLLECTOR_METRICS_PORT', '9101'))  # 0 = bez HTTP endpointu
+COLLECTOR_METRICS_TEXTFILE = os.getenv('COLLECTOR_METRICS_TEXTFILE')  # soubor pro textfile collector
+METRICS_TEXTFILE_INTERVAL = 15  # sekund mezi zápisy souboru s metrikami
+
+# Záznamník průběhu cyklů kolektoru
+FLIGHT_RECORDER_CYCLES = 500  # počet posledních cyklů držených v paměti
+FLIGHT_RECORDER_MAX_SPANS = 2000  # max. úseků zaznamenaných v jednom cyklu
+SLOW_CYCLE_THRESHOLD = float(os.getenv('SLOW_CYCLE_THRESHOLD', '5'))  # sekund, delší cyklus se zapíše
+SLOW_CYCLE_LOG = LOG_DIR / 'slow_cycles.jsonl'  # záznamy pomalých cyklů
+FLIGHT_RECORDER_DUMP = LOG_DIR / 'flight_recorder.jsonl'  # výpis celé paměti (SIGUSR1, ukončení)
+
+# Přehrávání archivovaných surových dat (start_replay.py)
+REPLAY_READ_CHUNK = 200  # záznamů načtených ze zdrojové databáze najednou
+REPLAY_REPORT_INTERVAL = 10  # sekund mezi průběžnými výpisy
+REPLAY_DRAIN_TIMEOUT = 600  # max. sekund čekání na zpracování po posledním záznamu
 
 # Nastavení webové aplikace
 FLASK_HOST = '0.0.0.0'
@@ -53,6 +110,16 @@ SOCKETIO_CORS_ALLOWED_ORIGINS = "*"
 
 # Agregace dat
 AGGREGATION_INTERVAL = 60  # sekund - agregace po minutách
+PIPELINE_AGGREGATION_INTERVAL = 30  # sekund - nejkratší odstup dvou agregací
+AGGREGATION_CHUNK_MINUTES = 60  # minut agregovaných jedním příkazem (při dohánění delšího úseku)
+AGGREGATION_LATENESS_MINUTES = 5  # minut zpětně, které kontrolní agregace přepočítá (opožděná data)
+PIPELINE_QUEUE_SIZE = 4  # max. čekajících podnětů mezi stupni zpracování
+PARSE_WORKERS = int(os.getenv('PARSE_WORKERS', os.cpu_count() or 1))  # procesů pro parsování XML (1 = bez poolu)
+PROCESS_CHUNK_ROWS = 100  # surových záznamů zpracovaných v jedné transakci
+RAW_DATA_MAX_ATTEMPTS = 3  # pokusů o zpracování chybného záznamu, pak se vyřadí (označí jako zpracovaný)
+INSERT_CHUNK_ROWS = 5000  # řádků výsledků v jednom hromadném INSERT (executemany)
+PARSE_POOL_MIN_ROWS = 8  # menší počet záznamů se parsuje přímo, bez režie předávání mezi procesy
+XML_PARSE_MODE = os.getenv('XML_PARSE_MODE', 'tree')  # tree (celý strom), stream (iterparse po záznamech, stálá paměť) nebo columnar (obce do matic NumPy)
 AUTO_REFRESH_INTERVAL = 10  # sekund - automatická aktualizace frontendu
 
 # Logování
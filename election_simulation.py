@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""
+Simulace sčítání hlasů a generování XML souborů ve tvaru volby.cz
+
+Celostátní rozsah (14 866 okrsků, ~6 250 obcí, 77 okresů, úplné kandidátky),
+vše odvozené z jednoho seedu, takže stejný seed dává stejné soubory.
+"""
+
+import argparse
+import random
+import sys
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from lxml import etree
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from test_data_generator import (PARTY_DATA, KRAJ_DATA, FIRST_NAMES, LAST_NAMES, TITLES,
+                                 districts_step, base_turnout, variability_at)
+
+TOTAL_OKRSKY = 14866  # Reálný počet okrsků v ČR
+TOTAL_OBCE = 6250
+TOTAL_VOTERS = 8500000  # Přibližný počet voličů
+TOTAL_MANDATES = 200
+PARTY_COUNT = 26  # stran na hlasovacím lístku
+STATE_COUNT = 100  # států se zahraničními okrsky
+BATCH_SIZE = 150  # okrsků v jedné dávce při zápisu fixtur
+
+def build_party_list(party_count: int = PARTY_COUNT) -> List[Dict]:
+    """
+    Strany z PARTY_DATA doplněné malými stranami do počtu party_count
+    """
+    parties = [dict(party) for party in PARTY_DATA[:party_count]]
+    for number in range(len(parties) + 1, party_count + 1):
+        parties.append({
+            "code": f"STRANA{number}",
+            "name": f"Strana č. {number}",
+            "short_name": f"S{number}",
+            "number": number,
+            "expected_pct": 0.3,
+        })
+    return parties
+
+def _format_pct(value: float) -> str:
+    return f"{value:.2f}"
+
+def _to_xml(root: etree._Element) -> bytes:
+    return etree.tostring(root, encoding='UTF-8', xml_declaration=True)
+
+class ElectionSimulation:
+    """
+    Deterministická simulace sčítání podle seedu
+
+    Geografie (kraje, okresy, obce, okrsky) i pořadí sčítání okrsků jsou
+    dané seedem. Sečtený okrsek dostane hlasy podle očekávaných výsledků
+    stran s odchylkou, která s postupem sčítání klesá; výsledky obcí,
+    okresů, krajů a celé ČR jsou součty sečtených okrsků.
+    """
+
+    def __init__(self, seed: int = 2025, party_count: int = PARTY_COUNT):
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.random = random.Random(seed)
+
+        self.parties = build_party_list(party_count)
+        self.expected = np.array([p["expected_pct"] for p in self.parties], dtype=np.float64)
+
+        self._build_geography()
+        self._build_zahranici()
+        self._build_candidates()
+
+        self.counting_order = self.rng.permutation(TOTAL_OKRSKY)
+        self.counted_count = 0
+        self.okrsek_counted = np.zeros(TOTAL_OKRSKY, dtype=bool)
+        self.okrsek_votes = np.zeros((TOTAL_OKRSKY, len(self.parties)), dtype=np.int64)
+        self.okrsek_envelopes = np.zeros(TOTAL_OKRSKY, dtype=np.int64)
+
+    # Geografie
+
+    def _build_geography(self):
+        kraj_codes = [kraj["code"] for kraj in KRAJ_DATA]
+        self.kraje = KRAJ_DATA
+
+        # Jen okresy krajů z KRAJ_DATA (77 okresů)
+        self.okres_codes = [code for code in config.OKRES_CODES if code[:5] in kraj_codes]
+        self.okres_kraj = np.array([kraj_codes.index(code[:5]) for code in self.okres_codes])
+
+        # Každý okres i obec má alespoň jednu obec, resp. okrsek
+        okres_weights = self.rng.gamma(4.0, size=len(self.okres_codes))
+        obce_per_okres = 1 + self.rng.multinomial(TOTAL_OBCE - len(self.okres_codes),
+                                                  okres_weights / okres_weights.sum())
+        self.obec_okres = np.repeat(np.arange(len(self.okres_codes)), obce_per_okres)
+        self.obec_codes = [str(500000 + 11 * index) for index in range(TOTAL_OBCE)]
+
+        # Velikost obcí je hodně nerovnoměrná - pár měst má stovky okrsků
+        obec_weights = self.rng.pareto(1.2, size=TOTAL_OBCE) + 0.01
+        okrsky_per_obec = 1 + self.rng.multinomial(TOTAL_OKRSKY - TOTAL_OBCE,
+                                                   obec_weights / obec_weights.sum())
+        self.okrsek_obec = np.repeat(np.arange(TOTAL_OBCE), okrsky_per_obec)
+        self.okrsek_numbers = np.concatenate([np.arange(1, count + 1) for count in okrsky_per_obec])
+        self.okrsek_okres = self.obec_okres[self.okrsek_obec]
+        self.okrsek_kraj = self.okres_kraj[self.okrsek_okres]
+
+        voters = self.rng.integers(150, 1100, size=TOTAL_OKRSKY).astype(np.float64)
+        self.okrsek_voters = np.maximum(1, (voters * TOTAL_VOTERS / voters.sum()).astype(np.int64))
+
+        # Regionální odchylka podpory stran, stálá po celou dobu sčítání
+        self.kraj_bias = self.rng.normal(1.0, 0.15, size=(len(self.kraje), len(self.parties))).clip(0.5, 1.5)
+
+        kraj_voters = np.bincount(self.okrsek_kraj, weights=self.okrsek_voters, minlength=len(self.kraje))
+        self.kraj_mandates = np.round(TOTAL_MANDATES * kraj_voters / kraj_voters.sum()).astype(int)
+
+    def _build_zahranici(self):
+        self.state_codes = [str(100 + index) for index in range(STATE_COUNT)]
+        self.state_voters = self.rng.integers(50, 5000, size=STATE_COUNT)
+        # Zahraniční okrsky se sečtou, až sčítání přejde jejich práh
+        self.state_threshold = self.rng.uniform(0.05, 1.0, size=STATE_COUNT)
+        shares = self.expected * self.rng.normal(1.0, 0.3, size=(STATE_COUNT, len(self.parties))).clip(0.1)
+        shares /= shares.sum(axis=1, keepdims=True)
+        self.state_votes = self.rng.multinomial(self.state_voters, shares)
+
+    def _build_candidates(self):
+        self.candidates = []
+        for kraj_index, kraj in enumerate(self.kraje):
+            list_size = int(self.kraj_mandates[kraj_index] * 1.5) + 5
+            for party_index, party in enumerate(self.parties):
+                for position in range(1, list_size + 1):
+                    self.candidates.append({
+                        'kraj': kraj_index,
+                        'party': party_index,
+                        'position': position,
+                        'name': self.random.choice(FIRST_NAMES),
+                        'surname': self.random.choice(LAST_NAMES),
+                        'title_before': self.random.choice(TITLES),
+                        'title_after': "Ph.D." if self.random.random() > 0.7 else "",
+                        'pref_share': self.random.betavariate(1.0, 4.0 + position) * 0.5,
+                    })
+
+    # Sčítání
+
+    @property
+    def percentage_counted(self) -> float:
+        return 100.0 * self.counted_count / TOTAL_OKRSKY
+
+    def count_next(self, count: int) -> np.ndarray:
+        """
+        Sečtení dalších okrsků v pořadí sčítání, vrací jejich indexy
+        """
+        new = self.counting_order[self.counted_count:self.counted_count + count]
+        if len(new) == 0:
+            return new
+
+        # Na začátku více variability, postupně se stabilizuje
+        variability = variability_at(self.percentage_counted)
+        shares = self.expected * self.kraj_bias[self.okrsek_kraj[new]]
+        shares = shares + self.rng.uniform(-variability, variability, size=shares.shape) * (shares / 10)
+        shares = shares.clip(0.01)
+        shares /= shares.sum(axis=1, keepdims=True)
+
+        turnout = (base_turnout(self.percentage_counted) + self.rng.uniform(-2, 2, size=len(new))).clip(30, 75)
+        envelopes = (self.okrsek_voters[new] * turnout / 100).astype(np.int64)
+        valid = (envelopes * 0.98).astype(np.int64)
+
+        self.okrsek_votes[new] = self.rng.multinomial(valid, shares)
+        self.okrsek_envelopes[new] = envelopes
+        self.okrsek_counted[new] = True
+        self.counted_count += len(new)
+        return new
+
+    def step(self) -> np.ndarray:
+        """
+        Jedna aktualizace sčítání o velikosti podle modelu z test_data_generator
+        """
+        return self.count_next(districts_step(TOTAL_OKRSKY - self.counted_count, self.random))
+
+    @property
+    def finished(self) -> bool:
+        return self.counted_count >= TOTAL_OKRSKY
+
+    def count_until(self, fraction: float) -> np.ndarray:
+        """
+        Sečtení okrsků do daného podílu (0-1) po dávkách, vrací všechny nové indexy
+        """
+        target = int(round(TOTAL_OKRSKY * min(max(fraction, 0.0), 1.0)))
+        new = [self.count_next(min(BATCH_SIZE, target - self.counted_count))
+               for _ in range(0, max(0, target - self.counted_count), BATCH_SIZE)]
+        return np.concatenate(new) if new else np.array([], dtype=np.int64)
+
+    # Součty
+
+    def _sum_by(self, group: np.ndarray, size: int, mask: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """
+        Součet hlasů a průběhu sčítání sečtených okrsků po skupinách
+        """
+        counted = self.okrsek_counted if mask is None else self.okrsek_counted & mask
+        votes = np.zeros((size, len(self.parties)), dtype=np.int64)
+        np.add.at(votes, group[counted], self.okrsek_votes[counted])
+        return {
+            'votes': votes,
+            'okrsky_total': np.bincount(group, minlength=size),
+            'okrsky_counted': np.bincount(group[counted], minlength=size),
+            'voters': np.bincount(group, weights=self.okrsek_voters, minlength=size).astype(np.int64),
+            'voters_counted': np.bincount(group[counted], weights=self.okrsek_voters[counted],
+                                          minlength=size).astype(np.int64),
+            'envelopes': np.bincount(group[counted], weights=self.okrsek_envelopes[counted],
+                                     minlength=size).astype(np.int64),
+        }
+
+    @staticmethod
+    def _ucast_attrs(totals: Dict[str, np.ndarray], index: int) -> Dict[str, str]:
+        valid = int(totals['votes'][index].sum())
+        total = int(totals['okrsky_total'][index])
+        counted = int(totals['okrsky_counted'][index])
+        voters_counted = int(totals['voters_counted'][index])
+        envelopes = int(totals['envelopes'][index])
+        return {
+            'OKRSKY_CELKEM': str(total),
+            'OKRSKY_ZPRAC': str(counted),
+            'OKRSKY_ZPRAC_PROC': _format_pct(100.0 * counted / total if total else 0.0),
+            'ZAPSANI_VOLICI': str(int(totals['voters'][index])),
+            'VYDANE_OBALKY': str(envelopes),
+            'PLATNE_HLASY': str(valid),
+            'UCAST_PROC': _format_pct(100.0 * envelopes / voters_counted if voters_counted else 0.0),
+        }
+
+    def _add_parties(self, parent: etree._Element, votes: np.ndarray, with_percentage: bool = True,
+                     national: bool = False, mandates: Optional[np.ndarray] = None):
+        total = votes.sum()
+        for index, party in enumerate(self.parties):
+            attrs = {'KSTRANA': party['code'], 'HLASY': str(int(votes[index]))}
+            if national:
+                attrs['NAZ_STR'] = party['name']
+                attrs['POR_STR_HL'] = str(party['number'])
+            if with_percentage:
+                attrs['PROC_HLASU'] = _format_pct(100.0 * votes[index] / total if total else 0.0)
+            if mandates is not None:
+                attrs['MANDATY'] = str(int(mandates[index]))
+            etree.SubElement(parent, 'STRANA', attrs)
+
+    def _mandates(self, votes: np.ndarray) -> np.ndarray:
+        """Zjednodušený přepočet na mandáty (5% klauzule, poměrně)"""
+        total = votes.sum()
+        if not total:
+            return np.zeros(len(votes), dtype=int)
+        eligible = np.where(votes / total >= 0.05, votes, 0)
+        if not eligible.sum():
+            return np.zeros(len(votes), dtype=int)
+        return np.floor(TOTAL_MANDATES * eligible / eligible.sum()).astype(int)
+
+    # XML soubory
+
+    def main_xml(self) -> bytes:
+        """vysledky.xml - celá ČR a kraje"""
+        root = etree.Element('VYSLEDKY')
+        cr = self._sum_by(np.zeros(TOTAL_OKRSKY, dtype=np.int64), 1)
+        etree.SubElement(root, 'UCAST', self._ucast_attrs(cr, 0))
+        self._add_parties(root, cr['votes'][0], national=True, mandates=self._mandates(cr['votes'][0]))
+
+        kraje = self._sum_by(self.okrsek_kraj, len(self.kraje))
+        for index, kraj in enumerate(self.kraje):
+            elem = etree.SubElement(root, 'KRAJ', {'CIS_KRAJ': kraj['code'], 'NAZ_KRAJ': kraj['name']})
+            self._add_parties(elem, kraje['votes'][index])
+        return _to_xml(root)
+
+    def krajmesta_xml(self) -> bytes:
+        """vysledky_krajmesta.xml - krajská města (první obec každého kraje)"""
+        root = etree.Element('VYSLEDKY_KRAJMESTA')
+        obce = self._sum_by(self.okrsek_obec, TOTAL_OBCE)
+        for kraj_index, kraj in enumerate(self.kraje):
+            okresy = np.flatnonzero(self.okres_kraj == kraj_index)
+            obec = int(np.flatnonzero(self.obec_okres == okresy[0])[0])
+            elem = etree.SubElement(root, 'KRAJ', {'CIS_KRAJ': kraj['code'], 'NAZ_KRAJ': kraj['name']})
+            mesto = etree.SubElement(elem, 'OBEC', {'CIS_OBEC': self.obec_codes[obec],
+                                                    'NAZ_OBEC': f"Obec {self.obec_codes[obec]}"})
+            etree.SubElement(mesto, 'UCAST', self._ucast_attrs(obce, obec))
+            self._add_parties(mesto, obce['votes'][obec])
+        return _to_xml(root)
+
+    def zahranici_xml(self) -> bytes:
+        """vysledky_zahranici.xml - zahraničí celkem a po státech"""
+        counted = self.state_threshold <= self.percentage_counted / 100
+        votes = np.where(counted[:, None], self.state_votes, 0)
+
+        root = etree.Element('VYSLEDKY_ZAHRANICI')
+        zahranici = etree.SubElement(root, 'ZAHRANICI', {'PLATNE_HLASY': str(int(votes.sum()))})
+        self._add_parties(zahranici, votes.sum(axis=0))
+        for index, code in enumerate(self.state_codes):
+            stat = etree.SubElement(root, 'STAT', {'CIS_STAT': code, 'NAZ_STAT': f"Stát {code}",
+                                                   'PLATNE_HLASY': str(int(votes[index].sum()))})
+            self._add_parties(stat, votes[index], with_percentage=False)
+        return _to_xml(root)
+
+    def candidates_xml(self) -> bytes:
+        """vysledky_kandid.xml - přednostní hlasy všech kandidátů"""
+        kraje = self._sum_by(self.okrsek_kraj, len(self.kraje))
+        national = self._mandates(kraje['votes'].sum(axis=0))
+
+        root = etree.Element('VYSLEDKY_KANDID')
+        for candidate in self.candidates:
+            party_votes = int(kraje['votes'][candidate['kraj'], candidate['party']])
+            pref_votes = int(party_votes * candidate['pref_share'])
+            kraj_share = self.kraj_mandates[candidate['kraj']] / TOTAL_MANDATES
+            elected = candidate['position'] <= round(national[candidate['party']] * kraj_share)
+            etree.SubElement(root, 'KANDIDAT', {
+                'KSTRANA': self.parties[candidate['party']]['code'],
+                'CKRAJ': self.kraje[candidate['kraj']]['code'],
+                'PORCISLO': str(candidate['position']),
+                'JMENO': candidate['name'],
+                'PRIJMENI': candidate['surname'],
+                'TITULPRED': candidate['title_before'],
+                'TITULZA': candidate['title_after'],
+                'PREF_HLASY': str(pref_votes),
+                'PROC_PREF_HLASU': _format_pct(100.0 * pref_votes / party_votes if party_votes else 0.0),
+                'ZVOLEN': '1' if elected and self.counted_count == TOTAL_OKRSKY else '0',
+            })
+        return _to_xml(root)
+
+    def okres_xml(self, okres_code: str) -> bytes:
+        """vysledky_okres_{kód}.xml - okres a všechny jeho obce"""
+        okres_index = self.okres_codes.index(okres_code)
+        in_okres = self.okrsek_okres == okres_index
+        okres = self._sum_by(np.zeros(TOTAL_OKRSKY, dtype=np.int64), 1, in_okres)
+        okres['okrsky_total'] = np.array([in_okres.sum()])
+        okres['voters'] = np.array([self.okrsek_voters[in_okres].sum()])
+        obce = self._sum_by(self.okrsek_obec, TOTAL_OBCE)
+
+        root = etree.Element('VYSLEDKY_OKRES')
+        elem = etree.SubElement(root, 'OKRES', {'CIS_OKRES': okres_code, 'NAZ_OKRES': f"Okres {okres_code}"})
+        etree.SubElement(elem, 'UCAST', self._ucast_attrs(okres, 0))
+        self._add_parties(elem, okres['votes'][0])
+
+        for obec in np.flatnonzero(self.obec_okres == okres_index):
+            complete = obce['okrsky_counted'][obec] == obce['okrsky_total'][obec]
+            obec_elem = etree.SubElement(root, 'OBEC', {
+                'CIS_OBEC': self.obec_codes[obec],
+                'NAZ_OBEC': f"Obec {self.obec_codes[obec]}",
+                'ZPRACOVANO': '1' if complete else '0',
+            })
+            self._add_parties(obec_elem, obce['votes'][obec], with_percentage=False)
+        return _to_xml(root)
+
+    def okrsky_batch_xml(self, okrsky: Sequence[int]) -> bytes:
+        """Dávka okrsků - výsledky nově sečtených okrsků"""
+        root = etree.Element('VYSLEDKY_OKRSKY')
+        for okrsek in okrsky:
+            obec = self.okrsek_obec[okrsek]
+            elem = etree.SubElement(root, 'OKRSEK', {
+                'CIS_OKRSEK': str(self.okrsek_numbers[okrsek]),
+                'CIS_OBEC': self.obec_codes[obec],
+                'ZPRACOVANO': '1' if self.okrsek_counted[okrsek] else '0',
+            })
+            self._add_parties(elem, self.okrsek_votes[okrsek], with_percentage=False)
+        return _to_xml(root)
+
+    def obce_batch_xml(self, okrsky: Sequence[int]) -> bytes:
+        """Dávka obcí - aktuální výsledky obcí, kterých se dávka okrsků týká"""
+        obce = self._sum_by(self.okrsek_obec, TOTAL_OBCE)
+        root = etree.Element('VYSLEDKY_OBCE')
+        for obec in np.unique(self.okrsek_obec[np.asarray(okrsky, dtype=np.int64)]):
+            attrs = self._ucast_attrs(obce, obec)
+            elem = etree.SubElement(root, 'OBEC', {
+                'CIS_OBEC': self.obec_codes[obec],
+                'NAZ_OBEC': f"Obec {self.obec_codes[obec]}",
+                'CIS_OKRES': self.okres_codes[self.obec_okres[obec]],
+                'ZPRACOVANO': '1' if attrs['OKRSKY_ZPRAC'] == attrs['OKRSKY_CELKEM'] else '0',
+                'UCAST_PROC': attrs['UCAST_PROC'],
+            })
+            self._add_parties(elem, obce['votes'][obec])
+        return _to_xml(root)
+
+    def okresy_batch_xml(self, okrsky: Sequence[int]) -> bytes:
+        """Dávka okresů - aktuální výsledky okresů, kterých se dávka okrsků týká"""
+        okresy = self._sum_by(self.okrsek_okres, len(self.okres_codes))
+        root = etree.Element('VYSLEDKY_OKRESY')
+        for okres in np.unique(self.okrsek_okres[np.asarray(okrsky, dtype=np.int64)]):
+            attrs = self._ucast_attrs(okresy, okres)
+            elem = etree.SubElement(root, 'OKRES', {
+                'CIS_OKRES': self.okres_codes[okres],
+                'NAZ_OKRES': f"Okres {self.okres_codes[okres]}",
+                'CIS_KRAJ': self.kraje[self.okres_kraj[okres]]['code'],
+                'OKRSKY_ZPRAC': attrs['OKRSKY_ZPRAC'],
+                'OKRSKY_CELKEM': attrs['OKRSKY_CELKEM'],
+                'UCAST_PROC': attrs['UCAST_PROC'],
+            })
+            self._add_parties(elem, okresy['votes'][okres])
+        return _to_xml(root)
+
+    def batch_xml(self, batch_type: str, okrsky: Sequence[int]) -> bytes:
+        """Dávka daného typu (okrsky, obce, okresy) pro skupinu okrsků"""
+        if batch_type == 'okrsky':
+            return self.okrsky_batch_xml(okrsky)
+        if batch_type == 'obce':
+            return self.obce_batch_xml(okrsky)
+        return self.okresy_batch_xml(okrsky)
+
+def write_fixtures(output_dir: Path, seed: int = 2025, counted: float = 1.0) -> int:
+    """
+    Zápis kompletní sady souborů do adresáře se strukturou jako na volby.cz
+
+    Dávky odpovídají krokům sčítání po BATCH_SIZE okrscích a každá obsahuje
+    stav platný v okamžiku svého vzniku. Vrací počet zapsaných souborů.
+    """
+    simulation = ElectionSimulation(seed)
+    output_dir = Path(output_dir)
+    for directory in ('okresy', 'okrsky', 'obce_d', 'okresy_d'):
+        (output_dir / directory).mkdir(parents=True, exist_ok=True)
+
+    written = 0
+    batch_num = 0
+    target = int(round(TOTAL_OKRSKY * counted))
+    while simulation.counted_count < target:
+        new = simulation.count_next(min(BATCH_SIZE, target - simulation.counted_count))
+        batch_num += 1
+        for batch_type, pattern in (('okrsky', 'okrsky/vysledky_okrsky_'),
+                                    ('obce', 'obce_d/vysledky_obce_'),
+                                    ('okresy', 'okresy_d/vysledky_okresy_')):
+            path = output_dir / f"{pattern}{str(batch_num).zfill(5)}.xml"
+            path.write_bytes(simulation.batch_xml(batch_type, new))
+            written += 1
+
+    files = {
+        'vysledky.xml': simulation.main_xml(),
+        'vysledky_krajmesta.xml': simulation.krajmesta_xml(),
+        'vysledky_zahranici.xml': simulation.zahranici_xml(),
+        'vysledky_kandid.xml': simulation.candidates_xml(),
+    }
+    for okres_code in simulation.okres_codes:
+        files[f"okresy/vysledky_okres_{okres_code}.xml"] = simulation.okres_xml(okres_code)
+
+    for name, content in files.items():
+        (output_dir / name).write_bytes(content)
+        written += 1
+
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="Generování XML fixtur ve tvaru volby.cz")
+    parser.add_argument('--output', type=Path, default=Path('fixtures'), help="cílový adresář")
+    parser.add_argument('--seed', type=int, default=2025)
+    parser.add_argument('--counted', type=float, default=1.0, help="podíl sečtených okrsků (0-1)")
+    args = parser.parse_args()
+
+    written = write_fixtures(args.output, args.seed, args.counted)
+    print(f"Zapsáno {written} souborů do {args.output} (seed {args.seed}, sečteno {args.counted:.0%})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Lokální náhrada volby.cz pro zátěžové testy celé aplikace
+
+Servíruje vysledky.xml, krajmesta, zahraničí, kandidáty, soubory okresů
+a přibývající dávky podle simulovaného sčítání (election_simulation).
+Sčítání postupuje podle modelu z test_data_generator, čas lze zrychlit
+a do odpovědí přidat zpoždění a chyby.
+
+Použití:
+    python mock_volby_server.py --acceleration 20
+    VOLBY_BASE_URL=http://localhost:8000 python start_collector.py
+"""
+
+import argparse
+import logging
+import random
+import re
+import threading
+import time
+import sys
+import os
+from typing import Dict, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask, Response, jsonify, request
+
+from election_simulation import ElectionSimulation, TOTAL_OKRSKY
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Stejné cesty jako BATCH_URL_PATTERNS v backend/data_collector.py
+BATCH_PATH = re.compile(r'^(?:(okrsky)/vysledky_okrsky_|(obce)_d/vysledky_obce_|(okresy)_d/vysledky_okresy_)(\d{5})\.xml$')
+OKRES_PATH = re.compile(r'^okresy/vysledky_okres_(CZ\w+)\.xml$')
+BATCH_TYPES = ('okrsky', 'obce', 'okresy')
+
+class MockVolbyFeed:
+    """
+    Stav simulovaného sčítání a obsah souborů v daném okamžiku
+
+    Každých update_interval simulovaných sekund se sečte další skupina
+    okrsků a vznikne nová dávka každého typu. Dávky se vyrenderují při
+    vzniku a dál se nemění, ostatní soubory se renderují na vyžádání
+    a drží se v cache do další aktualizace (ETag = číslo aktualizace).
+    """
+
+    def __init__(self, seed: int = 2025, acceleration: float = 1.0,
+                 update_interval: float = 30.0, start_counted: float = 0.0):
+        self.seed = seed
+        self.acceleration = acceleration
+        self.update_interval = update_interval
+        self.simulation = ElectionSimulation(seed)
+        self.lock = threading.Lock()
+
+        self.batches: List[Dict[str, bytes]] = []
+        self._cache: Dict[str, Tuple[int, bytes]] = {}
+
+        # Počáteční stav - sčítání už běží
+        while self.simulation.counted_count < TOTAL_OKRSKY * start_counted:
+            self._add_update()
+        self.initial_updates = len(self.batches)
+        self.started = time.monotonic()
+
+    @property
+    def updates(self) -> int:
+        return len(self.batches)
+
+    def simulated_seconds(self) -> float:
+        return (time.monotonic() - self.started) * self.acceleration
+
+    def _add_update(self):
+        new = self.simulation.step()
+        self.batches.append({batch_type: self.simulation.batch_xml(batch_type, new)
+                             for batch_type in BATCH_TYPES})
+
+    def advance(self):
+        """Dopočítání aktualizací, které mezitím podle simulovaného času proběhly"""
+        target = self.initial_updates + int(self.simulated_seconds() // self.update_interval)
+        while self.updates < target and not self.simulation.finished:
+            self._add_update()
+            logger.info(f"Aktualizace {self.updates}: sečteno {self.simulation.counted_count}/{TOTAL_OKRSKY} "
+                        f"okrsků ({self.simulation.percentage_counted:.1f} %)")
+
+    def _render(self, path: str) -> Optional[bytes]:
+        simulation = self.simulation
+        if path == 'vysledky.xml':
+            return simulation.main_xml()
+        if path == 'vysledky_krajmesta.xml':
+            return simulation.krajmesta_xml()
+        if path == 'vysledky_zahranici.xml':
+            return simulation.zahranici_xml()
+        if path == 'vysledky_kandid.xml':
+            return simulation.candidates_xml()
+
+        match = OKRES_PATH.match(path)
+        if match and match.group(1) in simulation.okres_codes:
+            return simulation.okres_xml(match.group(1))
+        return None
+
+    def document(self, path: str) -> Optional[Tuple[bytes, str]]:
+        """
+        Obsah souboru a jeho ETag, None pokud soubor (zatím) neexistuje
+        """
+        with self.lock:
+            self.advance()
+
+            match = BATCH_PATH.match(path)
+            if match:
+                batch_type = next(group for group in match.groups()[:3] if group)
+                batch_num = int(match.group(4))
+                if not 1 <= batch_num <= self.updates:
+                    return None
+                return self.batches[batch_num - 1][batch_type], f'"{self.seed}-d{batch_num}"'
+
+            cached = self._cache.get(path)
+            if cached is None or cached[0] != self.updates:
+                content = self._render(path)
+                if content is None:
+                    return None
+                cached = self._cache[path] = (self.updates, content)
+            return cached[1], f'"{self.seed}-{cached[0]}"'
+
+    def status(self) -> Dict:
+        with self.lock:
+            self.advance()
+            return {
+                'seed': self.seed,
+                'acceleration': self.acceleration,
+                'simulated_seconds': round(self.simulated_seconds(), 1),
+                'updates': self.updates,
+                'counted_districts': self.simulation.counted_count,
+                'total_districts': TOTAL_OKRSKY,
+                'percentage_counted': round(self.simulation.percentage_counted, 2),
+            }
+
+def create_app(feed: MockVolbyFeed, latency: float = 0.0, jitter: float = 0.0,
+               error_rate: float = 0.0, truncate_rate: float = 0.0) -> Flask:
+    """
+    Flask aplikace servírující soubory z MockVolbyFeed
+
+    latency/jitter - zpoždění každé odpovědi v sekundách (jitter náhodně navíc)
+    error_rate - podíl odpovědí 503
+    truncate_rate - podíl odpovědí s useknutým XML
+    """
+    app = Flask(__name__)
+    rng = random.Random(feed.seed + 1)
+    counters = {'requests': 0, 'not_modified': 0, 'errors': 0, 'truncated': 0}
+    counters_lock = threading.Lock()
+
+    def count(key: str):
+        with counters_lock:
+            counters[key] += 1
+
+    @app.route('/_stav')
+    def status():
+        with counters_lock:
+            return jsonify({**feed.status(), **counters})
+
+    @app.route('/<path:path>')
+    def serve(path: str):
+        count('requests')
+        if latency or jitter:
+            time.sleep(latency + rng.uniform(0, jitter))
+        if error_rate and rng.random() < error_rate:
+            count('errors')
+            return Response('Service Unavailable', status=503)
+
+        document = feed.document(path)
+        if document is None:
+            return Response('Not Found', status=404)
+        content, etag = document
+
+        if request.headers.get('If-None-Match') == etag:
+            count('not_modified')
+            return Response(status=304, headers={'ETag': etag})
+
+        if truncate_rate and request.method == 'GET' and rng.random() < truncate_rate:
+            count('truncated')
+            content = content[:len(content) // 2]
+
+        return Response(content, mimetype='application/xml', headers={'ETag': etag})
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Lokální mock serveru volby.cz se simulovaným sčítáním")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--seed', type=int, default=2025)
+    parser.add_argument('--acceleration', type=float, default=1.0, help="zrychlení simulovaného času")
+    parser.add_argument('--interval', type=float, default=30.0,
+                        help="simulovaných sekund mezi aktualizacemi sčítání")
+    parser.add_argument('--start-counted', type=float, default=0.0,
+                        help="podíl okrsků sečtených při startu (0-1)")
+    parser.add_argument('--latency', type=float, default=0.0, help="zpoždění odpovědí v sekundách")
+    parser.add_argument('--jitter', type=float, default=0.0, help="náhodné zpoždění navíc v sekundách")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="podíl odpovědí 503 (0-1)")
+    parser.add_argument('--truncate-rate', type=float, default=0.0, help="podíl useknutých odpovědí (0-1)")
+    args = parser.parse_args()
+
+    feed = MockVolbyFeed(args.seed, args.acceleration, args.interval, args.start_counted)
+    app = create_app(feed, args.latency, args.jitter, args.error_rate, args.truncate_rate)
+
+    # Log každého požadavku by při desítkách souborů za sekundu zahltil výstup
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    print("=" * 60)
+    print("Volby PS ČR 2025 - Mock volby.cz")
+    print("=" * 60)
+    print(f"\nSimulace: seed {args.seed}, zrychlení {args.acceleration}x, "
+          f"aktualizace každých {args.interval:.0f} simulovaných sekund")
+    print(f"Kolektor spusťte s VOLBY_BASE_URL=http://{args.host}:{args.port}")
+    print(f"Stav simulace: http://{args.host}:{args.port}/_stav")
+    print("Pro ukončení stiskněte Ctrl+C\n")
+
+    app.run(host=args.host, port=args.port, threaded=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Skript pro přehrání archivovaných surových dat do čerstvé databáze
+
+Použití:
+    python start_replay.py archiv/volby.db --target database/replay.db --speed 10
+    python start_replay.py archiv/volby.db --target database/replay.db --speed max
+    python start_replay.py archiv/volby.db --target database/replay.db --speed 1 --shift-to-now
+    python start_replay.py archiv/volby.db --target database/replay.db --speed max --verify
+"""
+
+import argparse
+import os
+import sys
+import logging
+from pathlib import Path
+
+# Přidání cesty k modulu
+sys.path.append(str(Path(__file__).parent))
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+def parse_speed(value: str):
+    """Rychlost přehrávání - násobek reálného času nebo 'max'"""
+    if value == 'max':
+        return None
+    speed = float(value)
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("rychlost musí být kladná nebo 'max'")
+    return speed
+
+def main():
+    """Hlavní funkce pro spuštění přehrávání"""
+    parser = argparse.ArgumentParser(description="Přehrání archivovaných surových dat do čerstvé databáze")
+    parser.add_argument('source', type=Path, help="archivní databáze se surovými daty")
+    parser.add_argument('--target', type=Path, default=Path('database') / 'replay.db',
+                        help="cílová databáze (nesmí existovat, pokud není --overwrite)")
+    parser.add_argument('--speed', type=parse_speed, default=1.0,
+                        help="násobek reálné rychlosti (1 = jako ve volební noci) nebo 'max'")
+    parser.add_argument('--limit', type=int, help="přehrát jen prvních N záznamů")
+    parser.add_argument('--shift-to-now', action='store_true',
+                        help="posunout původní časové značky tak, aby přehrávání začínalo teď")
+    parser.add_argument('--verify', action='store_true',
+                        help="na konci porovnat minutovou agregaci s přímou agregací výsledků")
+    parser.add_argument('--overwrite', action='store_true', help="smazat existující cílovou databázi")
+    args = parser.parse_args()
+
+    if not args.source.exists():
+        print(f"Zdrojová databáze {args.source} neexistuje")
+        sys.exit(1)
+    if args.target.resolve() == args.source.resolve():
+        print("Cílová databáze musí být jiná než zdrojová")
+        sys.exit(1)
+    if args.target.exists():
+        if not args.overwrite:
+            print(f"Cílová databáze {args.target} už existuje (použijte --overwrite)")
+            sys.exit(1)
+        for suffix in ('', '-wal', '-shm'):
+            Path(f"{args.target}{suffix}").unlink(missing_ok=True)
+    args.target.parent.mkdir(parents=True, exist_ok=True)
+
+    # Databáze se vybírá při importu konfigurace, proto až teď
+    os.environ['VOLBY_DATABASE_PATH'] = str(args.target.resolve())
+    from backend.replay import RawDataSource, Replayer
+
+    print("=" * 60)
+    print("Volby PS ČR 2025 - Replay")
+    print("=" * 60)
+    print(f"\nZdroj: {args.source}, cíl: {args.target}")
+    print("Pro ukončení stiskněte Ctrl+C\n")
+
+    try:
+        summary = Replayer(RawDataSource(args.source), args.speed, args.limit, args.shift_to_now,
+                           args.verify).run()
+        print("\n" + Replayer.format_summary(summary))
+        if summary['aggregation_mismatches']:
+            sys.exit(1)
+    except KeyboardInterrupt:
+        print("\n\nPřehrávání bylo ukončeno uživatelem.")
+    except Exception as e:
+        print(f"\nChyba: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
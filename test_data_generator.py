@@ -13,12 +13,68 @@ from typing import Dict, List
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from backend.db_models import SessionLocal, init_db, Party, Region, Result, VoteProgress, AggregatedResult, Candidate
+from backend.dimensions import invalidate_dimensions
 from sqlalchemy import func
 import logging
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Reálné strany s očekávanými výsledky
+PARTY_DATA = [
+    {"code": "ANO", "name": "ANO 2011", "short_name": "ANO", "number": 1, "expected_pct": 28.5},
+    {"code": "ODS", "name": "Občanská demokratická strana", "short_name": "ODS", "number": 2, "expected_pct": 15.2},
+    {"code": "STAN", "name": "Starostové a nezávislí", "short_name": "STAN", "number": 3, "expected_pct": 13.8},
+    {"code": "SPD", "name": "Svoboda a přímá demokracie", "short_name": "SPD", "number": 4, "expected_pct": 11.5},
+    {"code": "PIRATI", "name": "Česká pirátská strana", "short_name": "Piráti", "number": 5, "expected_pct": 9.3},
+    {"code": "CSSD", "name": "Česká strana sociálně demokratická", "short_name": "ČSSD", "number": 6, "expected_pct": 4.2},
+    {"code": "KDU", "name": "KDU-ČSL", "short_name": "KDU-ČSL", "number": 7, "expected_pct": 5.8},
+    {"code": "TOP09", "name": "TOP 09", "short_name": "TOP 09", "number": 8, "expected_pct": 5.1},
+    {"code": "KSCM", "name": "Komunistická strana Čech a Moravy", "short_name": "KSČM", "number": 9, "expected_pct": 3.8},
+    {"code": "PRISERAHA", "name": "Přísaha", "short_name": "Přísaha", "number": 10, "expected_pct": 2.8}
+]
+
+# České kraje
+KRAJ_DATA = [
+    {"code": "CZ010", "name": "Hlavní město Praha"},
+    {"code": "CZ020", "name": "Středočeský kraj"},
+    {"code": "CZ031", "name": "Jihočeský kraj"},
+    {"code": "CZ032", "name": "Plzeňský kraj"},
+    {"code": "CZ041", "name": "Karlovarský kraj"},
+    {"code": "CZ042", "name": "Ústecký kraj"},
+    {"code": "CZ051", "name": "Liberecký kraj"},
+    {"code": "CZ052", "name": "Královéhradecký kraj"},
+    {"code": "CZ053", "name": "Pardubický kraj"},
+    {"code": "CZ063", "name": "Kraj Vysočina"},
+    {"code": "CZ064", "name": "Jihomoravský kraj"},
+    {"code": "CZ071", "name": "Olomoucký kraj"},
+    {"code": "CZ072", "name": "Zlínský kraj"},
+    {"code": "CZ080", "name": "Moravskoslezský kraj"}
+]
+
+# Jména a tituly kandidátů
+FIRST_NAMES = ["Jan", "Petr", "Pavel", "Tomáš", "Martin", "Jana", "Eva", "Hana", "Marie", "Lenka"]
+LAST_NAMES = ["Novák", "Svoboda", "Novotný", "Dvořák", "Černý", "Procházka", "Krejčí", "Horák", "Němec", "Pospíšil"]
+TITLES = ["Ing.", "Mgr.", "JUDr.", "MUDr.", "PhDr.", "doc.", "prof.", "", "", ""]
+
+# Model postupu sčítání - sdílí ho generátor dat a simulace pro mock server
+
+def districts_step(remaining: int, rng=random) -> int:
+    """Počet okrsků sečtených v jedné aktualizaci"""
+    return min(rng.randint(50, 200), remaining)
+
+def base_turnout(percentage_counted: float) -> float:
+    """Očekávaná účast podle postupu sčítání (postupně roste 45-65 %)"""
+    return 45 + (percentage_counted * 0.2)
+
+def turnout_at(percentage_counted: float, rng=random) -> float:
+    """Účast v jedné aktualizaci včetně náhodné odchylky"""
+    return min(base_turnout(percentage_counted) + rng.uniform(-2, 2), 75)
+
+def variability_at(percentage_counted: float) -> float:
+    """Rozptyl výsledků stran - na začátku větší, postupně se stabilizuje"""
+    return 5.0 * (1 - percentage_counted / 100)
+
 class TestDataGenerator:
     """Generátor realistických testovacích dat"""
     
@@ -31,37 +87,9 @@ class TestDataGenerator:
         self.total_voters = 8500000  # Přibližný počet voličů
         self.start_time = datetime.now() - timedelta(hours=2)  # Simulace začátku před 2 hodinami
         
-        # Reálné strany s očekávanými výsledky
-        self.party_data = [
-            {"code": "ANO", "name": "ANO 2011", "short_name": "ANO", "number": 1, "expected_pct": 28.5},
-            {"code": "ODS", "name": "Občanská demokratická strana", "short_name": "ODS", "number": 2, "expected_pct": 15.2},
-            {"code": "STAN", "name": "Starostové a nezávislí", "short_name": "STAN", "number": 3, "expected_pct": 13.8},
-            {"code": "SPD", "name": "Svoboda a přímá demokracie", "short_name": "SPD", "number": 4, "expected_pct": 11.5},
-            {"code": "PIRATI", "name": "Česká pirátská strana", "short_name": "Piráti", "number": 5, "expected_pct": 9.3},
-            {"code": "CSSD", "name": "Česká strana sociálně demokratická", "short_name": "ČSSD", "number": 6, "expected_pct": 4.2},
-            {"code": "KDU", "name": "KDU-ČSL", "short_name": "KDU-ČSL", "number": 7, "expected_pct": 5.8},
-            {"code": "TOP09", "name": "TOP 09", "short_name": "TOP 09", "number": 8, "expected_pct": 5.1},
-            {"code": "KSCM", "name": "Komunistická strana Čech a Moravy", "short_name": "KSČM", "number": 9, "expected_pct": 3.8},
-            {"code": "PRISERAHA", "name": "Přísaha", "short_name": "Přísaha", "number": 10, "expected_pct": 2.8}
-        ]
-        
-        # České kraje
-        self.kraj_data = [
-            {"code": "CZ010", "name": "Hlavní město Praha"},
-            {"code": "CZ020", "name": "Středočeský kraj"},
-            {"code": "CZ031", "name": "Jihočeský kraj"},
-            {"code": "CZ032", "name": "Plzeňský kraj"},
-            {"code": "CZ041", "name": "Karlovarský kraj"},
-            {"code": "CZ042", "name": "Ústecký kraj"},
-            {"code": "CZ051", "name": "Liberecký kraj"},
-            {"code": "CZ052", "name": "Královéhradecký kraj"},
-            {"code": "CZ053", "name": "Pardubický kraj"},
-            {"code": "CZ063", "name": "Kraj Vysočina"},
-            {"code": "CZ064", "name": "Jihomoravský kraj"},
-            {"code": "CZ071", "name": "Olomoucký kraj"},
-            {"code": "CZ072", "name": "Zlínský kraj"},
-            {"code": "CZ080", "name": "Moravskoslezský kraj"}
-        ]
+        # Reálné strany s očekávanými výsledky a české kraje
+        self.party_data = PARTY_DATA
+        self.kraj_data = KRAJ_DATA
     
     def clear_database(self):
         """Vyčištění databáze od starých dat"""
@@ -72,6 +100,7 @@ class TestDataGenerator:
         self.db.query(Candidate).delete()
         self.db.query(Party).delete()
         self.db.query(Region).delete()
+        invalidate_dimensions()
         self.db.commit()
         logger.info("Database cleared")
     
@@ -129,19 +158,15 @@ class TestDataGenerator:
         """Vytvoření kandidátů s přednostními hlasy"""
         logger.info("Creating candidates...")
         
-        first_names = ["Jan", "Petr", "Pavel", "Tomáš", "Martin", "Jana", "Eva", "Hana", "Marie", "Lenka"]
-        last_names = ["Novák", "Svoboda", "Novotný", "Dvořák", "Černý", "Procházka", "Krejčí", "Horák", "Němec", "Pospíšil"]
-        titles = ["Ing.", "Mgr.", "JUDr.", "MUDr.", "PhDr.", "doc.", "prof.", "", "", ""]
-        
         for party in self.parties[:5]:  # Top 5 stran
             for region in self.regions[1:6]:  # Několik krajů
                 for position in range(1, 11):  # Top 10 kandidátů
                     candidate = Candidate(
                         party_id=party.id,
                         region_id=region.id,
-                        name=random.choice(first_names),
-                        surname=random.choice(last_names),
-                        title_before=random.choice(titles),
+                        name=random.choice(FIRST_NAMES),
+                        surname=random.choice(LAST_NAMES),
+                        title_before=random.choice(TITLES),
                         title_after="Ph.D." if random.random() > 0.7 else "",
                         position=position,
                         preferential_votes=random.randint(100, 10000),
@@ -157,13 +182,12 @@ class TestDataGenerator:
         """Generování jedné aktualizace dat"""
         
         # Zvýšit počet sečtených okrsků
-        new_districts = min(random.randint(50, 200), self.total_districts - self.counted_districts)
+        new_districts = districts_step(self.total_districts - self.counted_districts)
         self.counted_districts += new_districts
         percentage_counted = (self.counted_districts / self.total_districts) * 100
         
         # Výpočet účasti (postupně roste)
-        base_turnout = 45 + (percentage_counted * 0.2)  # 45-65%
-        turnout = min(base_turnout + random.uniform(-2, 2), 75)
+        turnout = turnout_at(percentage_counted)
         
         total_votes = int(self.total_voters * (turnout / 100) * (percentage_counted / 100))
         valid_votes = int(total_votes * 0.98)  # 98% platných hlasů
@@ -197,7 +221,7 @@ class TestDataGenerator:
                 expected = party_info["expected_pct"]
                 
                 # Na začátku více variability, postupně se stabilizuje
-                variability = 5.0 * (1 - percentage_counted / 100)
+                variability = variability_at(percentage_counted)
                 current_pct = expected + random.uniform(-variability, variability)
                 current_pct = max(0.1, min(current_pct, remaining_pct))
                 
@@ -1,5 +1,6 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, g, jsonify, request
 from datetime import datetime, timedelta
+import time
 from sqlalchemy import func, desc
 import sys
 import os
@@ -7,9 +8,23 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from backend.db_models import SessionLocal, Party, Region, Result, VoteProgress, AggregatedResult, Candidate
 from backend.aggregator import DataAggregator
+from backend.metrics import API_REQUEST_SECONDS
 
 api_bp = Blueprint('api', __name__)
 
+@api_bp.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@api_bp.after_request
+def record_request_latency(response):
+    """Doba obsluhy požadavku do metrik podle routy a stavového kódu"""
+    start = g.pop('request_start', None)
+    if start is not None:
+        API_REQUEST_SECONDS.labels(request.endpoint or 'unknown', response.status_code).observe(
+            time.perf_counter() - start)
+    return response
+
 def get_db_session():
     """Získání databázové session"""
     return SessionLocal()
@@ -1,4 +1,4 @@
-from flask import Flask, render_template, jsonify
+from flask import Flask, Response, render_template, jsonify
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit
 import sys
@@ -9,6 +9,8 @@ import config
 from webapp.api_routes import api_bp
 from webapp.websocket import setup_websocket_handlers
 from backend.db_models import init_db
+from backend.migrations import upgrade_aggregated_results
+from backend.metrics import REGISTRY, CONTENT_TYPE
 
 # Inicializace Flask aplikace
 app = Flask(__name__, 
@@ -39,6 +41,11 @@ def health():
     """Health check endpoint"""
     return jsonify({'status': 'ok', 'message': 'Application is running'})
 
+@app.route('/metrics')
+def metrics():
+    """Metriky ve formátu Prometheus"""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
 @app.errorhandler(404)
 def not_found(error):
     """Handler pro 404 chyby"""
@@ -53,8 +60,9 @@ def run_app():
     """Spuštění aplikace"""
     import socket
     
-    # Inicializace databáze
+    # Inicializace databáze (a nový sloupec agregace, pokud ji ještě nedoplnil kolektor)
     init_db()
+    upgrade_aggregated_results()
     
     # Najít volný port, pokud je výchozí obsazený
     port = config.FLASK_PORT
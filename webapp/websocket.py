@@ -1,5 +1,6 @@
 from flask_socketio import emit, join_room, leave_room
 from datetime import datetime
+import json
 import threading
 import time
 import logging
@@ -9,6 +10,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import config
 from backend.db_models import SessionLocal, Result, VoteProgress, Region, Party
+from backend.metrics import WEBSOCKET_EMITS, WEBSOCKET_PAYLOAD_BYTES
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -112,6 +114,8 @@ class RealtimeUpdater:
                 
                 # Poslat aktualizaci
                 self.socketio.emit('update', update_data, room=room)
+                WEBSOCKET_EMITS.labels('update').inc()
+                WEBSOCKET_PAYLOAD_BYTES.labels('update').observe(len(json.dumps(update_data)))
                 
             db.close()
             